@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Iterable, Optional, Union
+from urllib.parse import urljoin
+
+import httpx
+
+from scraper.flow_control import OUTCOME_OK, OUTCOME_OVERLOAD, AdaptiveConcurrencyController, get_shared_controller
+from scraper.http_cache import HttpCache
+from scraper.metrics import DEFAULT_STAGE, get_metrics
+from scraper.xml_client import (
+    DEFAULT_ACCEPT_ENCODING,
+    DEFAULT_ACCEPT_HEADER,
+    DEFAULT_BACKOFF_START_SECONDS,
+    DEFAULT_BASE_URL,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_TIMEOUT_SECONDS,
+    DEFAULT_USER_AGENT,
+    SemesterMeta,
+    XmlClient,
+    XmlFetchResult,
+    _is_retryable_status,
+    _not_modified_result,
+    _record_http,
+    _success_result,
+)
+
+HTTP_BACKEND_ENV = "SCRAPER_HTTP_BACKEND"
+BACKEND_REQUESTS = "requests"
+BACKEND_ASYNC = "async"
+# Jak dlugo bezczynne polaczenie keep-alive czeka na kolejne zapytanie.
+DEFAULT_KEEPALIVE_EXPIRY_SECONDS = 30.0
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncXmlClient:
+    """Asynchroniczny odpowiednik XmlClient (httpx) - to samo API, ten sam cache i retry."""
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_BASE_URL,
+        timeout: int = DEFAULT_TIMEOUT_SECONDS,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_start_seconds: float = DEFAULT_BACKOFF_START_SECONDS,
+        user_agent: str = DEFAULT_USER_AGENT,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        cache: Optional[HttpCache] = None,
+        flow: Optional[AdaptiveConcurrencyController] = None,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY_SECONDS,
+        keep_raw: bool = False,
+        stage: str = DEFAULT_STAGE,
+    ) -> None:
+        self.base_url = base_url if base_url.endswith("/") else f"{base_url}/"
+        self.max_retries = max_retries
+        self.stage = stage
+        self.backoff_start_seconds = backoff_start_seconds
+        self.keep_raw = keep_raw
+        self.cache = cache if cache is not None else HttpCache.from_env()
+        self.flow = flow if flow is not None else get_shared_controller()
+        # Wszystkie pliki sa na jednym hoscie, wiec limit puli = limit polaczen do tego hosta.
+        self._http = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            headers={
+                "User-Agent": user_agent,
+                "Accept": DEFAULT_ACCEPT_HEADER,
+                "Accept-Encoding": DEFAULT_ACCEPT_ENCODING,
+            },
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    async def fetch_xml(self, file_name: str) -> XmlFetchResult:
+        return await self._fetch_url(urljoin(self.base_url, file_name.lstrip("/")))
+
+    async def fetch_raw_url(self, url: str) -> XmlFetchResult:
+        return await self._fetch_url(url)
+
+    async def fetch_semester_meta_from_file(self, file_name: str) -> SemesterMeta:
+        result = await self.fetch_xml(file_name)
+        if not result.payload:
+            raise ValueError(f"Brak zawartości XML dla {file_name} ({result.url})")
+        return XmlClient.parse_semester_meta(result.payload, source_url=result.url)
+
+    async def fetch_many(self, file_names: Iterable[str]) -> list[Union[XmlFetchResult, Exception]]:
+        """Pobiera wiele plikow naraz; wynik w kolejnosci wejscia, bledy jako wyjatki na liscie."""
+        return await asyncio.gather(*(self.fetch_xml(name) for name in file_names), return_exceptions=True)
+
+    async def _fetch_url(self, url: str) -> XmlFetchResult:
+        last_exc: Optional[Exception] = None
+        backoff = self.backoff_start_seconds
+        # Odczyt i zapis cache to operacje na dysku - poza petla, zeby nie blokowac innych pobran.
+        cached = await asyncio.to_thread(self.cache.lookup, url) if self.cache else None
+        headers = self.cache.conditional_headers(cached) if self.cache else None
+
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                resp = await self._get(url, headers)
+                status = resp.status_code
+
+                if status == 304 and cached is not None:
+                    get_metrics().inc("http_cache_hits_total", stage=self.stage)
+                    return await asyncio.to_thread(
+                        _not_modified_result, url, resp, cached, self.cache, self.keep_raw
+                    )
+
+                if status == 404:
+                    logger.warning("XML not found (404): %s", url)
+                    return XmlFetchResult(url=url, status_code=status, content=None, fetched_at_utc=datetime.now(timezone.utc))
+
+                if 200 <= status < 300:
+                    if self.cache:
+                        return await asyncio.to_thread(_success_result, url, resp, self.cache, self.keep_raw)
+                    return _success_result(url, resp, None, self.keep_raw)
+
+                if _is_retryable_status(status) and attempt < self.max_retries:
+                    await asyncio.sleep(backoff)
+                    backoff *= 2
+                    continue
+
+                return XmlFetchResult(url=url, status_code=status, content=None, fetched_at_utc=datetime.now(timezone.utc))
+
+            except httpx.HTTPError as exc:
+                # Odpowiednik requests.RequestException: bledy transportu, dekodowania tresci, przekierowan.
+                last_exc = exc
+                if attempt < self.max_retries:
+                    await asyncio.sleep(backoff)
+                    backoff *= 2
+                    continue
+                break
+
+        raise RuntimeError(f"Nie udało się pobrać XML: {url}. Ostatni błąd: {last_exc}") from last_exc
+
+    async def _get(self, url: str, headers: Optional[dict]) -> httpx.Response:
+        async with self.flow.slot_async():
+            started = time.monotonic()
+            try:
+                resp = await self._http.get(url, headers=headers)
+            except (httpx.TimeoutException, httpx.NetworkError):
+                self.flow.record(None, OUTCOME_OVERLOAD)
+                _record_http(self.stage, None, time.monotonic() - started, 0)
+                raise
+            latency = time.monotonic() - started
+            outcome = OUTCOME_OVERLOAD if 500 <= resp.status_code < 600 else OUTCOME_OK
+            self.flow.record(latency, outcome)
+            _record_http(self.stage, resp.status_code, latency, len(resp.content or b""))
+        return resp
+
+
+class AsyncXmlClientAdapter:
+    """Synchroniczne API XmlClient nad AsyncXmlClient.
+
+    Petla asyncio dziala w osobnym watku; wywolania z watkow fetch_engine/StagedPipeline
+    tylko zlecaja do niej zapytania, wiec wszystkie polaczenia obsluguje jedna petla.
+    """
+
+    def __init__(self, **client_kwargs) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="xml-async-loop", daemon=True)
+        self._thread.start()
+        # httpx.AsyncClient musi powstac w petli, w ktorej bedzie uzywany.
+        self._client: AsyncXmlClient = self._call(_create_async_client(client_kwargs))
+        self.base_url = self._client.base_url
+        self.cache = self._client.cache
+        self.flow = self._client.flow
+        self.stage = self._client.stage
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+        self._call(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def fetch_xml(self, file_name: str) -> XmlFetchResult:
+        return self._call(self._client.fetch_xml(file_name))
+
+    def fetch_raw_url(self, url: str) -> XmlFetchResult:
+        return self._call(self._client.fetch_raw_url(url))
+
+    def fetch_semester_meta_from_file(self, file_name: str) -> SemesterMeta:
+        return self._call(self._client.fetch_semester_meta_from_file(file_name))
+
+    def fetch_many(self, file_names: Iterable[str]) -> list[Union[XmlFetchResult, Exception]]:
+        return self._call(self._client.fetch_many(list(file_names)))
+
+    parse_semester_meta = staticmethod(XmlClient.parse_semester_meta)
+
+    def _call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+
+def create_xml_client(**kwargs) -> Union[XmlClient, AsyncXmlClientAdapter]:
+    """Klient XML wybrany przez SCRAPER_HTTP_BACKEND: `requests` (domyslnie) lub `async`."""
+    backend = os.getenv(HTTP_BACKEND_ENV, BACKEND_REQUESTS).strip().lower()
+    if backend == BACKEND_ASYNC:
+        return AsyncXmlClientAdapter(**kwargs)
+    return XmlClient(**kwargs)
+
+
+async def _create_async_client(kwargs: dict) -> AsyncXmlClient:
+    return AsyncXmlClient(**kwargs)
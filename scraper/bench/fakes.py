@@ -0,0 +1,394 @@
+"""Zamienniki XmlClient i klienta Supabase do benchmarkow bez sieci.
+
+FixtureXmlClient serwuje zapisane pliki XML (z opoznieniem symulujacym siec, przez ten sam
+kontroler rownoleglosci co prawdziwy klient), a FakeSupabase trzyma tabele w pamieci
+i obsluguje podzbior API PostgREST uzywany w scraper.db.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from postgrest.exceptions import APIError
+
+from scraper.flow_control import OUTCOME_OK, AdaptiveConcurrencyController
+from scraper.metrics import DEFAULT_STAGE
+from scraper.xml_client import DEFAULT_BASE_URL, XmlClient, XmlFetchResult
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+ENTITY_FILE_RE = re.compile(r"^(?P<prefix>[a-z_]+)\.ID=(?P<id>[^.]+)\.xml$")
+# Listy, z ktorych scraper bierze identyfikatory grup i nauczycieli, oraz ich pliki planow.
+GROUP_LIST_PREFIX = "grupy_lista_grup_kierunku"
+TEACHER_LIST_PREFIX = "nauczyciel_lista_wydzialu"
+GROUP_PLAN_PREFIXES = ("grupy_plan", "grupy_hplan")
+TEACHER_PLAN_PREFIXES = ("nauczyciel_plan", "nauczyciel_hplan")
+
+
+class FixtureStore:
+    """Pliki XML z katalogu, opcjonalnie powielone `copies` razy.
+
+    Przy copies > 1 kazda grupa i kazdy nauczyciel z list dostaja kopie z nowymi ID
+    (`<id>` + numer kopii), ktorym odpowiadaja te same pliki planow - skala rosnie
+    bez nagrywania kolejnych plikow.
+    """
+
+    def __init__(self, directory: str | Path = FIXTURES_DIR, copies: int = 1) -> None:
+        self.directory = Path(directory)
+        self.files: dict[str, bytes] = {
+            path.name: path.read_bytes() for path in sorted(self.directory.glob("*.xml"))
+        }
+        if not self.files:
+            raise FileNotFoundError(f"Brak plikow *.xml w {self.directory}")
+        if copies > 1:
+            self._replicate(copies)
+
+    def get(self, file_name: str) -> Optional[bytes]:
+        return self.files.get(file_name)
+
+    def _replicate(self, copies: int) -> None:
+        for name, content in list(self.files.items()):
+            match = ENTITY_FILE_RE.match(name)
+            if not match or match["prefix"] not in (GROUP_LIST_PREFIX, TEACHER_LIST_PREFIX):
+                continue
+            plan_prefixes = GROUP_PLAN_PREFIXES if match["prefix"] == GROUP_LIST_PREFIX else TEACHER_PLAN_PREFIXES
+            root = ET.fromstring(content)
+            for items in root.iter("ITEMS"):
+                for item in list(items.findall("ITEM")):
+                    entity_id = item.findtext("ID")
+                    if not entity_id:
+                        continue
+                    for copy_no in range(1, copies):
+                        new_id = f"{entity_id}{copy_no:03d}"
+                        clone = ET.fromstring(ET.tostring(item))
+                        for tag in ("ID", "NAME", "KOD"):
+                            el = clone.find(tag)
+                            if el is not None and el.text:
+                                el.text = new_id if tag == "ID" else f"{el.text}-{copy_no}"
+                        items.append(clone)
+                        for prefix in plan_prefixes:
+                            plan = self.files.get(f"{prefix}.ID={entity_id}.xml")
+                            if plan is not None:
+                                self.files[f"{prefix}.ID={new_id}.xml"] = plan
+            self.files[name] = ET.tostring(root, encoding="utf-8", xml_declaration=True)
+
+
+class FixtureXmlClient:
+    """API XmlClient nad FixtureStore; brakujacy plik to odpowiedz 404."""
+
+    def __init__(
+        self,
+        store: FixtureStore,
+        latency_seconds: float = 0.0,
+        flow: Optional[AdaptiveConcurrencyController] = None,
+        keep_raw: bool = False,
+        stage: str = DEFAULT_STAGE,
+        **_ignored,
+    ) -> None:
+        self.store = store
+        self.latency_seconds = latency_seconds
+        self.flow = flow if flow is not None else AdaptiveConcurrencyController()
+        self.keep_raw = keep_raw
+        self.stage = stage
+        self.base_url = DEFAULT_BASE_URL
+        self.cache = None
+        self.requests = 0
+        self.bytes_served = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self) -> None:
+        pass
+
+    def fetch_xml(self, file_name: str) -> XmlFetchResult:
+        file_name = file_name.lstrip("/")
+        with self.flow.slot():
+            started = time.monotonic()
+            if self.latency_seconds:
+                time.sleep(self.latency_seconds)
+            body = self.store.get(file_name)
+            self.flow.record(time.monotonic() - started, OUTCOME_OK)
+        with self._lock:
+            self.requests += 1
+            self.bytes_served += len(body or b"")
+
+        url = f"{self.base_url}{file_name}"
+        now = datetime.now(timezone.utc)
+        if body is None:
+            return XmlFetchResult(url=url, status_code=404, content=None, fetched_at_utc=now)
+        return XmlFetchResult(
+            url=url,
+            status_code=200,
+            content=None if self.keep_raw else body.decode("utf-8"),
+            fetched_at_utc=now,
+            raw=body if self.keep_raw else None,
+        )
+
+    def fetch_raw_url(self, url: str) -> XmlFetchResult:
+        return self.fetch_xml(url.rsplit("/", 1)[-1])
+
+    def fetch_semester_meta_from_file(self, file_name: str):
+        result = self.fetch_xml(file_name)
+        if not result.payload:
+            raise ValueError(f"Brak zawartości XML dla {file_name} ({result.url})")
+        return XmlClient.parse_semester_meta(result.payload, source_url=result.url)
+
+    parse_semester_meta = staticmethod(XmlClient.parse_semester_meta)
+
+
+class FakeResponse:
+    def __init__(self, data: Any) -> None:
+        self.data = data
+
+
+# Wlasciciele wierszy zajec - jak w funkcjach SQL z supabase/migrations.
+EVENT_OWNER_COLUMNS = {"zajecia_grupy": "grupa_id", "zajecia_nauczyciela": "nauczyciel_id"}
+
+
+def _fake_delete_stale_zajecia(db: "FakeSupabase", params: dict) -> int:
+    owner_col = EVENT_OWNER_COLUMNS[params["p_table"]]
+    doomed = {
+        (_cmp_value(uid), _cmp_value(owner), _cmp_value(semester))
+        for uid, owner, semester in zip(params["p_uids"], params["p_owners"], params["p_semesters"])
+    }
+    now = datetime.now().isoformat()
+    table = params["p_table"]
+    keep = []
+    for row in db.tables[table]:
+        key = (_cmp_value(row.get("uid")), _cmp_value(row.get(owner_col)), _cmp_value(row.get("id_semestru")))
+        if key in doomed and row.get("poczatek") is not None and str(row["poczatek"]) > now:
+            continue
+        keep.append(row)
+    deleted = len(db.tables[table]) - len(keep)
+    db.tables[table] = keep
+    db._drop_indexes(table)
+    db.rows_written[(table, "delete")] += deleted
+    return deleted
+
+
+def _fake_remap_grupy_semester(db: "FakeSupabase", params: dict) -> dict:
+    groups = {str(row["id"]): row for row in db.tables["grupy"]}
+    moved = {}
+    for remap in params["p_remaps"]:
+        group = groups.get(str(remap["id"]))
+        if group is not None and group.get("grupa_id") == remap["old_grupa_id"]:
+            moved[remap["old_grupa_id"]] = (group, remap)
+
+    # Jak w funkcji SQL: najpierw sprawdzenie unikalnosci, potem zmiana obu tabel naraz.
+    taken = {row.get("grupa_id") for row in db.tables["grupy"]} - set(moved)
+    clashes = [remap["new_grupa_id"] for _, remap in moved.values() if remap["new_grupa_id"] in taken]
+    if clashes:
+        raise APIError({"code": "23505", "message": f"duplicate key value grupa_id={clashes[0]}"})
+
+    for group, remap in moved.values():
+        group["grupa_id"] = remap["new_grupa_id"]
+        group["nazwa"] = remap.get("nazwa") or group.get("nazwa")
+    events = 0
+    for row in db.tables["zajecia_grupy"]:
+        if row.get("grupa_id") in moved:
+            row["grupa_id"] = moved[row["grupa_id"]][1]["new_grupa_id"]
+            events += 1
+    db._drop_indexes("grupy")
+    db._drop_indexes("zajecia_grupy")
+    return {"grupy": len(moved), "zajecia": events}
+
+
+# Funkcje RPC z migracji, ktore FakeSupabase potrafi wykonac; pozostale koncza sie jak w PostgREST (PGRST202).
+FAKE_FUNCTIONS: dict[str, Callable[["FakeSupabase", dict], Any]] = {
+    "delete_stale_zajecia": _fake_delete_stale_zajecia,
+    "remap_grupy_semester": _fake_remap_grupy_semester,
+}
+
+
+class FakeSupabase:
+    """Tabele w pamieci z licznikami zapytan; opoznienie symuluje czas odpowiedzi PostgREST."""
+
+    def __init__(self, latency_seconds: float = 0.0,
+                 functions: Optional[dict[str, Callable[["FakeSupabase", dict], Any]]] = None) -> None:
+        self.latency_seconds = latency_seconds
+        self.functions = dict(FAKE_FUNCTIONS if functions is None else functions)
+        self.tables: dict[str, list[dict]] = defaultdict(list)
+        self.requests: Counter = Counter()
+        self.rows_written: Counter = Counter()
+        self._indexes: dict[tuple, dict] = {}
+        self._lock = threading.Lock()
+
+    def table(self, name: str) -> "FakeQuery":
+        return FakeQuery(self, name)
+
+    def rpc(self, fn: str, params: Optional[dict] = None) -> "FakeQuery":
+        query = FakeQuery(self, fn, op="rpc")
+        query.payload = params or {}
+        return query
+
+    def request_count(self) -> int:
+        return sum(self.requests.values())
+
+    def _execute(self, query: "FakeQuery") -> FakeResponse:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        with self._lock:
+            self.requests[(query.name, query.op)] += 1
+            if query.op == "rpc":
+                function = self.functions.get(query.name)
+                if function is None:
+                    raise APIError({"code": "PGRST202", "message": f"Could not find the function public.{query.name}"})
+                return FakeResponse(function(self, query.payload))
+            if query.op == "upsert":
+                return FakeResponse(self._upsert(query.name, query.payload, query.on_conflict))
+
+            rows = [row for row in self.tables[query.name] if query.matches(row)]
+            if query.op == "delete":
+                doomed = {id(row) for row in rows}
+                self.tables[query.name] = [row for row in self.tables[query.name] if id(row) not in doomed]
+                self._drop_indexes(query.name)
+                self.rows_written[(query.name, "delete")] += len(rows)
+                return FakeResponse(rows)
+            if query.op == "update":
+                for row in rows:
+                    row.update(query.payload)
+                self._drop_indexes(query.name)
+                self.rows_written[(query.name, "update")] += len(rows)
+                return FakeResponse(rows)
+
+            if query.order_by:
+                # Jak w Postgresie: rosnaco, NULL na koncu.
+                rows.sort(key=lambda row: [(row.get(col) is None, _cmp_value(row.get(col)) or "")
+                                           for col in query.order_by])
+            if query.row_limit is not None:
+                rows = rows[:query.row_limit]
+            return FakeResponse([query.project(row) for row in rows])
+
+    def _upsert(self, table: str, rows: list[dict], on_conflict: Optional[str]) -> list[dict]:
+        keys = tuple(k.strip() for k in (on_conflict or "id").split(","))
+        index = self._index(table, keys)
+        written = []
+        for row in rows:
+            key = tuple(_cmp_value(row.get(k)) for k in keys)
+            current = index.get(key)
+            if current is None:
+                current = {"id": str(uuid.uuid4()), **row}
+                self.tables[table].append(current)
+                for (indexed_table, indexed_keys), other in self._indexes.items():
+                    if indexed_table == table:
+                        other[tuple(_cmp_value(current.get(k)) for k in indexed_keys)] = current
+            else:
+                current.update(row)
+            written.append(current)
+        self.rows_written[(table, "upsert")] += len(rows)
+        return written
+
+    def _index(self, table: str, keys: tuple) -> dict:
+        index = self._indexes.get((table, keys))
+        if index is None:
+            index = {tuple(_cmp_value(row.get(k)) for k in keys): row for row in self.tables[table]}
+            self._indexes[(table, keys)] = index
+        return index
+
+    def _drop_indexes(self, table: str) -> None:
+        for key in [k for k in self._indexes if k[0] == table]:
+            del self._indexes[key]
+
+
+class FakeQuery:
+    """Builder zapytania jak w postgrest-py: metody filtrow zwracaja self, execute() wykonuje."""
+
+    def __init__(self, client: FakeSupabase, name: str, op: str = "select") -> None:
+        self.client = client
+        self.name = name
+        self.op = op
+        self.columns: Optional[list[str]] = None
+        self.payload: Any = None
+        self.on_conflict: Optional[str] = None
+        self.filters: list = []
+        self.order_by: list[str] = []
+        self.row_limit: Optional[int] = None
+
+    def select(self, columns: str = "*") -> "FakeQuery":
+        self.op = "select"
+        self.columns = None if columns.strip() == "*" else [c.strip() for c in columns.split(",")]
+        return self
+
+    def upsert(self, rows, on_conflict: Optional[str] = None, **_ignored) -> "FakeQuery":
+        self.op = "upsert"
+        self.payload = rows if isinstance(rows, list) else [rows]
+        self.on_conflict = on_conflict
+        return self
+
+    def update(self, values: dict) -> "FakeQuery":
+        self.op = "update"
+        self.payload = values
+        return self
+
+    def delete(self) -> "FakeQuery":
+        self.op = "delete"
+        return self
+
+    def eq(self, column: str, value) -> "FakeQuery":
+        self.filters.append(lambda row: _cmp_value(row.get(column)) == _cmp_value(value))
+        return self
+
+    def neq(self, column: str, value) -> "FakeQuery":
+        self.filters.append(lambda row: _cmp_value(row.get(column)) != _cmp_value(value))
+        return self
+
+    def gt(self, column: str, value) -> "FakeQuery":
+        bound = _cmp_value(_resolve_now(value))
+        self.filters.append(lambda row: row.get(column) is not None and _cmp_value(row.get(column)) > bound)
+        return self
+
+    def gte(self, column: str, value) -> "FakeQuery":
+        bound = _cmp_value(_resolve_now(value))
+        self.filters.append(lambda row: row.get(column) is not None and _cmp_value(row.get(column)) >= bound)
+        return self
+
+    def is_(self, column: str, value) -> "FakeQuery":
+        expected = None if str(value).lower() == "null" else value
+        self.filters.append(lambda row: _cmp_value(row.get(column)) == _cmp_value(expected))
+        return self
+
+    def in_(self, column: str, values) -> "FakeQuery":
+        allowed = {_cmp_value(v) for v in values}
+        self.filters.append(lambda row: _cmp_value(row.get(column)) in allowed)
+        return self
+
+    def order(self, column: str, desc: bool = False) -> "FakeQuery":
+        self.order_by.append(column)
+        return self
+
+    def limit(self, count: int) -> "FakeQuery":
+        self.row_limit = count
+        return self
+
+    def matches(self, row: dict) -> bool:
+        return all(check(row) for check in self.filters)
+
+    def project(self, row: dict) -> dict:
+        if self.columns is None:
+            return dict(row)
+        return {col: row.get(col) for col in self.columns}
+
+    def execute(self) -> FakeResponse:
+        return self.client._execute(self)
+
+
+def _cmp_value(value):
+    return None if value is None else str(value)
+
+
+def _resolve_now(value):
+    # PostgREST przyjmuje "now()" jako wartosc filtra - porownujemy z lokalnym czasem w ISO.
+    if value == "now()":
+        return datetime.now().isoformat()
+    return value
@@ -0,0 +1,108 @@
+"""Dopasowanie kodow grup przy zmianie semestru: petla match_group_code vs BulkGroupMatcher.
+
+Uzycie: python -m scraper.bench.group_matcher [--old N] [--new M] [--seed S]
+
+Kody sa generowane w formacie planu UZ (np. 21INF-SP, 13MAT-NP/2); czesc starych kodow
+ma zmieniony rocznik albo literowke, zeby pokryc wszystkie strategie dopasowania.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import string
+import time
+from collections import Counter
+from typing import Optional
+
+from rapidfuzz import fuzz
+
+from scraper.semester_manager import (
+    DEFAULT_FUZZY_THRESHOLD,
+    BulkGroupMatcher,
+    GroupMatchCandidate,
+    _code_signature,
+    _increment_year_prefix,
+    normalize_group_code,
+)
+
+MODES = ("SP", "NP", "SD", "NZ")
+
+
+def generate_codes(count: int, rng: random.Random) -> list[str]:
+    codes = set()
+    while len(codes) < count:
+        field = "".join(rng.choices(string.ascii_uppercase, k=rng.randint(3, 5)))
+        code = f"{rng.randint(1, 5)}{rng.randint(1, 3)}{field}-{rng.choice(MODES)}"
+        if rng.random() < 0.3:
+            code += f"/{rng.randint(1, 4)}"
+        codes.add(code)
+    return sorted(codes)
+
+
+def derive_old_codes(new_codes: list[str], count: int, rng: random.Random) -> list[str]:
+    """Stare kody: czesc identyczna, czesc z poprzednim rocznikiem, czesc zmieniona lub obca."""
+    old = []
+    for _ in range(count):
+        code = rng.choice(new_codes)
+        roll = rng.random()
+        if roll < 0.4:
+            old.append(code.lower())
+        elif roll < 0.7:
+            old.append(f"{(int(code[0]) - 1) % 10}{code[1:]}")
+        elif roll < 0.9:
+            pos = rng.randrange(2, len(code))
+            old.append(code[:pos] + rng.choice(string.ascii_uppercase) + code[pos + 1:])
+        else:
+            old.append(generate_codes(1, rng)[0] + "X")
+    return old
+
+
+def reference_match(old_code: str, new_codes: list[str]) -> Optional[GroupMatchCandidate]:
+    """Dawna implementacja match_group_code (petla fuzz.ratio) - punkt odniesienia."""
+    old_normalized = normalize_group_code(old_code)
+    normalized_map = {normalize_group_code(code): code for code in new_codes}
+    if old_normalized in normalized_map:
+        return GroupMatchCandidate(old_code, normalized_map[old_normalized], 100.0, "exact")
+    transformed = _increment_year_prefix(old_normalized)
+    if transformed and transformed in normalized_map:
+        return GroupMatchCandidate(old_code, normalized_map[transformed], 95.0, "year_prefix")
+    best_code, best_score = None, -1.0
+    for normalized_code, original_code in normalized_map.items():
+        score = float(fuzz.ratio(_code_signature(old_normalized), _code_signature(normalized_code)))
+        if score > best_score:
+            best_score, best_code = score, original_code
+    if best_code is not None and best_score >= DEFAULT_FUZZY_THRESHOLD:
+        return GroupMatchCandidate(old_code, best_code, best_score, "fuzzy")
+    return None
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--old", type=int, default=2000, help="liczba starych kodow")
+    parser.add_argument("--new", type=int, default=2000, help="liczba nowych kodow")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    new_codes = generate_codes(args.new, rng)
+    old_codes = derive_old_codes(new_codes, args.old, rng)
+
+    started = time.perf_counter()
+    expected = {code: reference_match(code, new_codes) for code in old_codes}
+    loop_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    matched = BulkGroupMatcher(new_codes).match_all(old_codes)
+    bulk_time = time.perf_counter() - started
+
+    mismatches = sum(1 for code in expected if expected[code] != matched[code])
+    strategies = Counter(m.strategy if m else "brak" for m in matched.values())
+    print(f"Stare kody: {len(old_codes)}, nowe kody: {len(new_codes)}")
+    print(f"Strategie: {dict(strategies)}")
+    print(f"Petla match_group_code: {loop_time:.3f} s")
+    print(f"BulkGroupMatcher:       {bulk_time:.3f} s  (x{loop_time / bulk_time:.1f})")
+    print(f"Rozbieznosci wynikow: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""Pelny przebieg synchronizacji bez sieci: katalogi, zajecia grup i zajecia nauczycieli.
+
+Uzycie: python -m scraper.bench.offline_e2e [--fixtures KATALOG] [--copies N] [--runs R]
+        [--http-latency-ms MS] [--db-latency-ms MS] [--workers W] [--digests] [--json PLIK]
+        python -m scraper.bench.offline_e2e --record KATALOG [--groups N] [--teachers N]
+
+XML serwuje FixtureXmlClient z zapisanych plikow (domyslnie scraper/bench/fixtures), a zapisy
+trafiaja do FakeSupabase w pamieci. Kolejne przebiegi (--runs) dzialaja na tej samej bazie,
+wiec pierwszy mierzy zasilenie pustej bazy, a nastepne stan ustalony. --record zapisuje
+prawdziwe pliki z serwera planow (ograniczone do N grup i N nauczycieli) jako nowy zestaw.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+from unittest import mock
+
+# scraper.db tworzy klienta Supabase przy imporcie - wystarcza mu dowolny adres.
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "offline-bench")
+
+from scraper import db, run_events, teacher_sync, xml_sync  # noqa: E402
+from scraper.bench.fakes import (  # noqa: E402
+    FIXTURES_DIR, GROUP_PLAN_PREFIXES, TEACHER_PLAN_PREFIXES, FakeSupabase, FixtureStore, FixtureXmlClient,
+)
+from scraper.digest_store import DigestStore  # noqa: E402
+from scraper.flow_control import AdaptiveConcurrencyController  # noqa: E402
+from scraper.xml_client import XmlClient  # noqa: E402
+
+# Zmienne, ktore zmienilyby przebieg (skroty, wznowienie, shard) - benchmark ich nie uzywa.
+ISOLATED_ENV = (
+    "SCRAPER_DIGEST_FILE", "SCRAPER_CHECKPOINT_FILE", "SCRAPER_SHARD_INDEX", "SCRAPER_SHARD_COUNT",
+    "SCRAPER_HTTP_CACHE_DIR", "SCRAPER_PROFILE",
+)
+
+
+class OfflineHarness:
+    """Podmienia klienta XML i Supabase w modulach scrapera i mierzy kolejne etapy."""
+
+    def __init__(self, store: FixtureStore, http_latency: float = 0.0, db_latency: float = 0.0,
+                 workers=None, digests: Optional[DigestStore] = None, verbose: bool = False) -> None:
+        self.store = store
+        self.db = FakeSupabase(latency_seconds=db_latency)
+        self.flow = AdaptiveConcurrencyController()
+        self.http_latency = http_latency
+        self.workers = workers
+        self.digests = digests
+        self.verbose = verbose
+        self.clients: list[FixtureXmlClient] = []
+
+    def create_client(self, **kwargs) -> FixtureXmlClient:
+        client = FixtureXmlClient(self.store, latency_seconds=self.http_latency, flow=self.flow, **kwargs)
+        self.clients.append(client)
+        return client
+
+    def xml_requests(self) -> int:
+        return sum(client.requests for client in self.clients)
+
+    def run(self) -> list[dict]:
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(mock.patch.dict(os.environ, {name: "" for name in ISOLATED_ENV}))
+            stack.enter_context(mock.patch.object(db, "supabase", self.db))
+            # Schemat tabel zajec jest wykrywany od nowa na bazie w pamieci (bez partycji).
+            stack.enter_context(mock.patch.object(db, "_events_partitioned", None))
+            stack.enter_context(mock.patch.object(db, "_stale_delete_rpc_available", None))
+            for module in (xml_sync, run_events, teacher_sync):
+                stack.enter_context(mock.patch.object(module, "create_xml_client", self.create_client))
+            return [
+                self._measure("katalogi", lambda: xml_sync.sync_directions_and_groups_from_xml(
+                    verbose=False, workers=self.workers)),
+                self._measure("grupy", lambda: run_events.main(
+                    workers=self.workers, digests=self.digests)),
+                self._measure("nauczyciele", lambda: teacher_sync.sync_teacher_events_and_meta(
+                    verbose=False, workers=self.workers, digests=self.digests)),
+            ]
+
+    def _measure(self, stage: str, fn) -> dict:
+        xml_before = self.xml_requests()
+        db_before = Counter(self.db.requests)
+        rows_before = Counter(self.db.rows_written)
+        output = contextlib.nullcontext() if self.verbose else contextlib.redirect_stdout(io.StringIO())
+
+        started = time.perf_counter()
+        with output:
+            result = fn()
+        elapsed = time.perf_counter() - started
+
+        db_ops = Counter()
+        for (_, op), count in (Counter(self.db.requests) - db_before).items():
+            db_ops[op] += count
+        rows = sum((Counter(self.db.rows_written) - rows_before).values())
+        entities = _stage_entities(stage, result, self.db)
+        return {
+            "stage": stage,
+            "seconds": round(elapsed, 4),
+            "entities": entities,
+            "entities_per_s": round(entities / elapsed, 1) if elapsed else None,
+            "rows_written": rows,
+            "rows_per_s": round(rows / elapsed, 1) if elapsed else None,
+            "xml_requests": self.xml_requests() - xml_before,
+            "db_requests": sum(db_ops.values()),
+            "db_requests_by_op": dict(sorted(db_ops.items())),
+        }
+
+
+def _stage_entities(stage: str, result, fake_db: FakeSupabase) -> int:
+    if stage == "grupy":
+        return result.get("groups", 0)
+    if stage == "nauczyciele":
+        return sum(1 for row in fake_db.tables["nauczyciele"] if row.get("external_id"))
+    return len(fake_db.tables["kierunki"]) + len(fake_db.tables["grupy"]) + len(fake_db.tables["nauczyciele"])
+
+
+def record_fixtures(out_dir: str, groups: int, teachers: int) -> int:
+    """Zapisuje pliki z serwera planow: listy przyciete do nagranych encji i ich plany."""
+    target = Path(out_dir)
+    target.mkdir(parents=True, exist_ok=True)
+    written = 0
+
+    def save(name: str, body: bytes) -> None:
+        nonlocal written
+        (target / name).write_bytes(body)
+        written += 1
+
+    with XmlClient(keep_raw=True, stage="bench") as client:
+        def fetch(name: str):
+            result = client.fetch_xml(name)
+            return result.raw if result.status_code == 200 else None
+
+        def record_plans(prefixes, entity_id: str) -> None:
+            for prefix in prefixes:
+                body = fetch(f"{prefix}.ID={entity_id}.xml")
+                if body is not None:
+                    save(f"{prefix}.ID={entity_id}.xml", body)
+
+        directions_root = ET.fromstring(fetch(xml_sync.DIRECTIONS_XML))
+        recorded_groups = 0
+        for items in directions_root.iter("ITEMS"):
+            for item in list(items.findall("ITEM")):
+                direction_id = item.findtext("ID")
+                body = fetch(xml_sync.GROUPS_XML_TEMPLATE.format(direction_id=direction_id)) \
+                    if direction_id and recorded_groups < groups else None
+                if body is None:
+                    items.remove(item)
+                    continue
+                groups_root = ET.fromstring(body)
+                for group_items in groups_root.iter("ITEMS"):
+                    for group in list(group_items.findall("ITEM")):
+                        if recorded_groups >= groups:
+                            group_items.remove(group)
+                            continue
+                        record_plans(GROUP_PLAN_PREFIXES, group.findtext("ID"))
+                        recorded_groups += 1
+                save(xml_sync.GROUPS_XML_TEMPLATE.format(direction_id=direction_id), _serialize(groups_root))
+        save(xml_sync.DIRECTIONS_XML, _serialize(directions_root))
+
+        faculties_root = ET.fromstring(fetch(xml_sync.TEACHER_FACULTIES_XML))
+        recorded_teachers = 0
+        for items in faculties_root.iter("ITEMS"):
+            for item in list(items.findall("ITEM")):
+                faculty_id = item.findtext("ID")
+                body = fetch(xml_sync.TEACHER_FACULTY_XML_TEMPLATE.format(faculty_id=faculty_id)) \
+                    if faculty_id and recorded_teachers < teachers else None
+                if body is None:
+                    items.remove(item)
+                    continue
+                teachers_root = ET.fromstring(body)
+                for teacher_items in teachers_root.iter("ITEMS"):
+                    for teacher in list(teacher_items.findall("ITEM")):
+                        if recorded_teachers >= teachers:
+                            teacher_items.remove(teacher)
+                            continue
+                        record_plans(TEACHER_PLAN_PREFIXES, teacher.findtext("ID"))
+                        recorded_teachers += 1
+                save(xml_sync.TEACHER_FACULTY_XML_TEMPLATE.format(faculty_id=faculty_id), _serialize(teachers_root))
+        save(xml_sync.TEACHER_FACULTIES_XML, _serialize(faculties_root))
+
+    print(f"Zapisano {written} plikow ({recorded_groups} grup, {recorded_teachers} nauczycieli) w {target}")
+    return written
+
+
+def _serialize(root: ET.Element) -> bytes:
+    return ET.tostring(root, encoding="utf-8", xml_declaration=True)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=str(FIXTURES_DIR), help="katalog z plikami XML")
+    parser.add_argument("--copies", type=int, default=1, help="powielenie grup i nauczycieli z list")
+    parser.add_argument("--runs", type=int, default=2, help="liczba przebiegow na tej samej bazie")
+    parser.add_argument("--http-latency-ms", type=float, default=0.0, help="symulowany czas odpowiedzi serwera planow")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="symulowany czas zapytania do Supabase")
+    parser.add_argument("--workers", type=int, default=None, help="liczba watkow pobierajacych")
+    parser.add_argument("--digests", action="store_true", help="pomijaj niezmienione plany (skroty w pliku tymczasowym)")
+    parser.add_argument("--json", help="zapisz wyniki jako JSON")
+    parser.add_argument("--verbose", action="store_true", help="pokaz komunikaty etapow")
+    parser.add_argument("--record", metavar="KATALOG", help="nagraj nowy zestaw plikow z serwera planow")
+    parser.add_argument("--groups", type=int, default=20, help="liczba grup do nagrania")
+    parser.add_argument("--teachers", type=int, default=20, help="liczba nauczycieli do nagrania")
+    args = parser.parse_args(argv)
+
+    if args.record:
+        record_fixtures(args.record, args.groups, args.teachers)
+        return
+
+    store = FixtureStore(args.fixtures, copies=args.copies)
+    digest_dir = tempfile.TemporaryDirectory() if args.digests else None
+    harness = OfflineHarness(
+        store,
+        http_latency=args.http_latency_ms / 1000,
+        db_latency=args.db_latency_ms / 1000,
+        workers=args.workers,
+        digests=DigestStore(os.path.join(digest_dir.name, "digests.json")) if digest_dir else None,
+        verbose=args.verbose,
+    )
+    print(f"Pliki: {len(store.files)}, kopie: {args.copies}, przebiegi: {args.runs}")
+    print(f"{'przebieg':>8} {'etap':<12} {'czas[s]':>8} {'encje':>7} {'encje/s':>9} "
+          f"{'wiersze':>8} {'wiersze/s':>10} {'xml':>6} {'db':>6}  db wg operacji")
+
+    report = []
+    for run_no in range(1, args.runs + 1):
+        for stage in harness.run():
+            stage["run"] = run_no
+            report.append(stage)
+            ops = " ".join(f"{op}={n}" for op, n in stage["db_requests_by_op"].items())
+            print(f"{run_no:>8} {stage['stage']:<12} {stage['seconds']:>8.3f} {stage['entities']:>7} "
+                  f"{stage['entities_per_s'] or 0:>9.1f} {stage['rows_written']:>8} "
+                  f"{stage['rows_per_s'] or 0:>10.1f} {stage['xml_requests']:>6} {stage['db_requests']:>6}  {ops}")
+
+    if digest_dir:
+        digest_dir.cleanup()
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
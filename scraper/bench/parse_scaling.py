@@ -0,0 +1,89 @@
+"""Skalowanie parsowania planow na 1..N procesach.
+
+Uzycie: python -m scraper.bench.parse_scaling --files KATALOG [--max-processes N] [--repeat R]
+
+KATALOG zawiera zapisane pliki planow (*.xml), np. z cache HTTP albo pobrane recznie.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from scraper.parse_pool import PlanParsePool, decode_plan_batch, encode_plan_batch
+from scraper.xml_parsers import parse_group_plan_events
+
+
+def load_plan_files(directory: str) -> list[bytes]:
+    # Surowe bajty jak w produkcji: kodowanie (np. windows-1250) wynika z deklaracji XML.
+    paths = sorted(Path(directory).glob("*.xml"))
+    if not paths:
+        raise SystemExit(f"Brak plikow *.xml w {directory}")
+    return [p.read_bytes() for p in paths]
+
+
+def measure_in_process(files: list[bytes], repeat: int) -> tuple[float, int]:
+    """Parsowanie w biezacym procesie - punkt odniesienia dla wariantu z pula."""
+    events = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for content in files:
+            events += len(parse_group_plan_events(content))
+    return time.perf_counter() - started, events
+
+
+def measure_pool(files: list[bytes], processes: int, repeat: int) -> tuple[float, int]:
+    with PlanParsePool(processes) as pool:
+        # Rozgrzewka: start procesow (spawn + import modulow) nie wchodzi do pomiaru.
+        with ThreadPoolExecutor(max_workers=processes) as threads:
+            list(threads.map(pool.parse_plan_events, files[:processes]))
+            events = 0
+            started = time.perf_counter()
+            for _ in range(repeat):
+                for parsed in threads.map(pool.parse_plan_events, files):
+                    events += len(parsed)
+        return time.perf_counter() - started, events
+
+
+def measure_serialization(files: list[bytes]) -> tuple[float, int]:
+    """Koszt zakodowania i odkodowania paczek zdarzen (czesc narzutu miedzyprocesowego)."""
+    batches = [parse_group_plan_events(content) for content in files]
+    size = 0
+    started = time.perf_counter()
+    for events in batches:
+        payload = encode_plan_batch(events)
+        size += len(payload)
+        decode_plan_batch(payload)
+    return time.perf_counter() - started, size
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", required=True, help="katalog z plikami planow *.xml")
+    parser.add_argument("--max-processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3, help="ile razy parsowac caly zestaw")
+    args = parser.parse_args(argv)
+
+    files = load_plan_files(args.files)
+    total_files = len(files) * args.repeat
+    print(f"Pliki: {len(files)}, powtorzenia: {args.repeat}, laczny rozmiar: {sum(map(len, files)) / 1e6:.1f} MB")
+
+    ser_time, ser_size = measure_serialization(files)
+    print(f"Serializacja paczek: {ser_time * 1000:.1f} ms, {ser_size / 1e6:.2f} MB")
+
+    base_time, events = measure_in_process(files, args.repeat)
+    print(f"{'procesy':>8} {'pliki/s':>10} {'zdarzenia/s':>12} {'przysp.':>8}")
+    print(f"{'watek':>8} {total_files / base_time:>10.1f} {events / base_time:>12.0f} {1.0:>8.2f}")
+
+    for processes in range(1, args.max_processes + 1):
+        elapsed, pool_events = measure_pool(files, processes, args.repeat)
+        print(
+            f"{processes:>8} {total_files / elapsed:>10.1f} {pool_events / elapsed:>12.0f}"
+            f" {base_time / elapsed:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Przepustowosc i szczyt pamieci parserow XML na syntetycznych plikach w rosnacej skali.
+
+Uzycie: python -m scraper.bench.parser_micro [--scales grupa,kierunek,wydzial,semestr]
+        [--parsers plan_stream,plan_bs4,...] [--repeat R] [--seed N] [--json PLIK]
+
+Dla kazdej pary parser x skala czas to najlepszy z R przebiegow, a szczyt pamieci
+(tracemalloc, razem z wynikiem parsowania) jest mierzony w osobnym przebiegu, zeby
+narzut sledzenia nie zawyzal czasu. Skala "10x-semestr" nie jest uruchamiana domyslnie -
+bs4 potrzebuje na niej kilku GB pamieci.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable
+
+from scraper.bench.synthetic_xml import (
+    SCALES, PlanScale, generate_directions_xml, generate_groups_xml, generate_plan_xml,
+)
+from scraper.xml_client import XmlClient
+from scraper.xml_parsers import (
+    PLAN_PARSER_BS4, PLAN_PARSER_STREAM, _parse_plan_events, parse_directions_from_xml, parse_groups_from_xml,
+)
+
+DEFAULT_SCALES = ("grupa", "kierunek", "wydzial", "semestr")
+
+
+@dataclass(frozen=True)
+class ParserCase:
+    name: str
+    parse: Callable[[bytes], object]
+    # Dokument wejsciowy dla skali i ziarna oraz liczba jego pozycji (ITEM).
+    document: Callable[[PlanScale, int], tuple[bytes, int]]
+
+
+@dataclass
+class ParserResult:
+    parser: str
+    scale: str
+    input_mb: float
+    items: int
+    outputs: int
+    best_seconds: float
+    mb_per_s: float
+    items_per_s: float
+    peak_mib: float
+
+
+@lru_cache(maxsize=None)
+def _plan_document(scale: PlanScale, seed: int) -> tuple[bytes, int]:
+    return generate_plan_xml(scale.plan_items, seed), scale.plan_items
+
+
+def _directions_document(scale: PlanScale, seed: int) -> tuple[bytes, int]:
+    return generate_directions_xml(scale.directions, seed), scale.directions
+
+
+def _groups_document(scale: PlanScale, seed: int) -> tuple[bytes, int]:
+    return generate_groups_xml(scale.groups, seed), scale.groups
+
+
+PARSERS = {
+    case.name: case
+    for case in (
+        ParserCase("directions", parse_directions_from_xml, _directions_document),
+        ParserCase("groups", parse_groups_from_xml, _groups_document),
+        ParserCase("plan_stream", lambda xml: _parse_plan_events(xml, engine=PLAN_PARSER_STREAM), _plan_document),
+        ParserCase("plan_bs4", lambda xml: _parse_plan_events(xml, engine=PLAN_PARSER_BS4), _plan_document),
+        ParserCase("semester_meta", XmlClient.parse_semester_meta, _plan_document),
+    )
+}
+
+
+def measure(case: ParserCase, scale: PlanScale, repeat: int, seed: int = 0) -> ParserResult:
+    document, items = case.document(scale, seed)
+
+    best = float("inf")
+    outputs = 0
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        started = time.perf_counter()
+        result = case.parse(document)
+        best = min(best, time.perf_counter() - started)
+        outputs = len(result) if isinstance(result, list) else 1
+        del result
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = case.parse(document)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+
+    size_mb = len(document) / 1e6
+    return ParserResult(
+        parser=case.name,
+        scale=scale.name,
+        input_mb=round(size_mb, 3),
+        items=items,
+        outputs=outputs,
+        best_seconds=round(best, 6),
+        mb_per_s=round(size_mb / best, 2),
+        items_per_s=round(items / best, 1),
+        peak_mib=round(peak / 2**20, 2),
+    )
+
+
+def _names(raw: str, known: dict) -> list[str]:
+    names = [n.strip() for n in raw.split(",") if n.strip()]
+    unknown = [n for n in names if n not in known]
+    if unknown:
+        raise SystemExit(f"Nieznane: {', '.join(unknown)} (dostepne: {', '.join(known)})")
+    return names
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default=",".join(DEFAULT_SCALES), help=f"skale z: {', '.join(SCALES)}")
+    parser.add_argument("--parsers", default=",".join(PARSERS), help=f"parsery z: {', '.join(PARSERS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="liczba przebiegow mierzonych czasowo")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="zapisz wyniki jako JSON")
+    args = parser.parse_args(argv)
+
+    scales = [SCALES[name] for name in _names(args.scales, SCALES)]
+    cases = [PARSERS[name] for name in _names(args.parsers, PARSERS)]
+
+    print(f"{'parser':<14} {'skala':<12} {'MB':>8} {'pozycje':>8} {'wynik':>9} "
+          f"{'czas[s]':>9} {'MB/s':>8} {'pozycje/s':>11} {'szczyt MiB':>11}")
+    results = []
+    for case in cases:
+        for scale in scales:
+            r = measure(case, scale, args.repeat, args.seed)
+            results.append(r)
+            print(f"{r.parser:<14} {r.scale:<12} {r.input_mb:>8.3f} {r.items:>8} {r.outputs:>9} "
+                  f"{r.best_seconds:>9.4f} {r.mb_per_s:>8.2f} {r.items_per_s:>11.0f} {r.peak_mib:>11.2f}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps([asdict(r) for r in results], indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
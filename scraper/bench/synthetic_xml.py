@@ -0,0 +1,179 @@
+"""Syntetyczne pliki XML w formacie serwera planow UZ w zadanej skali.
+
+Uzycie: python -m scraper.bench.synthetic_xml --out KATALOG [--scale grupa|kierunek|wydzial|semestr|10x-semestr]
+        [--seed N]
+
+Generator jest deterministyczny dla danego ziarna. Skala to liczba grup: plan jednej grupy
+ma ITEMS_PER_GROUP pozycji, a "semestr" odpowiada planom wszystkich grup uczelni w jednym
+semestrze. --out zapisuje plik planu, liste kierunkow i liste grup danej skali.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+ITEMS_PER_GROUP = 30
+GROUPS_PER_DIRECTION = 8
+DIRECTIONS_PER_FACULTY = 12
+# Rzad wielkosci liczby grup w semestrze na UZ.
+FULL_SEMESTER_GROUPS = 600
+SEMESTER_START = date(2026, 10, 5)
+SEMESTER_WEEKS = 15
+
+SEMESTER_HEADER = (
+    ("SEMESTER_ID", "231"),
+    ("SEMESTER", "2026/2027 zimowy"),
+    ("SEMESTER_EN", "2026/2027 winter"),
+    ("SEMESTER_PREV_ID", "230"),
+    ("SEMESTER_PREV", "2025/2026 letni"),
+    ("SEMESTER_PREV_EN", "2025/2026 summer"),
+    ("GENERATED", "2026-10-16 05:15:02"),
+)
+
+SUBJECTS = (
+    "Algorytmy i struktury danych", "Bazy danych", "Sieci komputerowe", "Matematyka dyskretna",
+    "Programowanie obiektowe", "Systemy operacyjne", "Język angielski", "Mikroekonomia",
+    "Podstawy zarządzania", "Teoria sterowania", "Analiza matematyczna", "Fizyka", "Grafika komputerowa",
+    "Inżynieria oprogramowania", "Elektrotechnika", "Statystyka", "Wychowanie fizyczne", "Prawo gospodarcze",
+)
+CLASS_TYPES = ("W", "C", "L", "P", "S", "Ćw")
+SUBGROUPS = ("", "", "", "gr. 1", "gr. 2", "L1", "L2")
+TEACHERS = (
+    "Kowalski Jan, dr inż.", "Nowak Anna, prof. dr hab.", "Wiśniewska Ewa, mgr", "Wójcik Piotr, dr",
+    "Kamińska Maria, dr hab. inż., prof. UZ", "Lewandowski Tomasz, mgr inż.", "Zielińska Katarzyna, dr",
+    "Szymański Marek, prof. dr hab. inż.", "Dąbrowska Agnieszka, mgr", "Brak",
+)
+BUILDINGS = ("A-2", "A-8", "A-29", "B-1", "C-2", "D-1")
+FACULTIES = (
+    "Wydział Informatyki, Elektrotechniki i Automatyki", "Wydział Ekonomii i Zarządzania",
+    "Wydział Mechaniczny", "Wydział Nauk Biologicznych", "Wydział Humanistyczny", "Wydział Prawa i Administracji",
+)
+CLASS_MINUTES = 90
+HOURS = ((8, 0), (9, 45), (11, 30), (13, 15), (15, 0), (16, 45), (18, 30))
+
+
+@dataclass(frozen=True)
+class PlanScale:
+    name: str
+    groups: int
+
+    @property
+    def plan_items(self) -> int:
+        return self.groups * ITEMS_PER_GROUP
+
+    @property
+    def directions(self) -> int:
+        return max(1, self.groups // GROUPS_PER_DIRECTION)
+
+
+SCALES = {
+    scale.name: scale
+    for scale in (
+        PlanScale("grupa", 1),
+        PlanScale("kierunek", GROUPS_PER_DIRECTION),
+        PlanScale("wydzial", GROUPS_PER_DIRECTION * DIRECTIONS_PER_FACULTY),
+        PlanScale("semestr", FULL_SEMESTER_GROUPS),
+        PlanScale("10x-semestr", FULL_SEMESTER_GROUPS * 10),
+    )
+}
+
+
+def generate_plan_xml(items: int, seed: int = 0, semester_id: str = "231",
+                      extra_header: tuple[tuple[str, str], ...] = ()) -> bytes:
+    """Plan ROOT/ITEMS/ITEM z `items` pozycjami; kazda ma 8-15 dat w TERMIN_DT."""
+    rnd = random.Random(seed)
+    parts = [_header(extra_header), "<ITEMS>"]
+    for position in range(items):
+        parts.append(_plan_item(rnd, 900000 + position, semester_id))
+    parts.append("</ITEMS></ROOT>\n")
+    return "".join(parts).encode("utf-8")
+
+
+def generate_directions_xml(directions: int, seed: int = 0) -> bytes:
+    """Lista kierunkow pogrupowana po wydzialach (ITEM wydzialu z zagniezdzonym ITEMS)."""
+    rnd = random.Random(seed)
+    parts = [_header(), "<ITEMS>"]
+    for start in range(0, directions, DIRECTIONS_PER_FACULTY):
+        faculty = FACULTIES[(start // DIRECTIONS_PER_FACULTY) % len(FACULTIES)]
+        parts.append(f"<ITEM><NAME>{escape(faculty)}</NAME><ITEMS>")
+        for direction_id in range(start, min(start + DIRECTIONS_PER_FACULTY, directions)):
+            name = f"{rnd.choice(SUBJECTS)} ({'stacjonarne' if direction_id % 2 else 'niestacjonarne'})"
+            parts.append(f"<ITEM><ID>{100 + direction_id}</ID><NAME>{escape(name)}</NAME></ITEM>")
+        parts.append("</ITEMS></ITEM>")
+    parts.append("</ITEMS></ROOT>\n")
+    return "".join(parts).encode("utf-8")
+
+
+def generate_groups_xml(groups: int, seed: int = 0) -> bytes:
+    """Lista grup kierunku (ID, NAME, KOD)."""
+    rnd = random.Random(seed)
+    parts = [_header(), "<ITEMS>"]
+    for group_id in range(groups):
+        code = f"{rnd.randint(21, 26)}{rnd.choice(('INF', 'AiR', 'ZAR', 'MECH', 'BIO'))}-{rnd.choice(('SP', 'SZ', 'NP'))}"
+        parts.append(f"<ITEM><ID>{27000 + group_id}</ID><NAME>{code}</NAME><KOD>{code}</KOD></ITEM>")
+    parts.append("</ITEMS></ROOT>\n")
+    return "".join(parts).encode("utf-8")
+
+
+def _header(extra: tuple[tuple[str, str], ...] = ()) -> str:
+    fields = "".join(f"<{tag}>{escape(value)}</{tag}>" for tag, value in (*SEMESTER_HEADER, *extra))
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n<ROOT>{fields}'
+
+
+def _plan_item(rnd: random.Random, position_id: int, semester_id: str) -> str:
+    first_day = SEMESTER_START + timedelta(days=rnd.randrange(0, 5))
+    step = rnd.choice((1, 1, 2))
+    dates = ";".join((first_day + timedelta(weeks=w)).isoformat() for w in range(0, SEMESTER_WEEKS, step))
+    # Okolo 2% pozycji bez dat - parser tworzy wtedy jedno zdarzenie bez terminu.
+    termin = "" if rnd.random() < 0.02 else f"<TERMIN_DT>{dates}</TERMIN_DT>"
+
+    hour, minute = rnd.choice(HOURS)
+    end = hour * 60 + minute + CLASS_MINUTES
+    room = f"{rnd.choice(BUILDINGS)} sala {rnd.randint(1, 320)}"
+    if rnd.random() < 0.8:
+        sale, remarks = f"<SALE><NAME>{room}</NAME></SALE>", "<R_UWAGI></R_UWAGI>"
+    else:
+        sale, remarks = "", f"<R_UWAGI>zajęcia w s. {room}</R_UWAGI>"
+
+    return (
+        f"<ITEM><ID_POZYCJA>{position_id}</ID_POZYCJA><NAME>{escape(rnd.choice(SUBJECTS))}</NAME>"
+        f"<RZ>{rnd.choice(CLASS_TYPES)}</RZ><SORT>{escape(rnd.choice(TEACHERS))}</SORT>"
+        f"<PG>{rnd.choice(SUBGROUPS)}</PG><ID_SEMESTR>{semester_id}</ID_SEMESTR>"
+        f"<G_OD>{hour:02d}:{minute:02d}</G_OD><G_DO>{end // 60:02d}:{end % 60:02d}</G_DO>"
+        f"{termin}{sale}{remarks}</ITEM>"
+    )
+
+
+def write_scale(out_dir: str | Path, scale: PlanScale, seed: int = 0) -> list[Path]:
+    target = Path(out_dir)
+    target.mkdir(parents=True, exist_ok=True)
+    files = {
+        f"{scale.name}.plan.xml": generate_plan_xml(scale.plan_items, seed),
+        f"{scale.name}.kierunki.xml": generate_directions_xml(scale.directions, seed),
+        f"{scale.name}.grupy.xml": generate_groups_xml(scale.groups, seed),
+    }
+    written = []
+    for name, body in files.items():
+        path = target / name
+        path.write_bytes(body)
+        written.append(path)
+    return written
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", required=True, help="katalog docelowy")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="semestr")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    for path in write_scale(args.out, SCALES[args.scale], args.seed):
+        print(f"{path} ({path.stat().st_size / 1e6:.2f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+CHECKPOINT_FILE_ENV = "SCRAPER_CHECKPOINT_FILE"
+CHECKPOINT_EVERY_ENV = "SCRAPER_CHECKPOINT_EVERY"
+CHECKPOINT_MAX_AGE_ENV = "SCRAPER_CHECKPOINT_MAX_AGE_HOURS"
+CHECKPOINT_FILE_VERSION = 1
+# Co tyle encji etap zapisuje postep; tyle samo wlascicieli miesci sie w filtrze reconcilera.
+DEFAULT_CHECKPOINT_EVERY = 100
+# Starszy stan nie jest wznawiany - plany mogly sie w tym czasie zmienic.
+DEFAULT_MAX_AGE_HOURS = 24.0
+
+logger = logging.getLogger(__name__)
+
+
+class RunCheckpoint:
+    """Lokalny plik z postepem przebiegu: zakonczone etapy i encje zapisane w ramach etapu.
+
+    Przerwany przebieg (timeout joba, awaria) zostawia plik; kolejny przebieg w tym samym
+    trybie pomija zakonczone etapy i encje. Udany przebieg usuwa plik przez clear().
+    """
+
+    def __init__(self, path: str | Path, run_key: str, every: int = DEFAULT_CHECKPOINT_EVERY,
+                 max_age_hours: float = DEFAULT_MAX_AGE_HOURS) -> None:
+        self.path = Path(path)
+        self.run_key = run_key
+        self.every = max(1, every)
+        self.max_age_hours = max_age_hours
+        self.resumed = False
+        self._started_at = time.time()
+        self._stages_done: list[str] = []
+        self._entities: dict[str, set[str]] = {}
+        # Etapy grup i nauczycieli moga zapisywac postep rownolegle.
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def from_env(cls, run_key: str) -> Optional["RunCheckpoint"]:
+        path = os.getenv(CHECKPOINT_FILE_ENV, "").strip()
+        if not path:
+            return None
+        return cls(
+            path,
+            run_key,
+            every=_env_number(CHECKPOINT_EVERY_ENV, int, DEFAULT_CHECKPOINT_EVERY),
+            max_age_hours=_env_number(CHECKPOINT_MAX_AGE_ENV, float, DEFAULT_MAX_AGE_HOURS),
+        )
+
+    def stage_done(self, stage: str) -> bool:
+        with self._lock:
+            return stage in self._stages_done
+
+    def finish_stage(self, stage: str) -> None:
+        """Oznacza etap jako zakonczony; lista jego encji nie jest juz potrzebna."""
+        with self._lock:
+            if stage not in self._stages_done:
+                self._stages_done.append(stage)
+            self._entities.pop(stage, None)
+            self._save()
+
+    def completed(self, stage: str) -> set[str]:
+        with self._lock:
+            return set(self._entities.get(stage, ()))
+
+    def mark_completed(self, stage: str, entity_ids: Iterable[str]) -> None:
+        ids = [str(e) for e in entity_ids]
+        if not ids:
+            return
+        with self._lock:
+            self._entities.setdefault(stage, set()).update(ids)
+            self._save()
+
+    def clear(self) -> None:
+        """Przebieg zakonczony - nastepny zaczyna od zera."""
+        with self._lock:
+            self._stages_done = []
+            self._entities = {}
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.tmp")
+        payload = {
+            "version": CHECKPOINT_FILE_VERSION,
+            "run_key": self.run_key,
+            "started_at": self._started_at,
+            "stages_done": self._stages_done,
+            "entities": {stage: sorted(ids) for stage, ids in self._entities.items()},
+        }
+        tmp.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def _load(self) -> None:
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as exc:
+            logger.warning("Nieczytelny plik postepu %s (%s) - zaczynam od zera", self.path, exc)
+            return
+        if payload.get("version") != CHECKPOINT_FILE_VERSION or payload.get("run_key") != self.run_key:
+            return
+        started_at = float(payload.get("started_at") or 0)
+        if time.time() - started_at > self.max_age_hours * 3600:
+            logger.info("Plik postepu %s jest starszy niz %sh - zaczynam od zera", self.path, self.max_age_hours)
+            return
+        self._started_at = started_at
+        self._stages_done = list(payload.get("stages_done") or [])
+        self._entities = {stage: set(ids) for stage, ids in (payload.get("entities") or {}).items()}
+        self.resumed = bool(self._stages_done or self._entities)
+
+
+def _env_number(name: str, cast, default):
+    raw = os.getenv(name, "").strip()
+    try:
+        return cast(raw) if raw else default
+    except ValueError:
+        return default
@@ -1,14 +1,17 @@
 from __future__ import annotations
 import os
 import random
+import threading
 import time
 from pathlib import Path
 from dataclasses import asdict, is_dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional
 from datetime import datetime
 from dotenv import load_dotenv
 from supabase import create_client
 
+from scraper.metrics import DEFAULT_STAGE, get_metrics
+
 # Inicjalizacja klienta Supabase
 project_root = Path(__file__).resolve().parent.parent
 load_dotenv(project_root / ".env")
@@ -19,6 +22,34 @@ DELETE_CHUNK_SIZE = 50
 RETRY_MAX_ATTEMPTS = 5
 RETRY_BASE_DELAY_SECONDS = 1.0
 RETRY_MAX_DELAY_SECONDS = 12.0
+# Bufor zapisu zajec: paczka wielu grup/nauczycieli w jednym zadaniu PostgREST.
+COALESCE_FLUSH_ROWS = 1000
+COALESCE_FLUSH_SECONDS = 10.0
+# Zbiorcze czyszczenie nieaktualnych zajec raz na przebieg synchronizacji.
+RECONCILE_PAGE_SIZE = 1000
+# Kasowanie przez RPC (migracja *_delete_stale_zajecia.sql) - tablice ida w tresci POST, nie w URL-u.
+STALE_DELETE_RPC = "delete_stale_zajecia"
+# Przepiecie grup i ich zajec przy zmianie semestru (migracja *_remap_grupy_semester.sql).
+GROUP_REMAP_RPC = "remap_grupy_semester"
+RECONCILE_DELETE_CHUNK_SIZE = 5000
+# Przy malej liczbie encji filtrujemy po nich w zapytaniu zamiast czytac cala przyszlosc tabeli.
+RECONCILE_OWNER_FILTER_MAX = 100
+METADATA_UPSERT_CHUNK_SIZE = 500
+# Rozmiar strony przy czytaniu tabel (PostgREST domyslnie ucina odpowiedzi do max-rows).
+TABLE_PAGE_SIZE = 1000
+
+# Tabele zajec partycjonowane po id_semestru (migracja supabase/migrations/*_partition_zajecia_by_semester.sql).
+# Schemat rozpoznajemy funkcja z migracji; jej brak oznacza tabele sprzed partycjonowania.
+EVENTS_PARTITIONED_RPC = "zajecia_events_partitioned"
+EVENT_CONFLICT_TARGET = "uid"
+PARTITIONED_EVENT_CONFLICT_TARGET = "uid,id_semestru"
+# PGRST202: PostgREST nie zna funkcji, 42883: Postgres nie zna funkcji.
+MISSING_FUNCTION_CODES = {"PGRST202", "42883"}
+
+_events_partitioned: Optional[bool] = None
+_events_partitioned_lock = threading.Lock()
+# False po pierwszym "brak funkcji" - dalej kasujemy filtrami DELETE w malych paczkach.
+_stale_delete_rpc_available: Optional[bool] = None
 
 
 def _str(v: Any) -> str:
@@ -79,16 +110,107 @@ def save_kierunki(kierunki):
         supabase.table("kierunki").upsert(data, on_conflict="external_id").execute()
 
 
-def get_uuid_map(table, key_col, val_col):
-    res = supabase.table(table).select(f"{key_col}, {val_col}").execute()
-    return {str(row[key_col]).strip().lower(): row[val_col] for row in (res.data or [])}
+def events_partitioned() -> bool:
+    """Czy tabele zajec sa partycjonowane - sprawdzane w bazie raz na proces.
+
+    Blad inny niz brak funkcji konczy przebieg: zly klucz upsertu odrzucalby kazdy zapis zajec.
+    """
+    global _events_partitioned
+    with _events_partitioned_lock:
+        if _events_partitioned is None:
+            try:
+                res = supabase.rpc(EVENTS_PARTITIONED_RPC, {}).execute()
+                _events_partitioned = bool(res.data)
+            except Exception as exc:
+                if getattr(exc, "code", None) not in MISSING_FUNCTION_CODES:
+                    raise RuntimeError(f"Nie mozna ustalic schematu tabel zajec ({EVENTS_PARTITIONED_RPC}): {exc}") from exc
+                _events_partitioned = False
+        return _events_partitioned
+
+
+def event_conflict_target() -> str:
+    """Klucz upsertu zajec - po partycjonowaniu unikalnosc musi obejmowac id_semestru."""
+    return PARTITIONED_EVENT_CONFLICT_TARGET if events_partitioned() else EVENT_CONFLICT_TARGET
+
+
+def ensure_semester_partitions(semester_ids) -> int:
+    """Zaklada partycje zajec dla podanych semestrow (nic nie robi bez partycjonowania)."""
+    if not events_partitioned():
+        return 0
+    created = 0
+    for semester_id in dict.fromkeys(s for s in semester_ids if s):
+        res = supabase.rpc("ensure_zajecia_semester_partitions", {"p_id_semestru": str(semester_id)}).execute()
+        created += res.data or 0
+    return created
+
+
+def retire_semester(semester_id: str, archive: bool = True) -> int:
+    """Odlacza partycje semestru w obu tabelach zajec (archiwum albo DROP); zwraca liczbe partycji."""
+    res = supabase.rpc("retire_zajecia_semester", {"p_id_semestru": str(semester_id), "p_archive": archive}).execute()
+    return res.data or 0
+
+
+def iter_table_rows(table: str, columns: str = "*", key_col: str = "id",
+                    page_size: int = TABLE_PAGE_SIZE,
+                    filters: Optional[Callable[[Any], Any]] = None,
+                    stage: str = DEFAULT_STAGE,
+                    tie_col: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Czyta tabele strona po stronie (keyset po key_col), zwracajac wiersze jako generator.
+
+    key_col musi byc unikalny, chyba ze podano tie_col - wtedy unikalna jest para
+    (key_col, tie_col), np. (uid, id_semestru) w tabelach partycjonowanych. Po kazdej stronie
+    najpierw doczytujemy pozostale wiersze z ostatnim kluczem (wieksze tie_col, na koncu NULL -
+    jak w ORDER BY), a dopiero potem przechodzimy do wiekszych kluczy. filters dostaje zapytanie
+    i zwraca je z dodatkowymi warunkami (np. lambda q: q.gt("poczatek", "now()")). Konczymy
+    dopiero na pustej stronie, bo limit serwera moze byc mniejszy niz page_size.
+    """
+    select_cols = columns
+    if columns != "*":
+        listed = [c.strip() for c in columns.split(",")]
+        extra = [c for c in (key_col, tie_col) if c and c not in listed]
+        select_cols = ", ".join([columns, *extra])
+
+    def fetch(keyset: Callable[[Any], Any]) -> List[Dict[str, Any]]:
+        query = supabase.table(table).select(select_cols)
+        if filters is not None:
+            query = filters(query)
+        query = keyset(query).order(key_col)
+        if tie_col:
+            query = query.order(tie_col)
+        with get_metrics().timer("db_request_seconds", stage=stage, table=table, op="select"):
+            return query.limit(page_size).execute().data or []
+
+    last_key = None
+    last_tie = None
+    while True:
+        while tie_col and last_key is not None and last_tie is not None:
+            rest = fetch(lambda q: q.eq(key_col, last_key).gt(tie_col, last_tie))
+            if not rest:
+                # Przy NULLS NOT DISTINCT jest najwyzej jeden wiersz z NULL.
+                yield from fetch(lambda q: q.eq(key_col, last_key).is_(tie_col, "null"))
+                break
+            yield from rest
+            last_tie = rest[-1][tie_col]
+
+        rows = fetch(lambda q: q.gt(key_col, last_key) if last_key is not None else q)
+        if not rows:
+            return
+
+        yield from rows
+        last_key = rows[-1][key_col]
+        last_tie = rows[-1][tie_col] if tie_col else None
+
+
+def get_uuid_map(table, key_col, val_col, stage: str = DEFAULT_STAGE):
+    rows = iter_table_rows(table, f"{key_col}, {val_col}", key_col=key_col, stage=stage)
+    return {str(row[key_col]).strip().lower(): row[val_col] for row in rows}
 
 
-def save_grupy(grupy):
+def save_grupy(grupy, stage: str = DEFAULT_STAGE):
     # Pobierz obecne dane z bazy, aby nie nadpisac ich pustymi wartosciami z katalogu
     try:
-        res = supabase.table("grupy").select("grupa_id, tryb, semestr").execute()
-        existing = {row["grupa_id"]: row for row in (res.data or [])}
+        rows = iter_table_rows("grupy", "grupa_id, tryb, semestr", key_col="grupa_id", stage=stage)
+        existing = {row["grupa_id"]: row for row in rows}
     except Exception:
         existing = {}
 
@@ -121,6 +243,30 @@ def save_grupy(grupy):
         supabase.table("grupy").upsert(data, on_conflict="grupa_id").execute()
 
 
+def remap_groups_for_semester(remaps: List[Dict[str, Any]], stage: str = DEFAULT_STAGE) -> tuple[int, int]:
+    """Przepina grupy na nowe grupa_id razem z ich zajeciami w jednej transakcji (RPC GROUP_REMAP_RPC).
+
+    remaps to lista {id, old_grupa_id, new_grupa_id, nazwa}. Zwraca (grupy, zajecia). Blad
+    wycofuje cale przepiecie; brak funkcji w bazie konczy rollover bledem - bez niej grupy
+    i zajecia moglyby zostac przepiete tylko czesciowo.
+    """
+    metrics = get_metrics()
+    try:
+        with metrics.timer("db_request_seconds", stage=stage, table="grupy", op="rpc"):
+            res = supabase.rpc(GROUP_REMAP_RPC, {"p_remaps": remaps}).execute()
+    except Exception as exc:
+        metrics.inc("db_errors_total", stage=stage, table="grupy", op="rpc")
+        if getattr(exc, "code", None) in MISSING_FUNCTION_CODES:
+            raise RuntimeError(f"Brak funkcji {GROUP_REMAP_RPC} - wykonaj migracje "
+                               f"supabase/migrations/*_remap_grupy_semester.sql") from exc
+        raise
+    result = res.data or {}
+    groups, events = int(result.get("grupy", 0)), int(result.get("zajecia", 0))
+    metrics.inc("db_rows_total", groups, stage=stage, table="grupy", op="update")
+    metrics.inc("db_rows_total", events, stage=stage, table="zajecia_grupy", op="update")
+    return groups, events
+
+
 def _is_transient_supabase_error(exc: Exception) -> bool:
     msg = str(exc).lower()
     transient_markers = [
@@ -133,20 +279,26 @@ def _is_transient_supabase_error(exc: Exception) -> bool:
 def _upsert_with_retry(table_name: str, rows: List[Dict[str, Any]], on_conflict: str,
                        max_retries: int = RETRY_MAX_ATTEMPTS,
                        base_delay: float = RETRY_BASE_DELAY_SECONDS,
-                       max_delay: float = RETRY_MAX_DELAY_SECONDS):
+                       max_delay: float = RETRY_MAX_DELAY_SECONDS,
+                       stage: str = DEFAULT_STAGE):
     last_exc: Exception | None = None
+    metrics = get_metrics()
 
     for attempt in range(1, max_retries + 1):
         try:
-            supabase.table(table_name).upsert(rows, on_conflict=on_conflict).execute()
+            with metrics.timer("db_request_seconds", stage=stage, table=table_name, op="upsert"):
+                supabase.table(table_name).upsert(rows, on_conflict=on_conflict).execute()
+            metrics.inc("db_rows_total", len(rows), stage=stage, table=table_name, op="upsert")
             return
         except Exception as exc:
             last_exc = exc
             is_transient = _is_transient_supabase_error(exc)
             if not is_transient or attempt == max_retries:
+                metrics.inc("db_errors_total", stage=stage, table=table_name, op="upsert")
                 print(f"Blad upsert {table_name} (proba {attempt}/{max_retries}): {exc}")
                 raise
 
+            metrics.inc("db_retries_total", stage=stage, table=table_name, op="upsert")
             delay = min(max_delay, base_delay * (2 ** (attempt - 1))) + random.uniform(0, 0.4)
             print(f"Transient blad upsert {table_name} (proba {attempt}/{max_retries}), retry za {delay:.2f}s")
             time.sleep(delay)
@@ -155,7 +307,7 @@ def _upsert_with_retry(table_name: str, rows: List[Dict[str, Any]], on_conflict:
         raise last_exc
 
 
-def save_nauczyciele(teachers):
+def save_nauczyciele(teachers, stage: str = DEFAULT_STAGE):
     """Czyści i zapisuje nauczycieli do tabeli nauczyciele, deduplikując po external_id."""
     unique_data = {}
 
@@ -181,13 +333,102 @@ def save_nauczyciele(teachers):
     data = list(unique_data.values())
     if data:
         for chunk in chunks(data, UPSERT_CHUNK_SIZE):
-            _upsert_with_retry("nauczyciele", chunk, on_conflict="external_id")
+            _upsert_with_retry("nauczyciele", chunk, on_conflict="external_id", stage=stage)
+
+
+class EventWriteBuffer:
+    """Zbiera wiersze zajec z wielu grup/nauczycieli i zapisuje je pelnymi paczkami.
+
+    Paczka jest wysylana po uzbieraniu flush_rows wierszy albo po flush_seconds od
+    pierwszego wiersza w buforze. Gdy zapis paczki sie nie uda, wiersze sa zapisywane
+    ponownie osobno dla kazdej encji, a encje z bledem trafiaja do failed_owners.
+    """
+
+    def __init__(self, table_name: str, on_conflict: Optional[str] = None,
+                 flush_rows: int = COALESCE_FLUSH_ROWS,
+                 flush_seconds: float = COALESCE_FLUSH_SECONDS,
+                 stage: str = DEFAULT_STAGE):
+        self.table_name = table_name
+        self.on_conflict = on_conflict or event_conflict_target()
+        self.stage = stage
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.failed_owners: set[str] = set()
+        self.rows_written = 0
+        self.requests_sent = 0
+        self._pending: list[tuple[str, List[Dict[str, Any]]]] = []
+        self._pending_rows = 0
+        self._first_added_at: float | None = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+    def add(self, owner_id: str, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        if self._first_added_at is None:
+            self._first_added_at = time.monotonic()
+        self._pending.append((owner_id, rows))
+        self._pending_rows += len(rows)
+
+        if self._pending_rows >= self.flush_rows:
+            self._flush_full_batches()
+        elif time.monotonic() - self._first_added_at >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        """Zapisuje wszystko, co zostalo w buforze."""
+        while self._pending:
+            self._write(self._take(self.flush_rows))
+        self._first_added_at = None
+
+    def _flush_full_batches(self):
+        while self._pending_rows >= self.flush_rows:
+            self._write(self._take(self.flush_rows))
+        self._first_added_at = time.monotonic() if self._pending else None
+
+    def _take(self, limit: int) -> list[tuple[str, List[Dict[str, Any]]]]:
+        """Zdejmuje z bufora do limit wierszy; wiersze jednej encji moga zostac podzielone."""
+        batch = []
+        taken = 0
+        while self._pending and taken < limit:
+            owner_id, rows = self._pending[0]
+            room = limit - taken
+            if len(rows) <= room:
+                self._pending.pop(0)
+                batch.append((owner_id, rows))
+                taken += len(rows)
+            else:
+                batch.append((owner_id, rows[:room]))
+                self._pending[0] = (owner_id, rows[room:])
+                taken += room
+        self._pending_rows -= taken
+        return batch
+
+    def _write(self, batch: list[tuple[str, List[Dict[str, Any]]]]):
+        rows = [row for _, owner_rows in batch for row in owner_rows]
+        try:
+            self.requests_sent += 1
+            _upsert_with_retry(self.table_name, rows, on_conflict=self.on_conflict, stage=self.stage)
+            self.rows_written += len(rows)
+            return
+        except Exception as exc:
+            print(f"Blad zbiorczego upsert {self.table_name} ({len(rows)} wierszy), zapisuje per encja: {exc}")
 
+        for owner_id, owner_rows in batch:
+            try:
+                self.requests_sent += 1
+                _upsert_with_retry(self.table_name, owner_rows, on_conflict=self.on_conflict, stage=self.stage)
+                self.rows_written += len(owner_rows)
+            except Exception as exc:
+                self.failed_owners.add(owner_id)
+                print(f"Blad upsert {self.table_name} dla {owner_id}: {exc}")
 
-def save_zajecia_grupy(events, grupa_id_target: str):
-    if not events:
-        return 0
 
+def build_zajecia_grupy_rows(events, grupa_id_target: str) -> List[Dict[str, Any]]:
     batch_data = []
     seen_uids = set()
 
@@ -215,36 +456,10 @@ def save_zajecia_grupy(events, grupa_id_target: str):
             "grupa_id": grupa_id_target
         })
 
-    if batch_data:
-        for b in chunks(batch_data, UPSERT_CHUNK_SIZE):
-            try:
-                supabase.table("zajecia_grupy").upsert(b, on_conflict="uid").execute()
-            except Exception as e:
-                print(f"Blad upsert grupy {grupa_id_target}: {e}")
-
-    if seen_uids:
-        try:
-            res = supabase.table("zajecia_grupy").select("uid") \
-                .eq("grupa_id", grupa_id_target) \
-                .gt("poczatek", "now()") \
-                .execute()
-
-            future_uids_in_db = [row["uid"] for row in (res.data or [])]
-            uids_to_delete = [uid for uid in future_uids_in_db if uid not in seen_uids]
-
-            if uids_to_delete:
-                for chunk in chunks(uids_to_delete, DELETE_CHUNK_SIZE):
-                    supabase.table("zajecia_grupy").delete().in_("uid", chunk).execute()
-        except Exception as e:
-            print(f"Blad czyszczenia zajec grupy {grupa_id_target}: {e}")
-
-    return len(batch_data)
-
+    return batch_data
 
-def save_zajecia_nauczyciela(events, nauczyciel_uuid: str):
-    if not events:
-        return 0
 
+def build_zajecia_nauczyciela_rows(events, nauczyciel_uuid: str) -> List[Dict[str, Any]]:
     seen_uids = set()
     batch_data = []
 
@@ -274,28 +489,272 @@ def save_zajecia_nauczyciela(events, nauczyciel_uuid: str):
             "nauczyciel_id": nauczyciel_uuid
         })
 
-    if batch_data:
-        for b in chunks(batch_data, UPSERT_CHUNK_SIZE):
+    return batch_data
+
+
+def _delete_stale_future_events(table_name: str, owner_col: str, owner_id: str, seen_uids: set):
+    res = supabase.table(table_name).select("uid") \
+        .eq(owner_col, owner_id) \
+        .gt("poczatek", "now()") \
+        .execute()
+
+    future_uids_in_db = [row["uid"] for row in (res.data or [])]
+    uids_to_delete = [uid for uid in future_uids_in_db if uid not in seen_uids]
+
+    if uids_to_delete:
+        for chunk in chunks(uids_to_delete, DELETE_CHUNK_SIZE):
+            supabase.table(table_name).delete().in_("uid", chunk).execute()
+
+
+class MetadataUpdateBatch:
+    """Zbiera zmiany kolumn istniejacych wierszy (np. tryb/semestr grup) i zapisuje je zbiorczo.
+
+    existing to aktualny stan tabeli {klucz: wiersz}; kolumny z row_columns sa wysylane
+    w kazdym wierszu upsertu (PostgREST wymaga tych samych kluczy w calej paczce).
+    Zmiany zgodne z tym, co juz jest w bazie, sa pomijane.
+    """
+
+    def __init__(self, table_name: str, key_col: str, existing: Dict[str, Dict[str, Any]],
+                 row_columns: tuple[str, ...], chunk_size: int = METADATA_UPSERT_CHUNK_SIZE,
+                 stage: str = DEFAULT_STAGE):
+        self.table_name = table_name
+        self.stage = stage
+        self.key_col = key_col
+        self.existing = existing
+        self.row_columns = row_columns
+        self.chunk_size = chunk_size
+        self.failed_keys: set[str] = set()
+        self._changes: dict[str, Dict[str, Any]] = {}
+
+    def set(self, key: str, values: Dict[str, Any]):
+        current = self.existing.get(key)
+        if current is None:
+            return
+        changed = {col: val for col, val in values.items() if current.get(col) != val}
+        if changed:
+            self._changes.setdefault(key, {}).update(changed)
+
+    def apply(self) -> int:
+        """Zapisuje zebrane zmiany; zwraca liczbe zaktualizowanych wierszy."""
+        changed_cols = sorted({col for values in self._changes.values() for col in values})
+        columns = list(dict.fromkeys((self.key_col, *self.row_columns, *changed_cols)))
+
+        rows = []
+        for key, values in self._changes.items():
+            current = self.existing[key]
+            row = {col: current.get(col) for col in columns}
+            row.update(values)
+            row[self.key_col] = key
+            rows.append(row)
+
+        updated = 0
+        for chunk in chunks(rows, self.chunk_size):
             try:
-                supabase.table("zajecia_nauczyciela").upsert(b, on_conflict="uid").execute()
+                _upsert_with_retry(self.table_name, chunk, on_conflict=self.key_col, stage=self.stage)
+                updated += len(chunk)
             except Exception as e:
-                print(f"Blad upsert nauczyciela {nauczyciel_uuid}: {e}")
+                self.failed_keys.update(row[self.key_col] for row in chunk)
+                print(f"Blad zbiorczej aktualizacji {self.table_name}: {e}")
+
+        for key, values in self._changes.items():
+            if key not in self.failed_keys:
+                self.existing[key].update(values)
+        self._changes = {}
+        return updated
+
+
+class StaleEventReconciler:
+    """Usuwa przyszle zajecia, ktorych nie ma juz w planach - jednym przebiegiem na koniec synchronizacji.
+
+    W trakcie synchronizacji track() zapamietuje aktualne UID-y kazdej encji. run() pobiera
+    stronami wszystkie przyszle UID-y tych encji i kasuje roznice duzymi paczkami.
+    Encje, ktorych nie przekazano do track(), nie sa dotykane. Przy tabelach partycjonowanych
+    wiersz identyfikuje para (uid, id_semestru): przyszle wiersze encji z kazdego semestru,
+    ktorych nie ma w planie (np. stary semestr po rolloverze), sa usuwane.
+    """
+
+    def __init__(self, table_name: str, owner_col: str,
+                 page_size: int = RECONCILE_PAGE_SIZE,
+                 delete_chunk_size: int = RECONCILE_DELETE_CHUNK_SIZE,
+                 stage: str = DEFAULT_STAGE):
+        self.table_name = table_name
+        self.owner_col = owner_col
+        self.stage = stage
+        self.page_size = page_size
+        self.delete_chunk_size = delete_chunk_size
+        self._seen: dict[str, set] = {}
+
+    def track(self, owner_id: str, rows):
+        """Zapamietuje zapisane wiersze zajec encji (wystarcza uid i id_semestru)."""
+        self._seen.setdefault(str(owner_id), set()).update(_event_key(row) for row in rows)
+
+    def run(self) -> int:
+        """Zwraca liczbe usunietych wierszy. Po przebiegu sledzone encje sa zapominane,
+        wiec run() mozna wolac co jakis czas dla kolejnych porcji encji."""
+        if not self._seen:
+            return 0
+        try:
+            return self._delete_stale()
+        finally:
+            self._seen = {}
 
-    if seen_uids:
+    def _delete_stale(self) -> int:
+        stale = []
         try:
-            res = supabase.table("zajecia_nauczyciela").select("uid") \
-                .eq("nauczyciel_id", nauczyciel_uuid) \
-                .gt("poczatek", "now()") \
-                .execute()
+            for row in self._iter_future_rows():
+                owner_seen = self._seen.get(str(row[self.owner_col]))
+                if owner_seen is not None and _event_key(row) not in owner_seen:
+                    stale.append((row["uid"], row[self.owner_col], row["id_semestru"]))
+        except Exception as e:
+            print(f"Blad pobierania przyszlych zajec z {self.table_name}: {e}")
+            return 0
+
+        metrics = get_metrics()
+        deleted = 0
+        for chunk in chunks(stale, self.delete_chunk_size):
+            deleted += self._delete_chunk(chunk, metrics)
+        return deleted
+
+    def _delete_chunk(self, chunk, metrics) -> int:
+        global _stale_delete_rpc_available
+        if _stale_delete_rpc_available is False:
+            return self._delete_by_filters(chunk, metrics)
+
+        # Wiersz jest usuwany tylko, gdy nadal nalezy do tej encji (mogl go w miedzyczasie
+        # przejac inny shard) i ma ten sam semestr.
+        params = {
+            "p_table": self.table_name,
+            "p_uids": [uid for uid, _, _ in chunk],
+            "p_owners": [str(owner) for _, owner, _ in chunk],
+            "p_semesters": [semester for _, _, semester in chunk],
+        }
+        try:
+            with metrics.timer("db_request_seconds", stage=self.stage, table=self.table_name, op="delete"):
+                res = supabase.rpc(STALE_DELETE_RPC, params).execute()
+        except Exception as e:
+            if getattr(e, "code", None) not in MISSING_FUNCTION_CODES:
+                metrics.inc("db_errors_total", stage=self.stage, table=self.table_name, op="delete")
+                print(f"Blad usuwania nieaktualnych zajec z {self.table_name}: {e}")
+                return 0
+            _stale_delete_rpc_available = False
+            print(f"Brak funkcji {STALE_DELETE_RPC} w bazie - kasuje filtrami DELETE po {DELETE_CHUNK_SIZE} wierszy.")
+            return self._delete_by_filters(chunk, metrics)
+
+        _stale_delete_rpc_available = True
+        deleted = res.data or 0
+        metrics.inc("db_rows_total", deleted, stage=self.stage, table=self.table_name, op="delete")
+        return deleted
+
+    def _delete_by_filters(self, chunk, metrics) -> int:
+        """Kasowanie bez RPC: filtry in.(...) w URL-u, wiec paczki musza byc male."""
+        partitioned = events_partitioned()
+        by_semester: dict = {}
+        for uid, owner, semester in chunk:
+            # Bez partycji uid jest unikalny - semestr nie zaweza kasowania.
+            by_semester.setdefault(semester if partitioned else None, []).append((uid, owner))
+
+        deleted = 0
+        for semester, semester_stale in by_semester.items():
+            for part in chunks(semester_stale, DELETE_CHUNK_SIZE):
+                try:
+                    query = (
+                        supabase.table(self.table_name).delete()
+                        .in_("uid", [uid for uid, _ in part])
+                        .in_(self.owner_col, sorted({owner for _, owner in part}))
+                    )
+                    if partitioned:
+                        # Ten sam uid moze byc aktualny w innym semestrze.
+                        query = query.eq("id_semestru", semester) if semester is not None \
+                            else query.is_("id_semestru", "null")
+                    with metrics.timer("db_request_seconds", stage=self.stage, table=self.table_name, op="delete"):
+                        query.execute()
+                    deleted += len(part)
+                    metrics.inc("db_rows_total", len(part), stage=self.stage, table=self.table_name, op="delete")
+                except Exception as e:
+                    metrics.inc("db_errors_total", stage=self.stage, table=self.table_name, op="delete")
+                    print(f"Blad usuwania nieaktualnych zajec z {self.table_name}: {e}")
+        return deleted
+
+    def _iter_future_rows(self):
+        owners = list(self._seen)
+        owner_filter = owners if len(owners) <= RECONCILE_OWNER_FILTER_MAX else None
+
+        def future_only(query):
+            query = query.gt("poczatek", "now()")
+            if owner_filter is not None:
+                query = query.in_(self.owner_col, owner_filter)
+            return query
+
+        # Po partycjonowaniu uid nie jest unikalny - stronicujemy po (uid, id_semestru).
+        return iter_table_rows(self.table_name, f"uid, {self.owner_col}, id_semestru", key_col="uid",
+                               page_size=self.page_size, filters=future_only, stage=self.stage,
+                               tie_col="id_semestru" if events_partitioned() else None)
+
+
+def _event_key(row: Dict[str, Any]):
+    """Klucz wiersza zajec: uid, a w tabelach partycjonowanych para (uid, id_semestru)."""
+    if events_partitioned():
+        return row["uid"], row.get("id_semestru")
+    return row["uid"]
+
+
+def save_zajecia_grupy(events, grupa_id_target: str, writer: EventWriteBuffer | None = None,
+                       reconciler: StaleEventReconciler | None = None):
+    """Zapisuje zajecia grupy; z writerem upsert trafia do wspolnego bufora,
+    a z reconcilerem czyszczenie nieaktualnych zajec odbywa sie zbiorczo w reconciler.run()."""
+    if not events:
+        return 0
 
-            future_uids_in_db = [row["uid"] for row in (res.data or [])]
-            uids_to_delete = [uid for uid in future_uids_in_db if uid not in seen_uids]
+    batch_data = build_zajecia_grupy_rows(events, grupa_id_target)
+    seen_uids = {row["uid"] for row in batch_data}
 
-            if uids_to_delete:
-                for chunk in chunks(uids_to_delete, DELETE_CHUNK_SIZE):
-                    supabase.table("zajecia_nauczyciela").delete().in_("uid", chunk).execute()
+    if batch_data:
+        if writer is not None:
+            writer.add(grupa_id_target, batch_data)
+        else:
+            for b in chunks(batch_data, UPSERT_CHUNK_SIZE):
+                try:
+                    supabase.table("zajecia_grupy").upsert(b, on_conflict=event_conflict_target()).execute()
+                except Exception as e:
+                    print(f"Blad upsert grupy {grupa_id_target}: {e}")
+
+    if seen_uids and reconciler is not None:
+        reconciler.track(grupa_id_target, batch_data)
+    elif seen_uids:
+        try:
+            _delete_stale_future_events("zajecia_grupy", "grupa_id", grupa_id_target, seen_uids)
         except Exception as e:
-            print(f"Blad czyszczenia zajęć nauczyciela {nauczyciel_uuid}: {e}")
+            print(f"Blad czyszczenia zajec grupy {grupa_id_target}: {e}")
 
     return len(batch_data)
 
+
+def save_zajecia_nauczyciela(events, nauczyciel_uuid: str, writer: EventWriteBuffer | None = None,
+                             reconciler: StaleEventReconciler | None = None):
+    """Zapisuje zajecia nauczyciela; z writerem upsert trafia do wspolnego bufora,
+    a z reconcilerem czyszczenie nieaktualnych zajec odbywa sie zbiorczo w reconciler.run()."""
+    if not events:
+        return 0
+
+    batch_data = build_zajecia_nauczyciela_rows(events, nauczyciel_uuid)
+    seen_uids = {row["uid"] for row in batch_data}
+
+    if batch_data:
+        if writer is not None:
+            writer.add(nauczyciel_uuid, batch_data)
+        else:
+            for b in chunks(batch_data, UPSERT_CHUNK_SIZE):
+                try:
+                    supabase.table("zajecia_nauczyciela").upsert(b, on_conflict=event_conflict_target()).execute()
+                except Exception as e:
+                    print(f"Blad upsert nauczyciela {nauczyciel_uuid}: {e}")
+
+    if seen_uids and reconciler is not None:
+        reconciler.track(nauczyciel_uuid, batch_data)
+    elif seen_uids:
+        try:
+            _delete_stale_future_events("zajecia_nauczyciela", "nauczyciel_id", nauczyciel_uuid, seen_uids)
+        except Exception as e:
+            print(f"Blad czyszczenia zajęć nauczyciela {nauczyciel_uuid}: {e}")
+
+    return len(batch_data)
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Iterable, Optional
+
+DIGEST_FILE_ENV = "SCRAPER_DIGEST_FILE"
+DIGEST_FILE_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+def compute_plan_digest(contents: Iterable[tuple[str, str]]) -> str:
+    """Skrot SHA-256 ze wszystkich plikow planu encji (zrodlo + tresc)."""
+    h = hashlib.sha256()
+    for source, content in contents:
+        h.update(source.encode("utf-8"))
+        h.update(b"\0")
+        h.update(content.encode("utf-8") if isinstance(content, str) else content)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class DigestStore:
+    """Lokalny plik ze skrotami planow z ostatniego udanego zapisu (grupy / nauczyciele).
+
+    Obok skrotu mozna zapisac metadane wyliczone z planu (np. e-mail i jednostka nauczyciela),
+    zeby przy pominieciu niezmienionego planu odtworzyc je bez parsowania.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._digests: dict[str, dict[str, str]] = {}
+        self._meta: dict[str, dict[str, dict]] = {}
+        self._dirty = False
+        # Etapy grup i nauczycieli moga dzielic jeden magazyn i dzialac rownolegle.
+        self._lock = threading.Lock()
+        self._load()
+
+    @classmethod
+    def from_env(cls) -> Optional["DigestStore"]:
+        path = os.getenv(DIGEST_FILE_ENV, "").strip()
+        return cls(path) if path else None
+
+    def is_unchanged(self, kind: str, entity_id: str, digest: str) -> bool:
+        with self._lock:
+            return self._digests.get(kind, {}).get(str(entity_id)) == digest
+
+    def meta(self, kind: str, entity_id: str) -> Optional[dict]:
+        """Metadane zapisane razem z ostatnim skrotem encji (None, gdy ich nie zapisano)."""
+        with self._lock:
+            return self._meta.get(kind, {}).get(str(entity_id))
+
+    def record(self, kind: str, entity_id: str, digest: str, meta: Optional[dict] = None) -> None:
+        with self._lock:
+            self._digests.setdefault(kind, {})[str(entity_id)] = digest
+            if meta is not None:
+                self._meta.setdefault(kind, {})[str(entity_id)] = meta
+            else:
+                self._meta.get(kind, {}).pop(str(entity_id), None)
+            self._dirty = True
+
+    def forget(self, kind: str, entity_id: str) -> None:
+        with self._lock:
+            self._meta.get(kind, {}).pop(str(entity_id), None)
+            if self._digests.get(kind, {}).pop(str(entity_id), None) is not None:
+                self._dirty = True
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.tmp")
+            payload = {"version": DIGEST_FILE_VERSION, "digests": self._digests, "meta": self._meta}
+            tmp.write_text(json.dumps(payload), encoding="utf-8")
+            os.replace(tmp, self.path)
+            self._dirty = False
+
+    def _load(self) -> None:
+        try:
+            payload = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as exc:
+            logger.warning("Nieczytelny plik skrotow %s (%s) - zaczynam od zera", self.path, exc)
+            return
+        if payload.get("version") == DIGEST_FILE_VERSION:
+            self._digests = payload.get("digests") or {}
+            self._meta = payload.get("meta") or {}
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+from scraper.xml_client import XmlClient, XmlFetchResult
+
+DEFAULT_FETCH_WORKERS = 8
+FETCH_WORKERS_ENV = "SCRAPER_FETCH_WORKERS"
+# Ile zadan moze czekac w kolejce na jednego workera (ogranicza pamiec na pobrane XML).
+PENDING_PER_WORKER = 4
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass(frozen=True)
+class TaskOutcome:
+    item: object
+    result: object = None
+    error: Optional[Exception] = None
+
+
+@dataclass(frozen=True)
+class PlanFetchResult:
+    entity_id: str
+    results: dict[str, XmlFetchResult] = field(default_factory=dict)
+    errors: dict[str, Exception] = field(default_factory=dict)
+
+    def contents(self, sources: Iterable[str]) -> list[tuple[str, str | bytes]]:
+        """Zwraca (zrodlo, xml) w kolejnosci zrodel, tylko dla plikow z trescia (bajty lub tekst)."""
+        out = []
+        for source in sources:
+            res = self.results.get(source)
+            if res is not None and res.payload:
+                out.append((source, res.payload))
+        return out
+
+
+def resolve_worker_count(workers: Optional[int] = None) -> int:
+    """Liczba workerow: argument > zmienna SCRAPER_FETCH_WORKERS > domyslna."""
+    if workers is None:
+        raw = os.getenv(FETCH_WORKERS_ENV, "").strip()
+        try:
+            workers = int(raw) if raw else DEFAULT_FETCH_WORKERS
+        except ValueError:
+            workers = DEFAULT_FETCH_WORKERS
+    return max(1, workers)
+
+
+def run_bounded(
+    func: Callable[[T], R],
+    items: Iterable[T],
+    workers: Optional[int] = None,
+) -> Iterator[TaskOutcome]:
+    """Wykonuje func dla kazdego elementu w puli watkow i zwraca wyniki w kolejnosci wejscia.
+
+    Wyjatek jednego zadania nie przerywa pozostalych - trafia do TaskOutcome.error.
+    """
+    workers = resolve_worker_count(workers)
+
+    if workers == 1:
+        for item in items:
+            try:
+                yield TaskOutcome(item=item, result=func(item))
+            except Exception as exc:
+                yield TaskOutcome(item=item, error=exc)
+        return
+
+    max_pending = workers * PENDING_PER_WORKER
+    pending: deque[tuple[T, Future]] = deque()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="xml-fetch") as pool:
+        for item in items:
+            pending.append((item, pool.submit(func, item)))
+            if len(pending) >= max_pending:
+                yield _collect(*pending.popleft())
+
+        while pending:
+            yield _collect(*pending.popleft())
+
+
+def fetch_entity_plans(client: XmlClient, entity_id: str, sources: list[str]) -> PlanFetchResult:
+    """Pobiera wszystkie zrodla planu jednej encji; blad jednego zrodla nie przerywa pozostalych."""
+    results: dict[str, XmlFetchResult] = {}
+    errors: dict[str, Exception] = {}
+    for source in sources:
+        try:
+            results[source] = client.fetch_xml(f"{source}.ID={entity_id}.xml")
+        except Exception as exc:
+            errors[source] = exc
+    return PlanFetchResult(entity_id=entity_id, results=results, errors=errors)
+
+
+def _collect(item, future: Future) -> TaskOutcome:
+    try:
+        return TaskOutcome(item=item, result=future.result())
+    except Exception as exc:
+        return TaskOutcome(item=item, error=exc)
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Iterator, Optional
+
+MAX_INFLIGHT_ENV = "SCRAPER_HTTP_MAX_INFLIGHT"
+RATE_LIMIT_ENV = "SCRAPER_HTTP_RATE_LIMIT"
+
+DEFAULT_MAX_INFLIGHT = 16
+DEFAULT_INITIAL_INFLIGHT = 4
+DEFAULT_MIN_INFLIGHT = 1
+# Odpowiedz wolniejsza niz ten prog traktujemy jak sygnal przeciazenia serwera.
+DEFAULT_LATENCY_TARGET_SECONDS = 2.0
+DEFAULT_DECREASE_FACTOR = 0.5
+# Waga najnowszej proby w sredniej kroczacej czasu odpowiedzi.
+LATENCY_EWMA_ALPHA = 0.2
+# Co ile klient asyncio sprawdza, czy zwolnilo sie miejsce w limicie.
+ASYNC_POLL_SECONDS = 0.01
+
+OUTCOME_OK = "ok"
+OUTCOME_OVERLOAD = "overload"
+
+
+class TokenBucket:
+    """Gorny limit zapytan na sekunde; `burst` tokenow mozna wydac od razu."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Pobiera jeden token, w razie potrzeby czekajac; zwraca czas oczekiwania."""
+        waited = 0.0
+        while (delay := self.try_take()) > 0:
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+    async def acquire_async(self) -> float:
+        waited = 0.0
+        while (delay := self.try_take()) > 0:
+            await asyncio.sleep(delay)
+            waited += delay
+        return waited
+
+    def try_take(self) -> float:
+        """Pobiera token bez czekania: 0 = sukces, inaczej czas do nastepnego tokenu."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+
+@dataclass(frozen=True)
+class FlowState:
+    limit: int
+    in_flight: int
+    latency_ewma_seconds: Optional[float]
+    requests: int
+    overloads: int
+    decreases: int
+    rate_limit: Optional[float]
+    throttled_seconds: float
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class AdaptiveConcurrencyController:
+    """Wspolny limit rownoleglych zapytan do serwera planow (AIMD).
+
+    Kazda udana odpowiedz w czasie ponizej progu podnosi limit o 1/limit (czyli o jeden
+    na pelne "okno" zapytan), a 5xx, timeout lub zbyt wolna odpowiedz obniza go
+    mnozac przez `decrease_factor` - najwyzej raz na okres progu, zeby seria bledow
+    z zapytan wyslanych jednoczesnie nie zbila limitu do minimum.
+    """
+
+    def __init__(
+        self,
+        max_limit: int = DEFAULT_MAX_INFLIGHT,
+        initial_limit: int = DEFAULT_INITIAL_INFLIGHT,
+        min_limit: int = DEFAULT_MIN_INFLIGHT,
+        latency_target_seconds: float = DEFAULT_LATENCY_TARGET_SECONDS,
+        decrease_factor: float = DEFAULT_DECREASE_FACTOR,
+        rate_limit: Optional[float] = None,
+    ) -> None:
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.latency_target_seconds = latency_target_seconds
+        self.decrease_factor = decrease_factor
+        self.bucket = TokenBucket(rate_limit) if rate_limit else None
+
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._latency_ewma: Optional[float] = None
+        self._last_decrease = 0.0
+        self._requests = 0
+        self._overloads = 0
+        self._decreases = 0
+        self._throttled = 0.0
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_env(cls) -> "AdaptiveConcurrencyController":
+        max_limit = _env_number(MAX_INFLIGHT_ENV, int, DEFAULT_MAX_INFLIGHT)
+        rate_limit = _env_number(RATE_LIMIT_ENV, float, 0.0)
+        return cls(
+            max_limit=max_limit,
+            initial_limit=min(DEFAULT_INITIAL_INFLIGHT, max_limit),
+            rate_limit=rate_limit if rate_limit > 0 else None,
+        )
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Rezerwuje miejsce na jedno zapytanie (blokuje, gdy limit jest wyczerpany)."""
+        started = time.monotonic()
+        with self._cond:
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+        try:
+            if self.bucket:
+                self.bucket.acquire()
+            self._add_throttled(time.monotonic() - started)
+            yield
+        finally:
+            self._leave()
+
+    @asynccontextmanager
+    async def slot_async(self) -> AsyncIterator[None]:
+        """Wersja slot() dla petli asyncio - czeka przez asyncio.sleep, nie blokuje petli."""
+        started = time.monotonic()
+        while not self._try_enter():
+            await asyncio.sleep(ASYNC_POLL_SECONDS)
+        try:
+            if self.bucket:
+                await self.bucket.acquire_async()
+            self._add_throttled(time.monotonic() - started)
+            yield
+        finally:
+            self._leave()
+
+    def _try_enter(self) -> bool:
+        with self._cond:
+            if self._in_flight >= int(self._limit):
+                return False
+            self._in_flight += 1
+            return True
+
+    def _leave(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    def _add_throttled(self, seconds: float) -> None:
+        with self._cond:
+            self._throttled += seconds
+
+    def record(self, latency_seconds: Optional[float], outcome: str = OUTCOME_OK) -> None:
+        """Aktualizuje limit po zakonczonym zapytaniu."""
+        with self._cond:
+            self._requests += 1
+            if latency_seconds is not None:
+                if self._latency_ewma is None:
+                    self._latency_ewma = latency_seconds
+                else:
+                    self._latency_ewma += LATENCY_EWMA_ALPHA * (latency_seconds - self._latency_ewma)
+
+            slow = latency_seconds is not None and latency_seconds > self.latency_target_seconds
+            if outcome == OUTCOME_OVERLOAD or slow:
+                if outcome == OUTCOME_OVERLOAD:
+                    self._overloads += 1
+                now = time.monotonic()
+                if now - self._last_decrease >= self.latency_target_seconds:
+                    self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+                    self._last_decrease = now
+                    self._decreases += 1
+                return
+
+            before = int(self._limit)
+            self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+            if int(self._limit) > before:
+                self._cond.notify_all()
+
+    def state(self) -> FlowState:
+        with self._cond:
+            return FlowState(
+                limit=int(self._limit),
+                in_flight=self._in_flight,
+                latency_ewma_seconds=round(self._latency_ewma, 4) if self._latency_ewma is not None else None,
+                requests=self._requests,
+                overloads=self._overloads,
+                decreases=self._decreases,
+                rate_limit=self.bucket.rate if self.bucket else None,
+                throttled_seconds=round(self._throttled, 3),
+            )
+
+
+_shared_controller: Optional[AdaptiveConcurrencyController] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_controller() -> AdaptiveConcurrencyController:
+    """Jeden kontroler na proces - etapy grup i nauczycieli pytaja ten sam serwer."""
+    global _shared_controller
+    with _shared_lock:
+        if _shared_controller is None:
+            _shared_controller = AdaptiveConcurrencyController.from_env()
+        return _shared_controller
+
+
+def _env_number(name: str, cast, default):
+    raw = os.getenv(name, "").strip()
+    try:
+        return cast(raw) if raw else default
+    except ValueError:
+        return default
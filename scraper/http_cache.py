@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+HTTP_CACHE_DIR_ENV = "SCRAPER_HTTP_CACHE_DIR"
+HTTP_CACHE_MAX_MB_ENV = "SCRAPER_HTTP_CACHE_MAX_MB"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Po przekroczeniu limitu czyscimy do tego ulamka, zeby nie ewikowac przy kazdym zapisie.
+EVICT_TARGET_RATIO = 0.9
+
+BODY_SUFFIX = ".body"
+META_SUFFIX = ".meta.json"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    url: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body: bytes
+
+
+class HttpCache:
+    """Dyskowy cache odpowiedzi HTTP (ETag / Last-Modified) z limitem rozmiaru (LRU)."""
+
+    def __init__(self, directory: str | Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = sum(p.stat().st_size for p in self.directory.glob(f"*{BODY_SUFFIX}"))
+
+    @classmethod
+    def from_env(cls) -> Optional["HttpCache"]:
+        directory = os.getenv(HTTP_CACHE_DIR_ENV, "").strip()
+        if not directory:
+            return None
+        max_mb = os.getenv(HTTP_CACHE_MAX_MB_ENV, "").strip()
+        try:
+            max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES
+        except ValueError:
+            max_bytes = DEFAULT_MAX_BYTES
+        return cls(directory, max_bytes=max_bytes)
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        body_path, meta_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            body = body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url:
+            return None
+        return CacheEntry(url=url, etag=meta.get("etag"), last_modified=meta.get("last_modified"), body=body)
+
+    def conditional_headers(self, entry: Optional[CacheEntry]) -> dict[str, str]:
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(self, url: str, etag: Optional[str], last_modified: Optional[str], body: bytes) -> None:
+        if not etag and not last_modified:
+            return
+        if len(body) > self.max_bytes:
+            return
+
+        body_path, meta_path = self._paths(url)
+        meta = {"url": url, "etag": etag, "last_modified": last_modified}
+
+        with self._lock:
+            old_size = body_path.stat().st_size if body_path.exists() else 0
+            try:
+                _atomic_write(body_path, body)
+                _atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+            except OSError as exc:
+                logger.warning("Nie udalo sie zapisac cache dla %s: %s", url, exc)
+                return
+            self._total_bytes += len(body) - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def touch(self, url: str) -> None:
+        """Oznacza wpis jako swiezo uzyty (kolejnosc LRU liczona po mtime)."""
+        _, meta_path = self._paths(url)
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        target = int(self.max_bytes * EVICT_TARGET_RATIO)
+        entries = []
+        for meta_path in self.directory.glob(f"*{META_SUFFIX}"):
+            try:
+                entries.append((meta_path.stat().st_mtime, meta_path))
+            except OSError:
+                continue
+
+        for _, meta_path in sorted(entries):
+            if self._total_bytes <= target:
+                break
+            body_path = meta_path.with_name(meta_path.name[: -len(META_SUFFIX)] + BODY_SUFFIX)
+            try:
+                size = body_path.stat().st_size
+                body_path.unlink()
+                meta_path.unlink(missing_ok=True)
+            except OSError:
+                continue
+            self._total_bytes -= size
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.directory / f"{key}{BODY_SUFFIX}", self.directory / f"{key}{META_SUFFIX}"
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
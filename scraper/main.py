@@ -2,22 +2,50 @@ from __future__ import annotations
 
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict
 from scraper.db import (
+    ensure_semester_partitions,
+    events_partitioned,
+    retire_semester,
     save_semester_state,
     get_semester_state,
     supabase,
 )
+from scraper.checkpoint import RunCheckpoint
+from scraper.digest_store import DigestStore
+from scraper.flow_control import get_shared_controller
+from scraper.metrics import get_metrics
+from scraper.profiling import profile_stage, profiling_enabled
+from scraper.semester_manager import (
+    detect_semester_switch,
+    parse_semester_state_from_db,
+    parse_semester_state_from_meta,
+)
+from scraper.sharding import SHARD_COUNT_ENV, SHARD_INDEX_ENV, ShardSpec
 from scraper.xml_client import XmlClient
-from scraper.xml_sync import sync_directions_and_groups_from_xml
+from scraper.xml_sync import METRICS_STAGE as CATALOG_METRICS_STAGE, sync_directions_and_groups_from_xml
 
 # Aliasy trybow uruchomienia przez SCRAPER_ONLY.
 MODE_FULL = {"full", "all", "pipeline"}
 MODE_CATALOG = {"catalog_only", "catalog", "semester_guard", "guard"}
 MODE_XML_BOOTSTRAP = {"xml_bootstrap", "xml_semester"}
 MODE_XML_SYNC = {"xml_sync", "xml_groups", "kierunki", "grupy"}
+MODE_ROLLOVER = {"rollover", "semester_rollover"}
+MODE_RETIRE_SEMESTER = {"retire_semester", "archive_semester"}
 MODE_GROUP_EVENTS = {"grupy_zajecia", "groups_events", "events_groups"}
 MODE_TEACHER_EVENTS = {"teachers", "teacher_events", "nauczyciele"}
 
+# W trybie full etapy planow grup i nauczycieli dzialaja rownolegle (0 = jeden po drugim).
+PARALLEL_EVENT_STAGES_ENV = "SCRAPER_PARALLEL_EVENT_STAGES"
+# Tryb retire_semester: ktory semestr odlaczyc i czy zachowac go w schemacie archiwum (0 = DROP).
+RETIRE_SEMESTER_ID_ENV = "SCRAPER_RETIRE_SEMESTER_ID"
+RETIRE_ARCHIVE_ENV = "SCRAPER_RETIRE_ARCHIVE"
+
+# Etap katalogow w pliku postepu (SCRAPER_CHECKPOINT_FILE); etapy zajec maja CHECKPOINT_STAGE w swoich modulach.
+STAGE_CATALOG = "catalog"
+
 
 def reset_database():
     """Czyści tabele bazy danych przed synchronizacją (opcjonalnie)."""
@@ -38,60 +66,160 @@ def reset_database():
             print(f"  - Błąd podczas czyszczenia '{table}': {e}")
 
 
-def _run_xml_bootstrap() -> tuple[bool, str]:
+def _run_xml_bootstrap() -> tuple[bool, str, dict]:
     print("TRYB: xml_bootstrap (Weryfikacja stanu semestru)")
-    client = XmlClient()
+    client = XmlClient(stage="bootstrap")
 
     # Pobieramy metadane z nagłówka XML
     meta = client.fetch_semester_meta_from_file("grupy_lista_kierunkow.xml")
 
-    # Zapisujemy bieżący stan semestrów do bazy
-    save_semester_state({
+    # Poprzedni stan czytamy przed zapisem, inaczej porownalibysmy semestr sam ze soba.
+    prev_state = parse_semester_state_from_db(get_semester_state())
+    switch = detect_semester_switch(prev_state, parse_semester_state_from_meta(asdict(meta)))
+
+    state = {
         "current_semester_id": meta.current_semester_id,
         "current_semester_name": meta.current_semester_name_pl,
         "previous_semester_id": meta.previous_semester_id,
         "previous_semester_name": meta.previous_semester_name_pl
-    })
+    }
+    # Partycje zakladamy przed zapisem zajec, zeby nowy semestr nie trafial do partycji domyslnej.
+    ensure_semester_partitions([meta.current_semester_id, meta.previous_semester_id])
 
-    # Detekcja zmiany semestru (porównanie z poprzednim zapisem)
-    prev_state = get_semester_state()
-    if prev_state and prev_state.get("id_semestru_aktualny") != meta.current_semester_id:
-        print(f"!!! WYKRYTO ZMIANĘ SEMESTRU: {meta.current_semester_id} !!!")
-        return True, "semester_changed"
+    if switch.switched:
+        print(f"!!! WYKRYTO ZMIANĘ SEMESTRU: {switch.old_semester_id} -> {switch.new_semester_id} ({switch.reason}) !!!")
+        # Nowy semestr zapisuje dopiero udany rollover - do tego czasu kazdy przebieg wykrywa zmiane ponownie.
+        return True, "semester_changed", state
 
-    return False, "no_change"
+    # Zapisujemy bieżący stan semestrów do bazy
+    save_semester_state(state)
+    return False, "no_change", state
 
 
-def _run_xml_sync() -> None:
+def _run_xml_sync(rollover: bool = False, digests=None) -> None:
     print("TRYB: xml_catalog_sync (Synchronizacja katalogów)")
-    result = sync_directions_and_groups_from_xml(verbose=True)
+    with _stage_timer(CATALOG_METRICS_STAGE), profile_stage(CATALOG_METRICS_STAGE):
+        result = sync_directions_and_groups_from_xml(verbose=True, rollover=rollover, digests=digests)
     print(f"Wynik synchronizacji katalogów: {result}")
+    _record_stage_result(CATALOG_METRICS_STAGE, result)
 
 
-def _run_catalog_only() -> None:
+def _run_catalog_only(digests=None, force_rollover: bool = False, shard=None) -> None:
     print("TRYB: catalog_only")
-    _run_xml_bootstrap()
-    _run_xml_sync()
+    # Katalogi i rollover sa wspolne dla wszystkich shardow - wykonuje je tylko shard 0.
+    if shard and not shard.is_primary:
+        print(f"Shard {shard.label}: synchronizacje katalogow wykonuje shard 0 - pomijam.")
+        return
+    with profile_stage("bootstrap"):
+        switched, _, state = _run_xml_bootstrap()
+    # Zmiana semestru nie wymaga czyszczenia bazy: grupy sa przepinane na nowe kody z zachowaniem UUID.
+    _run_xml_sync(rollover=switched or force_rollover, digests=digests)
+    if switched:
+        save_semester_state(state)
+        print(f"Zapisano stan semestru {state['current_semester_id']} po przepieciu grup.")
+
+
+def _run_retire_semester() -> None:
+    semester_id = os.getenv(RETIRE_SEMESTER_ID_ENV, "").strip()
+    if not semester_id:
+        print(f"TRYB: retire_semester wymaga zmiennej {RETIRE_SEMESTER_ID_ENV}")
+        return
+    archive = os.getenv(RETIRE_ARCHIVE_ENV, "1").strip() != "0"
+    print(f"TRYB: retire_semester ({semester_id}, {'archiwum' if archive else 'usuniecie'})")
+    retired = retire_semester(semester_id, archive=archive)
+    print(f"Odlaczono {retired} partycji zajec semestru {semester_id}")
 
 
-def _run_group_events() -> None:
+def _run_group_events(digests=None, checkpoint=None, shard=None) -> None:
     print("TRYB: synchronizacja_planow_grup")
-    from scraper.run_events import main as run_group_events
-    run_group_events()
+    from scraper.run_events import CHECKPOINT_STAGE, METRICS_STAGE, main as run_group_events
+    if _stage_already_done(checkpoint, CHECKPOINT_STAGE):
+        return
+    with _stage_timer(METRICS_STAGE), profile_stage(METRICS_STAGE):
+        result = run_group_events(digests=digests, checkpoint=checkpoint, shard=shard)
+    print(f"Wynik synchronizacji grup: {result}")
+    _record_stage_result(METRICS_STAGE, result)
+    if checkpoint:
+        checkpoint.finish_stage(CHECKPOINT_STAGE)
 
 
-def _run_teacher_events() -> None:
+def _run_teacher_events(digests=None, checkpoint=None, shard=None) -> None:
     print("TRYB: synchronizacja_planow_nauczycieli")
-    from scraper.teacher_sync import sync_teacher_events_and_meta
-    result = sync_teacher_events_and_meta(verbose=True)
+    from scraper.teacher_sync import CHECKPOINT_STAGE, METRICS_STAGE, sync_teacher_events_and_meta
+    if _stage_already_done(checkpoint, CHECKPOINT_STAGE):
+        return
+    with _stage_timer(METRICS_STAGE), profile_stage(METRICS_STAGE):
+        result = sync_teacher_events_and_meta(verbose=True, digests=digests, checkpoint=checkpoint, shard=shard)
     print(f"Wynik synchronizacji nauczycieli: {result}")
+    _record_stage_result(METRICS_STAGE, result)
+    if checkpoint:
+        checkpoint.finish_stage(CHECKPOINT_STAGE)
+
+
+@contextmanager
+def _stage_timer(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        get_metrics().set_gauge("stage_seconds", round(time.perf_counter() - started, 3), stage=stage)
 
 
-def _run_full() -> None:
+def _record_stage_result(stage: str, result) -> None:
+    """Wynik etapu trafia do raportu JSON, a wykorzystanie etapow potoku do metryk."""
+    metrics = get_metrics()
+    metrics.add_section(f"stage.{stage}", result)
+    pipeline = result.get("pipeline") if isinstance(result, dict) else None
+    for pipeline_stage, stats in (pipeline or {}).get("stages", {}).items():
+        labels = {"stage": stage, "pipeline_stage": pipeline_stage}
+        metrics.set_gauge("pipeline_items", stats["items"], **labels)
+        metrics.set_gauge("pipeline_busy_seconds", stats["busy_seconds"], **labels)
+        metrics.set_gauge("pipeline_blocked_seconds", stats["blocked_seconds"], **labels)
+        metrics.set_gauge("pipeline_utilisation", stats["utilisation"], **labels)
+
+
+def _write_metrics(duration: float) -> None:
+    metrics = get_metrics()
+    metrics.set_gauge("run_seconds", round(duration, 3))
+    flow = get_shared_controller().state()
+    metrics.add_section("flow", flow.as_dict())
+    metrics.set_gauge("http_flow_limit", flow.limit)
+    metrics.set_gauge("http_flow_decreases", flow.decreases)
+    metrics.set_gauge("http_flow_throttled_seconds", flow.throttled_seconds)
+    for path in metrics.write_reports():
+        print(f"Zapisano metryki: {path}")
+
+
+def _stage_already_done(checkpoint, stage: str) -> bool:
+    if checkpoint and checkpoint.stage_done(stage):
+        print(f"Wznowienie: etap '{stage}' zakonczony w przerwanym przebiegu - pomijam.")
+        return True
+    return False
+
+
+def _run_full(checkpoint=None, shard=None) -> None:
     print("TRYB: pelna_synchronizacja (Full Pipeline)")
-    _run_catalog_only()
-    _run_group_events()
-    _run_teacher_events()
+    # Wszystkie etapy dziela jeden magazyn skrotow, zeby zaden nie nadpisal zapisow drugiego.
+    digests = DigestStore.from_env()
+    if not _stage_already_done(checkpoint, STAGE_CATALOG):
+        _run_catalog_only(digests, shard=shard)
+        if checkpoint:
+            checkpoint.finish_stage(STAGE_CATALOG)
+
+    # Domyslnie etapy ida po kolei; rownolegle tylko na zadanie (SCRAPER_PARALLEL_EVENT_STAGES=1).
+    # Profil etapu obejmuje watki uruchomione w jego trakcie, wiec przy profilowaniu zawsze po kolei.
+    if os.getenv(PARALLEL_EVENT_STAGES_ENV, "0").strip() != "1" or profiling_enabled():
+        _run_group_events(digests, checkpoint, shard)
+        _run_teacher_events(digests, checkpoint, shard)
+        return
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="stage") as pool:
+        stages = [
+            pool.submit(_run_group_events, digests, checkpoint, shard),
+            pool.submit(_run_teacher_events, digests, checkpoint, shard),
+        ]
+        for stage in stages:
+            stage.result()
 
 
 def main() -> None:
@@ -99,27 +227,53 @@ def main() -> None:
     start_time = time.time()
 
     # reset_database()  # Odkoduj tę linię, jeśli chcesz wyczyścić bazę przed startem.
+    # Zmiana semestru tego nie wymaga - obsluguje ja rollover w trybie catalog/full.
 
     mode = os.getenv("SCRAPER_ONLY", "").lower().strip()
+    shard = ShardSpec.from_env()
+    if shard:
+        print(f"Shard {shard.label} ({SHARD_INDEX_ENV}/{SHARD_COUNT_ENV})")
+    # Postep przerwanego przebiegu wznawiamy tylko w tym samym trybie i shardzie.
+    run_key = mode or "default"
+    checkpoint = RunCheckpoint.from_env(f"{run_key}@{shard.label}" if shard else run_key)
+    if checkpoint and checkpoint.resumed:
+        print(f"Wznawiam przerwany przebieg z pliku postepu {checkpoint.path}")
 
-    if mode in MODE_FULL:
-        _run_full()
-    elif mode in MODE_CATALOG:
-        _run_catalog_only()
-    elif mode in MODE_XML_BOOTSTRAP:
-        _run_xml_bootstrap()
-    elif mode in MODE_XML_SYNC:
-        _run_xml_sync()
-    elif mode in MODE_GROUP_EVENTS:
-        _run_group_events()
-    elif mode in MODE_TEACHER_EVENTS:
-        _run_teacher_events()
-    else:
-        if mode:
-            print(f"Nieznany tryb SCRAPER_ONLY='{mode}' -> uruchamiam domyślną synchronizację katalogów")
+    # Metryki zapisujemy takze po bledzie - wtedy najbardziej przydaja sie do porownan.
+    succeeded = False
+    try:
+        # Schemat tabel zajec ustalamy przed pierwszym zapisem - blad wykrycia przerywa przebieg.
+        print(f"Tabele zajec: {'partycjonowane po id_semestru' if events_partitioned() else 'bez partycji'}")
+        if mode in MODE_FULL:
+            _run_full(checkpoint, shard)
+        elif mode in MODE_CATALOG:
+            _run_catalog_only(shard=shard)
+        elif mode in MODE_XML_BOOTSTRAP:
+            _run_xml_bootstrap()
+        elif mode in MODE_XML_SYNC:
+            _run_xml_sync()
+        elif mode in MODE_ROLLOVER:
+            _run_catalog_only(DigestStore.from_env(), force_rollover=True, shard=shard)
+        elif mode in MODE_RETIRE_SEMESTER:
+            _run_retire_semester()
+        elif mode in MODE_GROUP_EVENTS:
+            _run_group_events(checkpoint=checkpoint, shard=shard)
+        elif mode in MODE_TEACHER_EVENTS:
+            _run_teacher_events(checkpoint=checkpoint, shard=shard)
         else:
-            print("Brak zdefiniowanego trybu -> uruchamiam domyślną synchronizację katalogów")
-        _run_catalog_only()
+            if mode:
+                print(f"Nieznany tryb SCRAPER_ONLY='{mode}' -> uruchamiam domyślną synchronizację katalogów")
+            else:
+                print("Brak zdefiniowanego trybu -> uruchamiam domyślną synchronizację katalogów")
+            _run_catalog_only(shard=shard)
+
+        # Przebieg doszedl do konca - nastepny zaczyna od zera.
+        if checkpoint:
+            checkpoint.clear()
+        succeeded = True
+    finally:
+        get_metrics().set_gauge("run_success", int(succeeded), mode=run_key)
+        _write_metrics(time.time() - start_time)
 
     duration = time.time() - start_time
     minutes = int(duration // 60)
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+
+METRICS_JSON_ENV = "SCRAPER_METRICS_JSON"
+METRICS_PROM_ENV = "SCRAPER_METRICS_PROM"
+METRIC_PREFIX = "scraper_"
+DEFAULT_STAGE = "other"
+
+# Progi histogramow (sekundy / sztuki); ostatni kubelek +Inf jest dodawany automatycznie.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+PARSE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 10, 50, 100, 250, 500, 1000, 5000)
+
+# Opisy metryk do plikow Prometheusa (# HELP); nazwy bez prefiksu.
+METRIC_HELP = {
+    "http_requests_total": "Zapytania HTTP do serwera planow wg statusu.",
+    "http_response_bytes_total": "Bajty tresci odpowiedzi HTTP (po rozpakowaniu).",
+    "http_request_seconds": "Czas zapytania HTTP.",
+    "http_cache_hits_total": "Odpowiedzi 304 obsluzone z lokalnego cache.",
+    "parse_seconds": "Czas parsowania jednego pliku planu.",
+    "parse_events_per_file": "Liczba zajec w jednym pliku planu.",
+    "parse_files_total": "Sparsowane pliki planow.",
+    "parse_errors_total": "Pliki planow z bledem parsowania.",
+    "db_request_seconds": "Czas zapytania do Supabase.",
+    "db_rows_total": "Wiersze zapisane lub usuniete w Supabase.",
+    "db_retries_total": "Ponowienia zapytan do Supabase po bledzie przejsciowym.",
+    "db_errors_total": "Nieudane zapytania do Supabase.",
+    "stage_seconds": "Czas trwania etapu synchronizacji.",
+    "run_seconds": "Czas trwania calego przebiegu.",
+    "run_success": "1 gdy przebieg zakonczyl sie bez wyjatku.",
+    "pipeline_items": "Elementy przetworzone przez etap potoku.",
+    "pipeline_busy_seconds": "Laczny czas pracy workerow etapu potoku.",
+    "pipeline_blocked_seconds": "Czas blokady etapu potoku na pelnej kolejce.",
+    "pipeline_utilisation": "Wykorzystanie workerow etapu potoku (0-1).",
+    "http_flow_limit": "Limit rownoleglych zapytan na koniec przebiegu.",
+    "http_flow_decreases": "Liczba obnizen limitu rownoleglych zapytan.",
+    "http_flow_throttled_seconds": "Laczny czas oczekiwania na miejsce w limicie zapytan.",
+}
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: tuple) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        out, running = [], 0
+        for bound, n in zip((*self.buckets, math.inf), self.counts):
+            running += n
+            out.append(("+Inf" if bound == math.inf else _format_number(bound), running))
+        return out
+
+
+class MetricsRegistry:
+    """Liczniki, wskazniki i histogramy z etykietami; zapis jako raport JSON i plik textfile Prometheusa.
+
+    Wszystkie metody sa bezpieczne dla watkow - metryki zapisuja watki fetch/parse
+    obu etapow oraz petla klienta asyncio.
+    """
+
+    def __init__(self) -> None:
+        self._counters: dict[tuple, float] = {}
+        self._gauges: dict[tuple, float] = {}
+        self._histograms: dict[tuple, _Histogram] = {}
+        self._sections: dict[str, object] = {}
+        self._started_at = datetime.now(timezone.utc)
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, buckets: tuple = LATENCY_BUCKETS, **labels) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram(buckets)
+            hist.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, buckets: tuple = LATENCY_BUCKETS, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, buckets=buckets, **labels)
+
+    def add_section(self, name: str, data: object) -> None:
+        """Dolacza do raportu JSON gotowy slownik (np. wynik etapu, raport potoku)."""
+        with self._lock:
+            self._sections[name] = data
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "started_at": self._started_at.isoformat(),
+                "finished_at": datetime.now(timezone.utc).isoformat(),
+                "counters": [_entry(key, value) for key, value in sorted(self._counters.items())],
+                "gauges": [_entry(key, value) for key, value in sorted(self._gauges.items())],
+                "histograms": [
+                    _entry(key, {
+                        "count": hist.count,
+                        "sum": round(hist.total, 6),
+                        "buckets": dict(hist.cumulative()),
+                    })
+                    for key, hist in sorted(self._histograms.items())
+                ],
+                "sections": dict(self._sections),
+            }
+
+    def to_prometheus(self) -> str:
+        lines: list[str] = []
+        with self._lock:
+            for kind, series in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, items in _group_by_name(series).items():
+                    _header(lines, name, kind)
+                    for labels, value in items:
+                        lines.append(f"{METRIC_PREFIX}{name}{_labels(labels)} {_format_number(value)}")
+            for name, items in _group_by_name(self._histograms).items():
+                _header(lines, name, "histogram")
+                for labels, hist in items:
+                    for le, count in hist.cumulative():
+                        lines.append(f"{METRIC_PREFIX}{name}_bucket{_labels(labels + (('le', le),))} {count}")
+                    lines.append(f"{METRIC_PREFIX}{name}_sum{_labels(labels)} {_format_number(hist.total)}")
+                    lines.append(f"{METRIC_PREFIX}{name}_count{_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_reports(self, json_path: Optional[str] = None, prom_path: Optional[str] = None) -> list[Path]:
+        """Zapisuje raporty (sciezki domyslnie z SCRAPER_METRICS_JSON / SCRAPER_METRICS_PROM)."""
+        json_path = json_path or os.getenv(METRICS_JSON_ENV, "").strip()
+        prom_path = prom_path or os.getenv(METRICS_PROM_ENV, "").strip()
+        written = []
+        if json_path:
+            written.append(_write_atomic(json_path, json.dumps(self.as_dict(), indent=2, default=str)))
+        if prom_path:
+            written.append(_write_atomic(prom_path, self.to_prometheus()))
+        return written
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Jeden rejestr na proces - wszystkie etapy raportuja do tego samego pliku."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+        return _registry
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+
+def _entry(key: tuple, value) -> dict:
+    name, labels = key
+    return {"name": name, "labels": dict(labels), "value": value}
+
+
+def _group_by_name(series: dict) -> dict[str, list]:
+    grouped: dict[str, list] = {}
+    for (name, labels), value in sorted(series.items(), key=lambda kv: kv[0]):
+        grouped.setdefault(name, []).append((labels, value))
+    return grouped
+
+
+def _header(lines: list[str], name: str, kind: str) -> None:
+    if name in METRIC_HELP:
+        lines.append(f"# HELP {METRIC_PREFIX}{name} {METRIC_HELP[name]}")
+    lines.append(f"# TYPE {METRIC_PREFIX}{name} {kind}")
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{k}="{_escape(v)}"' for k, v in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _write_atomic(path: str, text: str) -> Path:
+    # node_exporter czyta textfile w dowolnej chwili - podmieniamy plik atomowo.
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f"{target.name}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, target)
+    return target
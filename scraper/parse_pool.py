@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import marshal
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Optional
+
+from scraper.xml_parsers import (
+    XmlGroupPlan,
+    XmlScheduleEvent,
+    XmlTeacherPlan,
+    parse_group_plan,
+    parse_group_plan_events,
+    parse_teacher_plan,
+)
+
+PARSE_PROCESSES_ENV = "SCRAPER_PARSE_PROCESSES"
+
+# Rodzaje zadan wykonywanych w procesach potomnych.
+TASK_EVENTS = "events"
+TASK_GROUP = "group"
+TASK_TEACHER = "teacher"
+
+
+class PlanParsePool:
+    """Pula procesow parsujacych pliki planow (opcjonalna, omija GIL).
+
+    Do procesu trafiaja surowe bajty XML, a wraca zwarta paczka zserializowana przez
+    marshal: krotki napisow zamiast obiektow XmlScheduleEvent, daty jako liczby.
+    Metody sa bezpieczne do wolania z wielu watkow (np. z parserow StagedPipeline).
+    """
+
+    def __init__(self, processes: int) -> None:
+        self.processes = processes
+        # spawn zamiast fork: proces glowny ma juz dzialajace watki (pula HTTP, potok).
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    @classmethod
+    def from_env(cls, processes: Optional[int] = None) -> Optional["PlanParsePool"]:
+        """Zwraca pule tylko, gdy wlaczono wiecej niz jeden proces (SCRAPER_PARSE_PROCESSES)."""
+        if processes is None:
+            raw = os.getenv(PARSE_PROCESSES_ENV, "").strip()
+            try:
+                processes = int(raw) if raw else 0
+            except ValueError:
+                processes = 0
+        return cls(processes) if processes > 1 else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def parse_plan_events(self, xml_content: str | bytes) -> list[XmlScheduleEvent]:
+        events, _ = self._submit(TASK_EVENTS, xml_content)
+        return events
+
+    def parse_group_plan(self, xml_content: str | bytes) -> XmlGroupPlan:
+        events, meta = self._submit(TASK_GROUP, xml_content)
+        return XmlGroupPlan(events=events, study_mode=meta.get("study_mode"), semester=meta.get("semester"))
+
+    def parse_teacher_plan(self, xml_content: str | bytes) -> XmlTeacherPlan:
+        events, meta = self._submit(TASK_TEACHER, xml_content)
+        return XmlTeacherPlan(events=events, email=meta.get("email"), units=list(meta.get("units") or []))
+
+    def _submit(self, task: str, xml_content: str | bytes) -> tuple[list[XmlScheduleEvent], dict]:
+        xml_bytes = xml_content if isinstance(xml_content, bytes) else xml_content.encode("utf-8")
+        return decode_plan_batch(self._executor.submit(_parse_in_worker, task, xml_bytes).result())
+
+
+def encode_plan_batch(events: list[XmlScheduleEvent], meta: Optional[dict] = None) -> bytes:
+    rows = [
+        (
+            e.external_uid, e.subject, e.starts_at, e.ends_at, e.room, e.class_type,
+            e.teacher_name, e.groups_label, e.subgroup, e.id_semestru,
+            tuple(d.toordinal() for d in e.raw_dates),
+        )
+        for e in events
+    ]
+    return marshal.dumps((rows, meta or {}))
+
+
+def decode_plan_batch(payload: bytes) -> tuple[list[XmlScheduleEvent], dict]:
+    rows, meta = marshal.loads(payload)
+    events = [
+        XmlScheduleEvent(*row[:10], raw_dates=[date.fromordinal(o) for o in row[10]])
+        for row in rows
+    ]
+    return events, meta
+
+
+def _parse_in_worker(task: str, xml_bytes: bytes) -> bytes:
+    # Parsery przyjmuja bajty bezposrednio, wiec w procesie potomnym nie ma dekodowania do str.
+    if task == TASK_TEACHER:
+        plan = parse_teacher_plan(xml_bytes)
+        return encode_plan_batch(plan.events, {"email": plan.email, "units": plan.units})
+    if task == TASK_GROUP:
+        plan = parse_group_plan(xml_bytes)
+        return encode_plan_batch(plan.events, {"study_mode": plan.study_mode, "semester": plan.semester})
+    return encode_plan_batch(parse_group_plan_events(xml_bytes))
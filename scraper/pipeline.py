@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import heapq
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Optional
+
+from scraper.fetch_engine import resolve_worker_count
+
+PARSE_WORKERS_ENV = "SCRAPER_PARSE_WORKERS"
+QUEUE_SIZE_ENV = "SCRAPER_PIPELINE_QUEUE_SIZE"
+DEFAULT_PARSE_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 32
+
+_STOP = object()
+
+
+@dataclass(frozen=True)
+class PipelineItem:
+    """Wynik przejscia jednego elementu przez etapy fetch i parse (trafia do writera)."""
+    item: Any
+    fetched: Any = None
+    parsed: Any = None
+    error: Optional[Exception] = None
+    error_stage: Optional[str] = None
+
+
+@dataclass
+class StageStats:
+    workers: int
+    items: int = 0
+    busy_seconds: float = 0.0
+    # Czas zablokowania na pelnej kolejce wyjsciowej (backpressure od kolejnego etapu).
+    blocked_seconds: float = 0.0
+
+    def utilisation(self, wall_seconds: float) -> float:
+        if wall_seconds <= 0 or self.workers <= 0:
+            return 0.0
+        return min(1.0, self.busy_seconds / (wall_seconds * self.workers))
+
+
+@dataclass
+class PipelineReport:
+    name: str
+    wall_seconds: float = 0.0
+    stages: dict[str, StageStats] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return {
+            "wall_seconds": round(self.wall_seconds, 3),
+            "stages": {
+                stage: {
+                    "workers": stats.workers,
+                    "items": stats.items,
+                    "busy_seconds": round(stats.busy_seconds, 3),
+                    "blocked_seconds": round(stats.blocked_seconds, 3),
+                    "utilisation": round(stats.utilisation(self.wall_seconds), 3),
+                }
+                for stage, stats in self.stages.items()
+            },
+        }
+
+    def print_summary(self) -> None:
+        print(f"[PIPELINE {self.name}] czas: {self.wall_seconds:.1f}s")
+        for stage, stats in self.stages.items():
+            print(
+                f"  - {stage}: {stats.items} el., workerow {stats.workers}, "
+                f"wykorzystanie {stats.utilisation(self.wall_seconds) * 100:.0f}%, "
+                f"blokada na kolejce {stats.blocked_seconds:.1f}s"
+            )
+
+
+def resolve_parse_workers(workers: Optional[int] = None) -> int:
+    return _resolve_int(workers, PARSE_WORKERS_ENV, DEFAULT_PARSE_WORKERS)
+
+
+def resolve_queue_size(size: Optional[int] = None) -> int:
+    return _resolve_int(size, QUEUE_SIZE_ENV, DEFAULT_QUEUE_SIZE)
+
+
+class StagedPipeline:
+    """Potok fetch -> parse -> write z ograniczonymi kolejkami miedzy etapami.
+
+    fetch i parse dzialaja w pulach watkow, write w watku wywolujacym run(), zawsze
+    w kolejnosci wejscia. Liczba elementow w locie jest ograniczona, wiec wolny
+    writer (albo wolny parser) wstrzymuje pobieranie zamiast zapelniac pamiec.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fetch: Callable[[Any], Any],
+        parse: Callable[[Any, Any], Any],
+        write: Callable[[PipelineItem], None],
+        fetch_workers: Optional[int] = None,
+        parse_workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+    ) -> None:
+        self.name = name
+        self.fetch = fetch
+        self.parse = parse
+        self.write = write
+        self.fetch_workers = resolve_worker_count(fetch_workers)
+        self.parse_workers = resolve_parse_workers(parse_workers)
+        self.queue_size = resolve_queue_size(queue_size)
+
+    def run(self, items: Iterable[Any]) -> PipelineReport:
+        report = PipelineReport(
+            name=self.name,
+            stages={
+                "fetch": StageStats(workers=self.fetch_workers),
+                "parse": StageStats(workers=self.parse_workers),
+                "write": StageStats(workers=1),
+            },
+        )
+        stats_lock = threading.Lock()
+        fetch_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        parse_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        write_q: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        in_flight = threading.BoundedSemaphore(self._max_in_flight())
+        abort = threading.Event()
+
+        def account(stage: str, busy: float, blocked: float) -> None:
+            with stats_lock:
+                stats = report.stages[stage]
+                stats.items += 1
+                stats.busy_seconds += busy
+                stats.blocked_seconds += blocked
+
+        def feeder() -> None:
+            try:
+                for seq, item in enumerate(items):
+                    while not in_flight.acquire(timeout=0.5):
+                        if abort.is_set():
+                            return
+                    if abort.is_set():
+                        return
+                    fetch_q.put((seq, item))
+            finally:
+                for _ in range(self.fetch_workers):
+                    fetch_q.put(_STOP)
+
+        def fetch_worker() -> None:
+            while (task := fetch_q.get()) is not _STOP:
+                seq, item = task
+                start = time.perf_counter()
+                try:
+                    out = (seq, PipelineItem(item=item, fetched=self.fetch(item)))
+                except Exception as exc:
+                    out = (seq, PipelineItem(item=item, error=exc, error_stage="fetch"))
+                busy = time.perf_counter() - start
+                account("fetch", busy, _timed_put(parse_q, out))
+
+        def parse_worker() -> None:
+            while (task := parse_q.get()) is not _STOP:
+                seq, result = task
+                start = time.perf_counter()
+                if result.error is None:
+                    try:
+                        result = PipelineItem(item=result.item, fetched=result.fetched,
+                                              parsed=self.parse(result.item, result.fetched))
+                    except Exception as exc:
+                        result = PipelineItem(item=result.item, fetched=result.fetched,
+                                              error=exc, error_stage="parse")
+                busy = time.perf_counter() - start
+                account("parse", busy, _timed_put(write_q, (seq, result)))
+
+        feeder_thread = threading.Thread(target=feeder, name=f"{self.name}-feed", daemon=True)
+        fetchers = [threading.Thread(target=fetch_worker, name=f"{self.name}-fetch-{i}", daemon=True)
+                    for i in range(self.fetch_workers)]
+        parsers = [threading.Thread(target=parse_worker, name=f"{self.name}-parse-{i}", daemon=True)
+                   for i in range(self.parse_workers)]
+
+        def close_parsers() -> None:
+            for t in fetchers:
+                t.join()
+            for _ in parsers:
+                parse_q.put(_STOP)
+            for t in parsers:
+                t.join()
+            write_q.put(_STOP)
+
+        closer = threading.Thread(target=close_parsers, name=f"{self.name}-close", daemon=True)
+
+        started = time.perf_counter()
+        for t in (feeder_thread, *fetchers, *parsers, closer):
+            t.start()
+
+        # Writer: przywraca kolejnosc wejscia i zapisuje w biezacym watku.
+        reorder: list[tuple[int, PipelineItem]] = []
+        next_seq = 0
+        try:
+            while (task := write_q.get()) is not _STOP:
+                seq, result = task
+                heapq.heappush(reorder, (seq, result))
+                while reorder and reorder[0][0] == next_seq:
+                    _, ready = heapq.heappop(reorder)
+                    start = time.perf_counter()
+                    try:
+                        self.write(ready)
+                    finally:
+                        account("write", time.perf_counter() - start, 0.0)
+                        in_flight.release()
+                    next_seq += 1
+        except BaseException:
+            abort.set()
+            # Odblokowujemy watki, zeby mogly sie zakonczyc (wyniki sa porzucane).
+            _drain_until_stop(write_q)
+            raise
+        finally:
+            feeder_thread.join()
+            closer.join()
+            report.wall_seconds = time.perf_counter() - started
+
+        return report
+
+    def _max_in_flight(self) -> int:
+        return self.fetch_workers + self.parse_workers + 3 * self.queue_size
+
+
+def _timed_put(q: queue.Queue, value) -> float:
+    start = time.perf_counter()
+    q.put(value)
+    return time.perf_counter() - start
+
+
+def _drain_until_stop(q: queue.Queue) -> None:
+    while q.get() is not _STOP:
+        pass
+
+
+def _resolve_int(value: Optional[int], env_name: str, default: int) -> int:
+    if value is None:
+        raw = os.getenv(env_name, "").strip()
+        try:
+            value = int(raw) if raw else default
+        except ValueError:
+            value = default
+    return max(1, value)
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import io
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+PROFILE_DIR_ENV = "SCRAPER_PROFILE"
+PROFILE_TOP_ENV = "SCRAPER_PROFILE_TOP"
+DEFAULT_PROFILE_TOP = 25
+# Glebokosc stosu zapamietywana przez tracemalloc dla kazdej alokacji.
+TRACEMALLOC_FRAMES = 10
+# Od Pythona 3.12 cProfile korzysta z sys.monitoring i sam obejmuje wszystkie watki.
+PER_THREAD_PROFILES = sys.version_info < (3, 12)
+
+
+def profiling_enabled() -> bool:
+    return bool(os.getenv(PROFILE_DIR_ENV, "").strip())
+
+
+@contextmanager
+def profile_stage(stage: str) -> Iterator[None]:
+    """Profiluje etap (cProfile + tracemalloc), gdy ustawiono SCRAPER_PROFILE=<katalog>.
+
+    Bez zmiennej nic nie jest importowane ani wlaczane. Profil obejmuje watek wywolujacy
+    i wszystkie watki uruchomione w trakcie etapu (fetch/parse potoku, petla asyncio);
+    procesy puli parsowania (SCRAPER_PARSE_PROCESSES) nie sa profilowane.
+    """
+    out_dir = os.getenv(PROFILE_DIR_ENV, "").strip()
+    if not out_dir:
+        yield
+        return
+
+    session = _StageProfile(stage, Path(out_dir), _env_int(PROFILE_TOP_ENV, DEFAULT_PROFILE_TOP))
+    session.start()
+    try:
+        yield
+    finally:
+        session.stop()
+
+
+class _StageProfile:
+    def __init__(self, stage: str, out_dir: Path, top: int) -> None:
+        import cProfile
+        import tracemalloc
+
+        self._cprofile = cProfile
+        self._tracemalloc = tracemalloc
+        self.stage = stage
+        self.out_dir = out_dir
+        self.top = max(1, top)
+        self._profiles: list = []
+        self._lock = threading.Lock()
+        self._owns_tracemalloc = False
+        self._snapshot_before = None
+
+    def start(self) -> None:
+        if not self._tracemalloc.is_tracing():
+            self._tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._owns_tracemalloc = True
+        self._tracemalloc.reset_peak()
+        self._snapshot_before = self._tracemalloc.take_snapshot()
+
+        # Kazdy nowy watek dostaje wlasny profiler przy pierwszym zdarzeniu (cProfile dziala per watek).
+        if PER_THREAD_PROFILES:
+            threading.setprofile(self._profile_new_thread)
+        self._main = self._new_profile()
+        self._main.enable()
+
+    def stop(self) -> None:
+        self._main.disable()
+        if PER_THREAD_PROFILES:
+            threading.setprofile(None)
+
+        _, peak = self._tracemalloc.get_traced_memory()
+        snapshot_after = self._tracemalloc.take_snapshot()
+        if self._owns_tracemalloc:
+            self._tracemalloc.stop()
+
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        stats = self._merged_stats()
+        prof_path = self.out_dir / f"{self.stage}.prof"
+        stats.dump_stats(prof_path)
+
+        summary_path = self.out_dir / f"{self.stage}.txt"
+        summary_path.write_text(
+            self._summary(stats, peak, snapshot_after.compare_to(self._snapshot_before, "lineno")),
+            encoding="utf-8",
+        )
+        print(f"[PROFIL {self.stage}] szczyt pamieci {peak / 2**20:.1f} MiB, "
+              f"profil {prof_path}, podsumowanie {summary_path}")
+
+    def _new_profile(self):
+        profile = self._cprofile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        return profile
+
+    def _profile_new_thread(self, frame, event, arg):
+        sys.setprofile(None)
+        self._new_profile().enable()
+
+    def _merged_stats(self):
+        import pstats
+
+        stats: Optional[pstats.Stats] = None
+        with self._lock:
+            profiles = list(self._profiles)
+        for profile in profiles:
+            try:
+                profile.create_stats()
+            except Exception:
+                continue
+            if not profile.stats:
+                continue
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+        return stats if stats is not None else pstats.Stats(self._main)
+
+    def _summary(self, stats, peak: int, memory_diff) -> str:
+        out = io.StringIO()
+        out.write(f"Etap: {self.stage}\n")
+        out.write(f"Profilowane watki: {len(self._profiles)}\n")
+        out.write(f"Szczyt pamieci (tracemalloc): {peak / 2**20:.1f} MiB\n\n")
+
+        for sort_key in ("cumulative", "tottime"):
+            out.write(f"=== Top {self.top} funkcji wg {sort_key} ===\n")
+            stats.stream = out
+            stats.sort_stats(sort_key).print_stats(self.top)
+
+        out.write(f"=== Top {self.top} miejsc alokacji (przyrost w etapie) ===\n")
+        for diff in memory_diff[:self.top]:
+            out.write(f"{diff}\n")
+        return out.getvalue()
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name, "").strip()
+    try:
+        return int(raw) if raw else default
+    except ValueError:
+        return default
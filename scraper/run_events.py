@@ -1,59 +1,208 @@
-import xml.etree.ElementTree as ET
-from scraper.db import supabase, save_zajecia_grupy
-from scraper.xml_client import XmlClient
-from scraper.xml_parsers import parse_group_plan_events
+from dataclasses import dataclass, field
+from typing import Optional
+
+from scraper.async_xml_client import create_xml_client
+from scraper.checkpoint import RunCheckpoint
+from scraper.db import iter_table_rows, save_zajecia_grupy, EventWriteBuffer, StaleEventReconciler, MetadataUpdateBatch
+from scraper.digest_store import DigestStore, compute_plan_digest
+from scraper.fetch_engine import PlanFetchResult, fetch_entity_plans
+from scraper.metrics import COUNT_BUCKETS, PARSE_BUCKETS, get_metrics
+from scraper.parse_pool import PlanParsePool
+from scraper.pipeline import PipelineItem, StagedPipeline, resolve_parse_workers
+from scraper.sharding import ShardSpec
+from scraper.xml_parsers import XmlScheduleEvent, parse_group_plan
 
 GROUP_PLAN_SOURCES = ["grupy_plan", "grupy_hplan"]
+DIGEST_KIND = "grupy"
+CHECKPOINT_STAGE = "grupy_zajecia"
+METRICS_STAGE = "grupy"
+GROUP_COLUMNS = "grupa_id, nazwa, kierunek_id, tryb, semestr"
+
+
+@dataclass
+class ParsedGroupPlan:
+    digest: str
+    unchanged: bool = False
+    events: list[XmlScheduleEvent] = field(default_factory=list)
+    metadata: dict = field(default_factory=dict)
+    # Komunikaty bledow parsowania drukujemy w writerze, zeby log mial kolejnosc grup.
+    errors: list[str] = field(default_factory=list)
+
+
+def parse_group_plans(gid: str, fetched: PlanFetchResult, digests: Optional[DigestStore] = None,
+                      parse_pool: Optional[PlanParsePool] = None) -> ParsedGroupPlan:
+    """Etap parsowania: skrot planu, metadane (tryb/semestr) i zajecia z plikow grupy."""
+    parse_plan = parse_pool.parse_group_plan if parse_pool else parse_group_plan
+    contents = fetched.contents(GROUP_PLAN_SOURCES)
+    parsed = ParsedGroupPlan(digest=compute_plan_digest(contents))
+    if digests and not fetched.errors and digests.is_unchanged(DIGEST_KIND, gid, parsed.digest):
+        parsed.unchanged = True
+        return parsed
+
+    metrics = get_metrics()
+    for source_prefix, content in contents:
+        try:
+            # Zajecia oraz tryb i semestr z jednego parsowania pliku.
+            with metrics.timer("parse_seconds", PARSE_BUCKETS, stage=METRICS_STAGE, source=source_prefix):
+                plan = parse_plan(content)
+            metrics.inc("parse_files_total", stage=METRICS_STAGE, source=source_prefix)
+            metrics.observe("parse_events_per_file", len(plan.events), COUNT_BUCKETS,
+                            stage=METRICS_STAGE, source=source_prefix)
+
+            # Aktualizacja metadanych grupy z glownego planu.
+            if source_prefix == "grupy_plan":
+                if plan.study_mode:
+                    parsed.metadata["tryb"] = plan.study_mode
+                if plan.semester:
+                    parsed.metadata["semestr"] = plan.semester
+
+            parsed.events.extend(plan.events)
+
+        except Exception as e:
+            metrics.inc("parse_errors_total", stage=METRICS_STAGE, source=source_prefix)
+            parsed.errors.append(f"Blad przetwarzania {source_prefix} dla grupy {gid}: {e}")
 
+    return parsed
 
-def main():
-    """Synchronizuje zajecia dla wszystkich grup z planu biezacego i historycznego."""
-    client = XmlClient()
-    res = supabase.table("grupy").select("grupa_id").execute()
-    grupy = res.data or []
+
+def main(workers=None, digests=None, parse_workers=None, queue_size=None, parse_processes=None,
+         checkpoint: Optional[RunCheckpoint] = None, shard: Optional[ShardSpec] = None):
+    """Synchronizuje zajecia dla wszystkich grup z planu biezacego i historycznego.
+
+    Z shardem (domyslnie z SCRAPER_SHARD_INDEX/COUNT) przetwarzane sa tylko grupy tego sharda.
+
+    Z checkpointem postep jest utrwalany co checkpoint.every grup (zapis, czyszczenie,
+    metadane i skroty), a grupy zakonczone w przerwanym przebiegu sa pomijane.
+    """
+    # Parsery dostaja bajty odpowiedzi, bez posredniego str.
+    client = create_xml_client(keep_raw=True, stage=METRICS_STAGE)
+    parse_pool = PlanParsePool.from_env(parse_processes)
+    if parse_pool:
+        # Kazdy proces potrzebuje watku, ktory przekaze mu plik i odbierze wynik.
+        parse_workers = max(resolve_parse_workers(parse_workers), parse_pool.processes)
+    digests = digests if digests is not None else DigestStore.from_env()
+    shard = shard if shard is not None else ShardSpec.from_env()
+    stats = {"skipped_unchanged": 0, "resumed_skipped": 0, "stale_deleted": 0, "metadata_updated": 0}
+    # Skroty zapisujemy dopiero po oproznieniu bufora, zeby pominac grupy z bledem zapisu.
+    digest_updates = {}
+    # Grupy przetworzone bez bledu od ostatniego utrwalenia postepu.
+    pending_done = []
+    grupy = list(iter_table_rows("grupy", GROUP_COLUMNS, key_col="grupa_id", stage=METRICS_STAGE))
+    metadata = MetadataUpdateBatch(
+        "grupy", "grupa_id",
+        existing={row["grupa_id"]: row for row in grupy},
+        row_columns=("nazwa", "kierunek_id"),
+        stage=METRICS_STAGE,
+    )
 
     print(f"Rozpoczynam synchronizacje planow dla {len(grupy)} grup...")
 
-    for row in grupy:
-        gid = row["grupa_id"]
-        all_events_for_group = []
+    group_ids = [row["grupa_id"] for row in grupy]
+    if shard:
+        group_ids = shard.select(group_ids, key=str)
+        print(f"Shard {shard.label}: {len(group_ids)} grup.")
+    if checkpoint:
+        done = checkpoint.completed(CHECKPOINT_STAGE)
+        stats["resumed_skipped"] = sum(1 for gid in group_ids if gid in done)
+        group_ids = [gid for gid in group_ids if gid not in done]
+        if stats["resumed_skipped"]:
+            print(f"Wznowienie: pomijam {stats['resumed_skipped']} grup zakonczonych w przerwanym przebiegu.")
+    reconciler = StaleEventReconciler("zajecia_grupy", "grupa_id", stage=METRICS_STAGE)
+
+    with EventWriteBuffer("zajecia_grupy", stage=METRICS_STAGE) as writer:
+        def commit_progress():
+            """Domyka przetworzone grupy: zapis bufora, czyszczenie, metadane, skroty i postep."""
+            writer.flush()
+            stats["stale_deleted"] += reconciler.run()
+            stats["metadata_updated"] += metadata.apply()
+
+            committed = [gid for gid in pending_done
+                         if gid not in writer.failed_owners and gid not in metadata.failed_keys]
+            pending_done.clear()
+            if digests:
+                for gid in committed:
+                    if gid in digest_updates:
+                        digests.record(DIGEST_KIND, gid, digest_updates.pop(gid))
+                digests.save()
+            if checkpoint:
+                checkpoint.mark_completed(CHECKPOINT_STAGE, committed)
+
+        def write_group(result: PipelineItem):
+            gid = result.item
+            fetched = result.fetched
+
+            if result.error is not None:
+                print(f"Blad przetwarzania planow grupy {gid} ({result.error_stage}): {result.error}")
+                return
+
+            for source_prefix, err in fetched.errors.items():
+                print(f"Blad pobierania {source_prefix} dla grupy {gid}: {err}")
 
-        for source_prefix in GROUP_PLAN_SOURCES:
-            xml_res = client.fetch_xml(f"{source_prefix}.ID={gid}.xml")
-            if not xml_res.content:
-                continue
+            parsed = result.parsed
+            if parsed.unchanged:
+                stats["skipped_unchanged"] += 1
+                mark_done(gid)
+                return
 
-            try:
-                root = ET.fromstring(xml_res.content)
+            for message in parsed.errors:
+                print(message)
+            failed = bool(fetched.errors or parsed.errors)
 
-                # Aktualizacja metadanych grupy z glownego planu.
-                if source_prefix == "grupy_plan":
-                    tryb_val = root.findtext(".//STUDIA_SYST")
-                    sem_val = root.findtext(".//SEMESTER")
+            if parsed.metadata:
+                metadata.set(gid, parsed.metadata)
 
-                    update_data = {}
-                    if tryb_val and tryb_val.strip():
-                        update_data["tryb"] = tryb_val.strip()
-                    if sem_val and sem_val.strip():
-                        update_data["semestr"] = sem_val.strip()
+            if parsed.events:
+                try:
+                    saved = save_zajecia_grupy(parsed.events, gid, writer=writer, reconciler=reconciler)
+                    if saved > 0:
+                        print(f"[SUKCES] Zapisano lacznie {saved} zajec (plan + hplan) dla grupy {gid}")
+                except Exception as e:
+                    failed = True
+                    print(f"[BLAD ZAPISU] Nie udalo sie zapisac zajec dla grupy {gid}: {e}")
 
-                    if update_data:
-                        supabase.table("grupy").update(update_data).eq("grupa_id", gid).execute()
+            if not failed:
+                digest_updates[gid] = parsed.digest
+                mark_done(gid)
 
-                events = parse_group_plan_events(xml_res.content)
-                all_events_for_group.extend(events)
+        def mark_done(gid):
+            pending_done.append(gid)
+            if checkpoint and len(pending_done) >= checkpoint.every:
+                commit_progress()
 
-            except Exception as e:
-                print(f"Blad przetwarzania {source_prefix} dla grupy {gid}: {e}")
+        pipeline = StagedPipeline(
+            "grupy",
+            fetch=lambda gid: fetch_entity_plans(client, gid, GROUP_PLAN_SOURCES),
+            parse=lambda gid, fetched: parse_group_plans(gid, fetched, digests, parse_pool),
+            write=write_group,
+            fetch_workers=workers,
+            parse_workers=parse_workers,
+            queue_size=queue_size,
+        )
+        try:
+            report = pipeline.run(group_ids)
+            commit_progress()
+        finally:
+            client.close()
+            if parse_pool:
+                parse_pool.close()
 
-        if all_events_for_group:
-            try:
-                saved = save_zajecia_grupy(all_events_for_group, gid)
-                if saved > 0:
-                    print(f"[SUKCES] Zapisano lacznie {saved} zajec (plan + hplan) dla grupy {gid}")
-            except Exception as e:
-                print(f"[BLAD ZAPISU] Nie udalo sie zapisac zajec dla grupy {gid}: {e}")
+    report.print_summary()
+    print(f"Pominieto {stats['skipped_unchanged']} grup bez zmian w planie.")
+    return {
+        "status": "ok",
+        "groups": len(group_ids),
+        "shard": shard.label if shard else None,
+        "skipped_unchanged": stats["skipped_unchanged"],
+        "resumed_skipped": stats["resumed_skipped"],
+        "rows_written": writer.rows_written,
+        "upsert_requests": writer.requests_sent,
+        "stale_deleted": stats["stale_deleted"],
+        "metadata_updated": stats["metadata_updated"],
+        "failed_groups": len(writer.failed_owners),
+        "pipeline": report.as_dict(),
+        "flow": client.flow.state().as_dict(),
+    }
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
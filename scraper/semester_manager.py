@@ -2,9 +2,14 @@ from __future__ import annotations
 
 import re
 from dataclasses import dataclass
-from typing import Optional
+from typing import Iterable, Optional
 
-from rapidfuzz import fuzz
+import numpy as np
+from rapidfuzz import fuzz, process
+
+DEFAULT_FUZZY_THRESHOLD = 78.0
+# Ile starych kodow oceniamy jednym wywolaniem cdist (macierz wierszy x nowe kody).
+CDIST_CHUNK_ROWS = 256
 
 
 @dataclass(frozen=True)
@@ -32,6 +37,17 @@ class GroupMatchCandidate:
     strategy: str  # exact | year_prefix | fuzzy
 
 
+@dataclass(frozen=True)
+class GroupRemap:
+    group_uuid: str
+    old_grupa_id: str
+    new_grupa_id: str
+    old_code: str
+    new_code: str
+    confidence: float
+    strategy: str
+
+
 def detect_semester_switch(
     previous_state: Optional[SemesterState],
     current_state: SemesterState,
@@ -75,52 +91,114 @@ def detect_semester_switch(
     )
 
 
+class BulkGroupMatcher:
+    """Dopasowuje wiele starych kodow grup do jednej listy nowych kodow.
+
+    Nowe kody sa normalizowane i indeksowane raz. Dopasowania exact i year_prefix
+    to odczyt ze slownika, a reszta jest oceniana wsadowo przez rapidfuzz (cdist).
+    Wyniki sa takie same jak z match_group_code dla kazdego kodu osobno.
+    """
+
+    def __init__(self, new_codes: Iterable[str], fuzzy_threshold: float = DEFAULT_FUZZY_THRESHOLD) -> None:
+        self.new_codes = list(new_codes)
+        self.fuzzy_threshold = fuzzy_threshold
+        # Przy kolizji normalizacji wygrywa ostatni kod, a pozycja zostaje z pierwszego wystapienia.
+        self._by_normalized = {normalize_group_code(code): code for code in self.new_codes}
+        self._originals = list(self._by_normalized.values())
+        self._signatures = [_code_signature(code) for code in self._by_normalized]
+        self._all_signatures = [_code_signature(code) for code in self.new_codes]
+
+    def match(self, old_code: str) -> Optional[GroupMatchCandidate]:
+        return self.match_all([old_code]).get(old_code)
+
+    def match_all(self, old_codes: Iterable[str]) -> dict[str, Optional[GroupMatchCandidate]]:
+        """Zwraca {stary_kod: dopasowanie lub None} dla wszystkich kodow naraz."""
+        results: dict[str, Optional[GroupMatchCandidate]] = {}
+        fuzzy_codes: list[str] = []
+        fuzzy_signatures: list[str] = []
+
+        for old_code in old_codes:
+            if old_code in results:
+                continue
+            # Miejsce w wyniku rezerwujemy od razu, zeby powtorzony kod nie trafil do cdist dwa razy.
+            results[old_code] = None
+            if not old_code or not self.new_codes:
+                continue
+
+            old_normalized = normalize_group_code(old_code)
+            if old_normalized in self._by_normalized:
+                results[old_code] = GroupMatchCandidate(
+                    old_code=old_code,
+                    new_code=self._by_normalized[old_normalized],
+                    confidence=100.0,
+                    strategy="exact",
+                )
+                continue
+
+            transformed = _increment_year_prefix(old_normalized)
+            if transformed and transformed in self._by_normalized:
+                results[old_code] = GroupMatchCandidate(
+                    old_code=old_code,
+                    new_code=self._by_normalized[transformed],
+                    confidence=95.0,
+                    strategy="year_prefix",
+                )
+                continue
+
+            fuzzy_codes.append(old_code)
+            fuzzy_signatures.append(_code_signature(old_normalized))
+
+        for start in range(0, len(fuzzy_codes), CDIST_CHUNK_ROWS):
+            scores = process.cdist(
+                fuzzy_signatures[start:start + CDIST_CHUNK_ROWS],
+                self._signatures,
+                scorer=fuzz.ratio,
+                dtype=np.float64,
+                workers=-1,
+            )
+            # argmax bierze pierwsze maksimum - jak petla z porownaniem `>` w match_group_code.
+            best_indices = scores.argmax(axis=1)
+            for row, old_code in enumerate(fuzzy_codes[start:start + CDIST_CHUNK_ROWS]):
+                best_index = int(best_indices[row])
+                best_score = float(scores[row, best_index])
+                if best_score >= self.fuzzy_threshold:
+                    results[old_code] = GroupMatchCandidate(
+                        old_code=old_code,
+                        new_code=self._originals[best_index],
+                        confidence=best_score,
+                        strategy="fuzzy",
+                    )
+
+        return results
+
+    def top_candidates(self, old_code: str, top_k: int = 3) -> list[GroupMatchCandidate]:
+        """Kilku najlepszych kandydatow (fuzzy) dla jednego kodu."""
+        if not old_code or not self.new_codes:
+            return []
+
+        old_signature = _code_signature(normalize_group_code(old_code))
+        return [
+            GroupMatchCandidate(
+                old_code=old_code,
+                new_code=self.new_codes[index],
+                confidence=float(score),
+                strategy="fuzzy",
+            )
+            for _, score, index in process.extract(
+                old_signature, self._all_signatures, scorer=fuzz.ratio, limit=top_k
+            )
+        ]
+
+
 def match_group_code(
     old_code: str,
     new_codes: list[str],
-    fuzzy_threshold: float = 78.0,
+    fuzzy_threshold: float = DEFAULT_FUZZY_THRESHOLD,
 ) -> Optional[GroupMatchCandidate]:
     """Zwraca najlepsze dopasowanie kodu grupy."""
     if not old_code or not new_codes:
         return None
-
-    old_normalized = normalize_group_code(old_code)
-    normalized_map = {normalize_group_code(code): code for code in new_codes}
-
-    if old_normalized in normalized_map:
-        return GroupMatchCandidate(
-            old_code=old_code,
-            new_code=normalized_map[old_normalized],
-            confidence=100.0,
-            strategy="exact",
-        )
-
-    transformed = _increment_year_prefix(old_normalized)
-    if transformed and transformed in normalized_map:
-        return GroupMatchCandidate(
-            old_code=old_code,
-            new_code=normalized_map[transformed],
-            confidence=95.0,
-            strategy="year_prefix",
-        )
-
-    best_code = None
-    best_score = -1.0
-    for normalized_code, original_code in normalized_map.items():
-        score = float(fuzz.ratio(_code_signature(old_normalized), _code_signature(normalized_code)))
-        if score > best_score:
-            best_score = score
-            best_code = original_code
-
-    if best_code is not None and best_score >= fuzzy_threshold:
-        return GroupMatchCandidate(
-            old_code=old_code,
-            new_code=best_code,
-            confidence=best_score,
-            strategy="fuzzy",
-        )
-
-    return None
+    return BulkGroupMatcher(new_codes, fuzzy_threshold).match(old_code)
 
 
 def top_group_code_candidates(
@@ -129,26 +207,62 @@ def top_group_code_candidates(
     top_k: int = 3,
 ) -> list[GroupMatchCandidate]:
     """Zwraca kilka najlepszych kandydatów, gdy auto-match nie jest pewny."""
-    if not old_code or not new_codes:
-        return []
-
-    old_signature = _code_signature(normalize_group_code(old_code))
-    scored: list[GroupMatchCandidate] = []
-
-    for code in new_codes:
-        normalized = normalize_group_code(code)
-        score = float(fuzz.ratio(old_signature, _code_signature(normalized)))
-        scored.append(
-            GroupMatchCandidate(
-                old_code=old_code,
-                new_code=code,
-                confidence=score,
-                strategy="fuzzy",
-            )
-        )
-
-    scored.sort(key=lambda item: item.confidence, reverse=True)
-    return scored[:top_k]
+    return BulkGroupMatcher(new_codes).top_candidates(old_code, top_k)
+
+
+def plan_group_rollover(
+    existing_groups: list[dict],
+    catalog_groups: list[dict],
+    fuzzy_threshold: float = DEFAULT_FUZZY_THRESHOLD,
+) -> list[GroupRemap]:
+    """Dopasowuje grupy z bazy, ktorych nie ma w nowym katalogu, do nowych grup tego samego kierunku.
+
+    existing_groups to wiersze tabeli grupy (id, grupa_id, nazwa, kierunek_id), a catalog_groups
+    to grupy z XML (grupa_id, kod_grupy, kierunek_id). Kazda nowa grupa moze przejac
+    najwyzej jeden stary wiersz - przy konflikcie wygrywa wyzsza pewnosc dopasowania.
+    """
+    catalog_ids = {g["grupa_id"] for g in catalog_groups}
+    existing_ids = {row["grupa_id"] for row in existing_groups}
+
+    retired_by_direction: dict[Optional[str], list[dict]] = {}
+    for row in existing_groups:
+        if row["grupa_id"] not in catalog_ids and row.get("nazwa"):
+            retired_by_direction.setdefault(row.get("kierunek_id"), []).append(row)
+
+    fresh_by_direction: dict[Optional[str], dict[str, dict]] = {}
+    for group in catalog_groups:
+        if group["grupa_id"] not in existing_ids and group.get("kod_grupy"):
+            # Przy powtorzonym kodzie w kierunku zostaje pierwsza grupa.
+            fresh_by_direction.setdefault(group.get("kierunek_id"), {}).setdefault(group["kod_grupy"], group)
+
+    candidates: list[tuple[GroupMatchCandidate, dict, dict]] = []
+    for direction_id, rows in retired_by_direction.items():
+        targets = fresh_by_direction.get(direction_id)
+        if not targets:
+            continue
+        matches = BulkGroupMatcher(list(targets), fuzzy_threshold).match_all(row["nazwa"] for row in rows)
+        for row in rows:
+            match = matches.get(row["nazwa"])
+            if match is not None:
+                candidates.append((match, row, targets[match.new_code]))
+
+    candidates.sort(key=lambda item: item[0].confidence, reverse=True)
+    remaps: list[GroupRemap] = []
+    taken: set[str] = set()
+    for match, row, target in candidates:
+        if target["grupa_id"] in taken:
+            continue
+        taken.add(target["grupa_id"])
+        remaps.append(GroupRemap(
+            group_uuid=row["id"],
+            old_grupa_id=row["grupa_id"],
+            new_grupa_id=target["grupa_id"],
+            old_code=row["nazwa"],
+            new_code=target["kod_grupy"],
+            confidence=match.confidence,
+            strategy=match.strategy,
+        ))
+    return remaps
 
 
 def normalize_group_code(code: str) -> str:
@@ -202,4 +316,16 @@ def parse_semester_state_from_meta(meta: dict) -> SemesterState:
         previous_semester_id=meta.get("previous_semester_id"),
         previous_semester_name=previous_name,
         generated_at=meta.get("generated_at"),
+    )
+
+
+def parse_semester_state_from_db(row: Optional[dict]) -> Optional[SemesterState]:
+    """Konwertuje wiersz tabeli semester_state do SemesterState."""
+    if not row:
+        return None
+    return SemesterState(
+        current_semester_id=row.get("id_semestru_aktualny"),
+        current_semester_name=row.get("nazwa_semestru_aktualny"),
+        previous_semester_id=row.get("id_semestru_poprzedni"),
+        previous_semester_name=row.get("nazwa_semestru_poprzedni"),
     )
\ No newline at end of file
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import os
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional, TypeVar
+
+SHARD_INDEX_ENV = "SCRAPER_SHARD_INDEX"
+SHARD_COUNT_ENV = "SCRAPER_SHARD_COUNT"
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class ShardSpec:
+    """Wycinek grup i nauczycieli obslugiwany przez jeden proces przy podziale na `count` runnerow.
+
+    Przydzial zalezy tylko od identyfikatora z planu (crc32 grupa_id / external_id), wiec
+    kazdy runner liczy go niezaleznie i te same encje zawsze trafiaja do tego samego sharda.
+    """
+
+    index: int
+    count: int
+
+    def __post_init__(self) -> None:
+        if self.count < 1 or not 0 <= self.index < self.count:
+            raise ValueError(f"Niepoprawny shard {self.index}/{self.count}")
+
+    @classmethod
+    def from_env(cls) -> Optional["ShardSpec"]:
+        """Shard z SCRAPER_SHARD_INDEX/SCRAPER_SHARD_COUNT; None bez podzialu (count <= 1)."""
+        count = _env_int(SHARD_COUNT_ENV, 1)
+        if count <= 1:
+            return None
+        return cls(index=_env_int(SHARD_INDEX_ENV, 0), count=count)
+
+    @property
+    def is_primary(self) -> bool:
+        """Shard 0 wykonuje etapy, ktore musza przejsc dokladnie raz (katalogi, rollover)."""
+        return self.index == 0
+
+    @property
+    def label(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    def owns(self, key) -> bool:
+        return shard_of(key, self.count) == self.index
+
+    def select(self, items: Iterable[T], key: Callable[[T], object]) -> list[T]:
+        return [item for item in items if self.owns(key(item))]
+
+
+def shard_of(key, count: int) -> int:
+    """Numer sharda dla identyfikatora - stabilny miedzy procesami (w przeciwienstwie do hash())."""
+    return zlib.crc32(str(key).encode("utf-8")) % count
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name, "").strip()
+    try:
+        return int(raw) if raw else default
+    except ValueError:
+        return default
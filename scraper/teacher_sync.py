@@ -1,85 +1,236 @@
-from scraper.db import supabase, save_zajecia_nauczyciela
-from scraper.xml_parsers import parse_teacher_plan_events
-from scraper.xml_client import XmlClient
-from bs4 import BeautifulSoup  # Zamieniliśmy ET na BeautifulSoup
+from dataclasses import dataclass, field
+from typing import Optional
+
+from scraper.async_xml_client import create_xml_client
+from scraper.checkpoint import RunCheckpoint
+from scraper.db import iter_table_rows, save_zajecia_nauczyciela, EventWriteBuffer, StaleEventReconciler, MetadataUpdateBatch
+from scraper.digest_store import DigestStore, compute_plan_digest
+from scraper.fetch_engine import PlanFetchResult, fetch_entity_plans
+from scraper.metrics import COUNT_BUCKETS, PARSE_BUCKETS, get_metrics
+from scraper.parse_pool import PlanParsePool
+from scraper.pipeline import PipelineItem, StagedPipeline, resolve_parse_workers
+from scraper.sharding import ShardSpec
+from scraper.xml_parsers import parse_teacher_plan
 
 TEACHER_PLAN_SOURCES = ["nauczyciel_plan", "nauczyciel_hplan"]
-
-
-def sync_teacher_events_and_meta(verbose=True):
-    """Synchronizuje zajecia i metadane (email/jednostka) dla nauczycieli."""
-    client = XmlClient()
-    res = supabase.table("nauczyciele").select("id, external_id, nazwisko_imie").execute()
-    teachers = res.data or []
-
-    total_saved = 0
+DIGEST_KIND = "nauczyciele"
+CHECKPOINT_STAGE = "nauczyciele_zajecia"
+METRICS_STAGE = "nauczyciele"
+TEACHER_COLUMNS = "id, external_id, nazwisko_imie, email, jednostka"
+
+
+@dataclass
+class ParsedTeacherPlan:
+    digest: str
+    unchanged: bool = False
+    events: list[dict] = field(default_factory=list)
+    email: Optional[str] = None
+    units: set[str] = field(default_factory=set)
+    # Przy pominieciu: email/jednostka z ostatniego parsowania, do ponownego ustawienia w bazie.
+    meta: Optional[dict] = None
+    # Komunikaty bledow parsowania drukujemy w writerze, zeby log mial kolejnosc nauczycieli.
+    errors: list[str] = field(default_factory=list)
+
+
+def parse_teacher_plans(ext_id: str, fetched: PlanFetchResult, digests: Optional[DigestStore] = None,
+                        parse_pool: Optional[PlanParsePool] = None) -> ParsedTeacherPlan:
+    """Etap parsowania: skrot planu, zajecia oraz E-mail i jednostki z plikow nauczyciela."""
+    parse_plan = parse_pool.parse_teacher_plan if parse_pool else parse_teacher_plan
+    contents = fetched.contents(TEACHER_PLAN_SOURCES)
+    parsed = ParsedTeacherPlan(digest=compute_plan_digest(contents))
+    if digests and not fetched.errors and digests.is_unchanged(DIGEST_KIND, ext_id, parsed.digest):
+        # Katalog nadpisuje email/jednostke przy kazdym przebiegu, wiec pomijamy tylko plany,
+        # dla ktorych mamy zapisane metadane z planu (starsze wpisy sa parsowane ponownie).
+        parsed.meta = digests.meta(DIGEST_KIND, ext_id)
+        if parsed.meta is not None:
+            parsed.unchanged = True
+            return parsed
+
+    metrics = get_metrics()
+    for source_prefix, content in contents:
+        try:
+            # Zajecia oraz E-mail i jednostki z jednego parsowania pliku.
+            with metrics.timer("parse_seconds", PARSE_BUCKETS, stage=METRICS_STAGE, source=source_prefix):
+                plan = parse_plan(content)
+            metrics.inc("parse_files_total", stage=METRICS_STAGE, source=source_prefix)
+            metrics.observe("parse_events_per_file", len(plan.events), COUNT_BUCKETS,
+                            stage=METRICS_STAGE, source=source_prefix)
+            for event in plan.events:
+                parsed.events.append({
+                    "uid": event.external_uid,
+                    "id_semestru": event.id_semestru,
+                    "starts_at": event.starts_at,
+                    "ends_at": event.ends_at,
+                    "subject": event.subject,
+                    "class_type": event.class_type,
+                    "room": event.room,
+                    "groups_label": event.groups_label,
+                })
+
+            if plan.email is not None:
+                parsed.email = plan.email
+            parsed.units.update(plan.units)
+
+        except Exception as err:
+            metrics.inc("parse_errors_total", stage=METRICS_STAGE, source=source_prefix)
+            parsed.errors.append(str(err))
+
+    return parsed
+
+
+def sync_teacher_events_and_meta(verbose=True, workers=None, digests=None, parse_workers=None, queue_size=None,
+                                 parse_processes=None, checkpoint: Optional[RunCheckpoint] = None,
+                                 shard: Optional[ShardSpec] = None):
+    """Synchronizuje zajecia i metadane (email/jednostka) dla nauczycieli.
+
+    Z shardem (domyslnie z SCRAPER_SHARD_INDEX/COUNT) przetwarzani sa tylko nauczyciele tego sharda.
+
+    Z checkpointem postep jest utrwalany co checkpoint.every nauczycieli, a nauczyciele
+    zakonczeni w przerwanym przebiegu sa pomijani.
+    """
+    # Parsery dostaja bajty odpowiedzi, bez posredniego str.
+    client = create_xml_client(keep_raw=True, stage=METRICS_STAGE)
+    parse_pool = PlanParsePool.from_env(parse_processes)
+    if parse_pool:
+        # Kazdy proces potrzebuje watku, ktory przekaze mu plik i odbierze wynik.
+        parse_workers = max(resolve_parse_workers(parse_workers), parse_pool.processes)
+    digests = digests if digests is not None else DigestStore.from_env()
+    shard = shard if shard is not None else ShardSpec.from_env()
+    stats = {"skipped_unchanged": 0, "total_saved": 0, "resumed_skipped": 0, "stale_deleted": 0,
+             "metadata_updated": 0}
+    # Skroty zapisujemy dopiero po oproznieniu bufora, zeby pominac nauczycieli z bledem zapisu.
+    digest_updates = {}
+    # Nauczyciele przetworzeni bez bledu od ostatniego utrwalenia postepu.
+    pending_done = []
+    teachers = list(iter_table_rows("nauczyciele", TEACHER_COLUMNS, key_col="id", stage=METRICS_STAGE))
+    metadata = MetadataUpdateBatch(
+        "nauczyciele", "id",
+        existing={t["id"]: t for t in teachers},
+        row_columns=("external_id", "nazwisko_imie"),
+        stage=METRICS_STAGE,
+    )
 
     if verbose:
         print(f"Rozpoczynam synchronizacje planow dla {len(teachers)} nauczycieli...")
 
-    for teacher in teachers:
-        teacher_uuid = teacher["id"]
-        ext_id = teacher["external_id"]
-        full_name = teacher["nazwisko_imie"]
-
-        if not ext_id:
-            continue
-
-        all_events_for_teacher = []
-        jednostki = set()
-        teacher_email = None
-
-        for source_prefix in TEACHER_PLAN_SOURCES:
-            xml_res = client.fetch_xml(f"{source_prefix}.ID={ext_id}.xml")
-            if not xml_res.content:
-                continue
-
-            try:
-                # 1. Parsowanie zajęć
-                events = parse_teacher_plan_events(xml_res.content)
-                for event in events:
-                    all_events_for_teacher.append({
-                        "uid": event.external_uid,
-                        "id_semestru": event.id_semestru,
-                        "starts_at": event.starts_at,
-                        "ends_at": event.ends_at,
-                        "subject": event.subject,
-                        "class_type": event.class_type,
-                        "room": event.room,
-                        "groups_label": event.groups_label,
-                    })
-
-                # 2. Parsowanie E-maila i Jednostki (Używamy BeautifulSoup!)
-                soup = BeautifulSoup(xml_res.content, "xml")
-
-                email_tag = soup.find("E_MAIL")
-                if email_tag and email_tag.text:
-                    teacher_email = email_tag.get_text(strip=True)
-
-                # Zbieranie nazw jednostek
-                for tag_name in ["JEDN", "JEDN_EN", "JEDN2", "JEDN2_EN"]:
-                    jedn_node = soup.find(tag_name)
-                    if jedn_node and jedn_node.text:
-                        jednostki.add(jedn_node.get_text(strip=True))
-
-            except Exception as err:
+    # Nauczyciele bez external_id nie maja planu do pobrania.
+    teachers = [t for t in teachers if t["external_id"]]
+    if shard:
+        # Podzial po external_id (identyfikator z planu), nie po UUID z bazy.
+        teachers = shard.select(teachers, key=lambda t: t["external_id"])
+        if verbose:
+            print(f"Shard {shard.label}: {len(teachers)} nauczycieli.")
+    if checkpoint:
+        done = checkpoint.completed(CHECKPOINT_STAGE)
+        stats["resumed_skipped"] = sum(1 for t in teachers if t["id"] in done)
+        teachers = [t for t in teachers if t["id"] not in done]
+        if verbose and stats["resumed_skipped"]:
+            print(f"Wznowienie: pomijam {stats['resumed_skipped']} nauczycieli zakonczonych w przerwanym przebiegu.")
+
+    reconciler = StaleEventReconciler("zajecia_nauczyciela", "nauczyciel_id", stage=METRICS_STAGE)
+    with EventWriteBuffer("zajecia_nauczyciela", stage=METRICS_STAGE) as writer:
+        def commit_progress():
+            """Domyka przetworzonych nauczycieli: zapis bufora, czyszczenie, metadane, skroty i postep."""
+            writer.flush()
+            stats["stale_deleted"] += reconciler.run()
+            stats["metadata_updated"] += metadata.apply()
+
+            committed = [teacher_uuid for teacher_uuid in pending_done
+                         if teacher_uuid not in writer.failed_owners and teacher_uuid not in metadata.failed_keys]
+            pending_done.clear()
+            if digests:
+                for teacher_uuid in committed:
+                    if teacher_uuid in digest_updates:
+                        ext_id, digest, meta = digest_updates.pop(teacher_uuid)
+                        digests.record(DIGEST_KIND, ext_id, digest, meta=meta)
+                digests.save()
+            if checkpoint:
+                checkpoint.mark_completed(CHECKPOINT_STAGE, committed)
+
+        def write_teacher(result: PipelineItem):
+            teacher = result.item
+            teacher_uuid = teacher["id"]
+            full_name = teacher["nazwisko_imie"]
+            fetched = result.fetched
+
+            if result.error is not None:
                 if verbose:
-                    print(f"[BLAD {full_name}]: {err}")
-
-        # Zapis do bazy Supabase
-        if all_events_for_teacher or jednostki:
-            jednostka_str = " | ".join(jednostki) if jednostki else None
+                    print(f"[BLAD {full_name}] ({result.error_stage}): {result.error}")
+                return
 
-            supabase.table("nauczyciele").update({
-                "email": teacher_email,
-                "jednostka": jednostka_str,
-            }).eq("id", teacher_uuid).execute()
+            for source_prefix, err in fetched.errors.items():
+                if verbose:
+                    print(f"[BLAD POBIERANIA {full_name}] {source_prefix}: {err}")
 
-            if all_events_for_teacher:
-                saved = save_zajecia_nauczyciela(all_events_for_teacher, teacher_uuid)
-                total_saved += saved
+            parsed = result.parsed
+            if parsed.unchanged:
+                stats["skipped_unchanged"] += 1
+                if parsed.meta:
+                    metadata.set(teacher_uuid, parsed.meta)
+                mark_done(teacher_uuid)
+                return
 
-                if verbose and saved > 0:
-                    print(f"[SUKCES] Zapisano {saved} zajec dla: {full_name}")
+            for message in parsed.errors:
+                if verbose:
+                    print(f"[BLAD {full_name}]: {message}")
+            failed = bool(fetched.errors or parsed.errors)
+
+            # Zapis do bazy Supabase
+            meta = {}
+            if parsed.events or parsed.units:
+                # Sortowanie daje stabilny napis, wiec niezmienione jednostki nie generuja zapisu.
+                jednostka_str = " | ".join(sorted(parsed.units)) if parsed.units else None
+
+                meta = {"email": parsed.email, "jednostka": jednostka_str}
+                metadata.set(teacher_uuid, meta)
+
+                if parsed.events:
+                    saved = save_zajecia_nauczyciela(parsed.events, teacher_uuid, writer=writer, reconciler=reconciler)
+                    stats["total_saved"] += saved
+
+                    if verbose and saved > 0:
+                        print(f"[SUKCES] Zapisano {saved} zajec dla: {full_name}")
+
+            if not failed:
+                digest_updates[teacher_uuid] = (fetched.entity_id, parsed.digest, meta)
+                mark_done(teacher_uuid)
+
+        def mark_done(teacher_uuid):
+            pending_done.append(teacher_uuid)
+            if checkpoint and len(pending_done) >= checkpoint.every:
+                commit_progress()
+
+        pipeline = StagedPipeline(
+            "nauczyciele",
+            fetch=lambda t: fetch_entity_plans(client, t["external_id"], TEACHER_PLAN_SOURCES),
+            parse=lambda t, fetched: parse_teacher_plans(t["external_id"], fetched, digests, parse_pool),
+            write=write_teacher,
+            fetch_workers=workers,
+            parse_workers=parse_workers,
+            queue_size=queue_size,
+        )
+        try:
+            report = pipeline.run(teachers)
+            commit_progress()
+        finally:
+            client.close()
+            if parse_pool:
+                parse_pool.close()
 
-    return {"status": "ok", "events_saved": total_saved}
\ No newline at end of file
+    if verbose:
+        report.print_summary()
+        print(f"Pominieto {stats['skipped_unchanged']} nauczycieli bez zmian w planie.")
+
+    return {
+        "status": "ok",
+        "events_saved": stats["total_saved"],
+        "shard": shard.label if shard else None,
+        "skipped_unchanged": stats["skipped_unchanged"],
+        "resumed_skipped": stats["resumed_skipped"],
+        "upsert_requests": writer.requests_sent,
+        "stale_deleted": stats["stale_deleted"],
+        "metadata_updated": stats["metadata_updated"],
+        "failed_teachers": len(writer.failed_owners),
+        "pipeline": report.as_dict(),
+        "flow": client.flow.state().as_dict(),
+    }
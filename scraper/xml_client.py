@@ -9,17 +9,29 @@ from typing import Optional
 from urllib.parse import urljoin
 
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 
+from scraper.flow_control import OUTCOME_OK, OUTCOME_OVERLOAD, AdaptiveConcurrencyController, get_shared_controller
+from scraper.http_cache import CacheEntry, HttpCache
+from scraper.metrics import DEFAULT_STAGE, get_metrics
+
 DEFAULT_BASE_URL = "https://plan.uz.zgora.pl/static_files/"
 DEFAULT_USER_AGENT = "scraper_uz_xml_client/1.2"
 DEFAULT_ACCEPT_HEADER = "application/xml,text/xml;q=0.9,*/*;q=0.8"
+# Pliki XML planow kompresuja sie kilkukrotnie; oba kodowania rozpakowuje requests i httpx.
+DEFAULT_ACCEPT_ENCODING = "gzip, deflate"
 DEFAULT_TIMEOUT_SECONDS = 20
 DEFAULT_MAX_RETRIES = 3
 DEFAULT_BACKOFF_START_SECONDS = 1.0
+DEFAULT_POOL_SIZE = 16
+# 429 (limit zapytan) ponawiamy tak jak bledy serwera 5xx.
+HTTP_TOO_MANY_REQUESTS = 429
 
 ROOT_TAG = "ROOT"
 DATE_HEADER = "Date"
+ETAG_HEADER = "ETag"
+LAST_MODIFIED_HEADER = "Last-Modified"
 XML_TAG_SEMESTER_ID = ["SEMESTER_ID", "CURRENT_SEMESTER_ID", "SEMESTR_BIEZACY_ID"]
 XML_TAG_SEMESTER_NAME_PL = ["SEMESTER", "CURRENT_SEMESTER_NAME", "SEMESTR_BIEZACY_NAZWA"]
 XML_TAG_SEMESTER_NAME_EN = ["SEMESTER_EN", "CURRENT_SEMESTER_NAME_EN", "SEMESTR_BIEZACY_NAZWA_EN"]
@@ -38,6 +50,13 @@ class XmlFetchResult:
     content: Optional[str]
     fetched_at_utc: datetime
     from_cache: bool = False
+    # Surowe bajty odpowiedzi (klient z keep_raw=True) - wtedy content zostaje None.
+    raw: Optional[bytes] = None
+
+    @property
+    def payload(self) -> Optional[str | bytes]:
+        """Tresc do parsowania: bajty, jesli klient je zachowal, w przeciwnym razie tekst."""
+        return self.raw if self.raw is not None else self.content
 
 
 @dataclass(frozen=True)
@@ -60,19 +79,46 @@ class XmlClient:
         max_retries: int = DEFAULT_MAX_RETRIES,
         backoff_start_seconds: float = DEFAULT_BACKOFF_START_SECONDS,
         user_agent: str = DEFAULT_USER_AGENT,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        cache: Optional[HttpCache] = None,
+        flow: Optional[AdaptiveConcurrencyController] = None,
+        keep_raw: bool = False,
+        stage: str = DEFAULT_STAGE,
     ) -> None:
         self.base_url = base_url if base_url.endswith("/") else f"{base_url}/"
         self.timeout = timeout
+        # Etykieta etapu w metrykach HTTP (grupy, nauczyciele, katalogi...).
+        self.stage = stage
         self.max_retries = max_retries
         self.backoff_start_seconds = backoff_start_seconds
+        # keep_raw: parsery dostaja bajty prosto z odpowiedzi, bez dekodowania do str.
+        self.keep_raw = keep_raw
+        # Bez jawnego cache korzystamy z SCRAPER_HTTP_CACHE_DIR (brak zmiennej = brak cache).
+        self.cache = cache if cache is not None else HttpCache.from_env()
+        # Limit rownoleglych zapytan jest wspolny dla wszystkich klientow w procesie.
+        self.flow = flow if flow is not None else get_shared_controller()
         self.session = requests.Session()
+        # Pula polaczen musi pomiescic rownolegle pobieranie z fetch_engine.
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self.session.headers.update(
             {
                 "User-Agent": user_agent,
                 "Accept": DEFAULT_ACCEPT_HEADER,
+                "Accept-Encoding": DEFAULT_ACCEPT_ENCODING,
             }
         )
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self) -> None:
+        self.session.close()
+
     def fetch_xml(self, file_name: str) -> XmlFetchResult:
         return self._fetch_url(self._build_url(file_name))
 
@@ -81,12 +127,12 @@ class XmlClient:
 
     def fetch_semester_meta_from_file(self, file_name: str) -> SemesterMeta:
         result = self.fetch_xml(file_name)
-        if not result.content:
+        if not result.payload:
             raise ValueError(f"Brak zawartości XML dla {file_name} ({result.url})")
-        return self.parse_semester_meta(result.content, source_url=result.url)
+        return self.parse_semester_meta(result.payload, source_url=result.url)
 
     @staticmethod
-    def parse_semester_meta(xml_content: str, source_url: str = "") -> SemesterMeta:
+    def parse_semester_meta(xml_content: str | bytes, source_url: str = "") -> SemesterMeta:
         soup = BeautifulSoup(xml_content, "xml")
         root = soup.find(ROOT_TAG) or soup.find()
         if root is None:
@@ -117,31 +163,26 @@ class XmlClient:
     def _fetch_url(self, url: str) -> XmlFetchResult:
         last_exc: Optional[Exception] = None
         backoff = self.backoff_start_seconds
+        cached = self.cache.lookup(url) if self.cache else None
+        headers = self.cache.conditional_headers(cached) if self.cache else None
 
         for attempt in range(1, self.max_retries + 1):
             try:
-                resp = self.session.get(url, timeout=self.timeout)
+                resp = self._get(url, headers)
                 status = resp.status_code
 
+                if status == 304 and cached is not None:
+                    get_metrics().inc("http_cache_hits_total", stage=self.stage)
+                    return _not_modified_result(url, resp, cached, self.cache, self.keep_raw)
+
                 if status == 404:
                     logger.warning("XML not found (404): %s", url)
                     return XmlFetchResult(url=url, status_code=status, content=None, fetched_at_utc=datetime.now(timezone.utc))
 
                 if 200 <= status < 300:
-                    try:
-                        text = resp.content.decode("utf-8", errors="replace")
-                    except Exception:
-                        resp.encoding = "utf-8"
-                        text = resp.text or ""
-
-                    return XmlFetchResult(
-                        url=url,
-                        status_code=status,
-                        content=text,
-                        fetched_at_utc=_response_time_or_now(resp),
-                    )
-
-                if 500 <= status < 600 and attempt < self.max_retries:
+                    return _success_result(url, resp, self.cache, self.keep_raw)
+
+                if _is_retryable_status(status) and attempt < self.max_retries:
                     time.sleep(backoff)
                     backoff *= 2
                     continue
@@ -158,6 +199,65 @@ class XmlClient:
 
         raise RuntimeError(f"Nie udało się pobrać XML: {url}. Ostatni błąd: {last_exc}") from last_exc
 
+    def _get(self, url: str, headers: Optional[dict]) -> requests.Response:
+        """Jedno zapytanie w ramach limitu kontrolera; wynik koryguje limit."""
+        with self.flow.slot():
+            started = time.monotonic()
+            try:
+                resp = self.session.get(url, timeout=self.timeout, headers=headers)
+            except (requests.Timeout, requests.ConnectionError):
+                self.flow.record(None, OUTCOME_OVERLOAD)
+                _record_http(self.stage, None, time.monotonic() - started, 0)
+                raise
+            latency = time.monotonic() - started
+            outcome = OUTCOME_OVERLOAD if 500 <= resp.status_code < 600 else OUTCOME_OK
+            self.flow.record(latency, outcome)
+            _record_http(self.stage, resp.status_code, latency, len(resp.content or b""))
+        return resp
+
+
+def _is_retryable_status(status: int) -> bool:
+    return status == HTTP_TOO_MANY_REQUESTS or 500 <= status < 600
+
+
+def _record_http(stage: str, status: Optional[int], latency_seconds: float, size: int) -> None:
+    """Metryki jednego zapytania; status None = timeout lub blad polaczenia."""
+    metrics = get_metrics()
+    metrics.inc("http_requests_total", stage=stage, status=status if status is not None else "error")
+    metrics.observe("http_request_seconds", latency_seconds, stage=stage)
+    if size:
+        metrics.inc("http_response_bytes_total", size, stage=stage)
+
+
+def _not_modified_result(url: str, resp, cached: CacheEntry, cache: HttpCache, keep_raw: bool = False) -> XmlFetchResult:
+    """Odpowiedz 304: tresc z cache dyskowego."""
+    cache.touch(url)
+    return _body_result(url, resp, cached.body, keep_raw, from_cache=True)
+
+
+def _success_result(url: str, resp, cache: Optional[HttpCache], keep_raw: bool = False) -> XmlFetchResult:
+    """Odpowiedz 2xx (requests lub httpx): zapis do cache i wynik z trescia."""
+    body = resp.content or b""
+    if cache:
+        cache.store(
+            url,
+            etag=resp.headers.get(ETAG_HEADER),
+            last_modified=resp.headers.get(LAST_MODIFIED_HEADER),
+            body=body,
+        )
+    return _body_result(url, resp, body, keep_raw)
+
+
+def _body_result(url: str, resp, body: bytes, keep_raw: bool, from_cache: bool = False) -> XmlFetchResult:
+    return XmlFetchResult(
+        url=url,
+        status_code=resp.status_code,
+        content=None if keep_raw else body.decode("utf-8", errors="replace"),
+        fetched_at_utc=_response_time_or_now(resp),
+        from_cache=from_cache,
+        raw=body if keep_raw else None,
+    )
+
 
 def _pick_first_value(root_tag, candidate_names: list[str]) -> Optional[str]:
     for name in candidate_names:
@@ -181,7 +281,7 @@ def _clean(value: Optional[str]) -> Optional[str]:
     return v if v else None
 
 
-def _response_time_or_now(resp: requests.Response) -> datetime:
+def _response_time_or_now(resp) -> datetime:
     date_hdr = resp.headers.get(DATE_HEADER)
     if not date_hdr:
         return datetime.now(timezone.utc)
@@ -1,10 +1,26 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from datetime import datetime, date
 from typing import Optional
+import os
 import re
+import xml.etree.ElementTree as ET
 from bs4 import BeautifulSoup
 
+# Silnik parsowania planow: "stream" (XMLPullParser, domyslny) albo "bs4" (BeautifulSoup).
+PLAN_PARSER_ENV = "SCRAPER_PLAN_PARSER"
+PLAN_PARSER_STREAM = "stream"
+PLAN_PARSER_BS4 = "bs4"
+STREAM_FEED_CHUNK_SIZE = 64 * 1024
+
+TEACHER_EMAIL_TAG = "E_MAIL"
+TEACHER_UNIT_TAGS = ("JEDN", "JEDN_EN", "JEDN2", "JEDN2_EN")
+TEACHER_META_TAGS = (TEACHER_EMAIL_TAG, *TEACHER_UNIT_TAGS)
+
+GROUP_STUDY_MODE_TAG = "STUDIA_SYST"
+GROUP_SEMESTER_TAG = "SEMESTER"
+GROUP_META_TAGS = (GROUP_STUDY_MODE_TAG, GROUP_SEMESTER_TAG)
+
 
 @dataclass(frozen=True)
 class XmlDirection:
@@ -37,6 +53,20 @@ class XmlScheduleEvent:
     raw_dates: list[date]
 
 
+@dataclass(frozen=True)
+class XmlGroupPlan:
+    events: list[XmlScheduleEvent]
+    study_mode: Optional[str]
+    semester: Optional[str]
+
+
+@dataclass(frozen=True)
+class XmlTeacherPlan:
+    events: list[XmlScheduleEvent]
+    email: Optional[str]
+    units: list[str]
+
+
 def _format_teacher_name(raw_name: Optional[str]) -> Optional[str]:
     """Czyści nazwisko z nadmiarowych spacji i zachowuje format: tytuly + imie nazwisko."""
     if not raw_name or raw_name.lower() == "brak":
@@ -59,7 +89,7 @@ def _format_teacher_name(raw_name: Optional[str]) -> Optional[str]:
     return imie_nazwisko
 
 
-def parse_directions_from_xml(xml_content: str) -> list[XmlDirection]:
+def parse_directions_from_xml(xml_content: str | bytes) -> list[XmlDirection]:
     soup = BeautifulSoup(xml_content, "xml")
     results = []
 
@@ -83,7 +113,7 @@ def parse_directions_from_xml(xml_content: str) -> list[XmlDirection]:
     return results
 
 
-def parse_groups_from_xml(xml_content: str, direction_external_id: Optional[str] = None) -> list[XmlGroup]:
+def parse_groups_from_xml(xml_content: str | bytes, direction_external_id: Optional[str] = None) -> list[XmlGroup]:
     soup = BeautifulSoup(xml_content, "xml")
     items = soup.find_all("ITEM")
     results = []
@@ -100,16 +130,71 @@ def parse_groups_from_xml(xml_content: str, direction_external_id: Optional[str]
     return results
 
 
-def parse_group_plan_events(xml_content: str, source_url: Optional[str] = None) -> list[XmlScheduleEvent]:
+def parse_group_plan_events(xml_content: str | bytes, source_url: Optional[str] = None) -> list[XmlScheduleEvent]:
     return _parse_plan_events(xml_content, source_url)
 
 
-def parse_teacher_plan_events(xml_content: str, source_url: Optional[str] = None) -> list[XmlScheduleEvent]:
+def parse_group_plan(xml_content: str | bytes, source_url: Optional[str] = None) -> XmlGroupPlan:
+    """Zajecia i metadane grupy (STUDIA_SYST, SEMESTER) z jednego parsowania pliku."""
+    events, meta = _parse_plan(xml_content, source_url, meta_tags=GROUP_META_TAGS)
+    return XmlGroupPlan(
+        events=events,
+        study_mode=meta[GROUP_STUDY_MODE_TAG] or None,
+        semester=meta[GROUP_SEMESTER_TAG] or None,
+    )
+
+
+def parse_teacher_plan_events(xml_content: str | bytes, source_url: Optional[str] = None) -> list[XmlScheduleEvent]:
     return _parse_plan_events(xml_content, source_url)
 
 
-def _parse_plan_events(xml_content: str, source_url: Optional[str] = None) -> list[XmlScheduleEvent]:
+def parse_teacher_plan(xml_content: str | bytes, source_url: Optional[str] = None) -> XmlTeacherPlan:
+    """Zajecia i metadane nauczyciela (E_MAIL, JEDN*) z jednego parsowania pliku."""
+    events, meta = _parse_plan(xml_content, source_url, meta_tags=TEACHER_META_TAGS)
+    units = [meta[tag] for tag in TEACHER_UNIT_TAGS if meta[tag] is not None]
+    return XmlTeacherPlan(events=events, email=meta[TEACHER_EMAIL_TAG], units=units)
+
+
+def _parse_plan_events(
+    xml_content: str | bytes,
+    source_url: Optional[str] = None,
+    engine: Optional[str] = None,
+) -> list[XmlScheduleEvent]:
+    events, _ = _parse_plan(xml_content, source_url, engine=engine)
+    return events
+
+
+def _parse_plan(
+    xml_content: str | bytes,
+    source_url: Optional[str] = None,
+    engine: Optional[str] = None,
+    meta_tags: tuple[str, ...] = (),
+) -> tuple[list[XmlScheduleEvent], dict[str, Optional[str]]]:
+    """Zwraca zdarzenia oraz tekst pierwszego wystapienia kazdego z meta_tags w dokumencie.
+
+    Bajty trafiaja do parsera bez dekodowania - kodowanie bierze z deklaracji XML.
+    """
+    engine = (engine or os.getenv(PLAN_PARSER_ENV, "") or PLAN_PARSER_STREAM).strip().lower()
+    if engine == PLAN_PARSER_BS4:
+        return _parse_plan_bs4(xml_content, source_url, meta_tags)
+    try:
+        return _parse_plan_stream(xml_content, source_url, meta_tags)
+    except ET.ParseError:
+        # Uszkodzony XML - BeautifulSoup jest bardziej tolerancyjny.
+        return _parse_plan_bs4(xml_content, source_url, meta_tags)
+
+
+def _parse_plan_bs4(
+    xml_content: str | bytes,
+    source_url: Optional[str] = None,
+    meta_tags: tuple[str, ...] = (),
+) -> tuple[list[XmlScheduleEvent], dict[str, Optional[str]]]:
     soup = BeautifulSoup(xml_content, "xml")
+    meta = {}
+    for tag_name in meta_tags:
+        node = soup.find(tag_name)
+        meta[tag_name] = node.get_text(strip=True) if node and node.text else None
+
     items = soup.find_all("ITEM")
     out = []
 
@@ -127,13 +212,6 @@ def _parse_plan_events(xml_content: str, source_url: Optional[str] = None) -> li
             f = it.find(tag_name)
             return f.get_text(strip=True) if f and f.text else None
 
-        raw_teacher = get_txt("SORT")
-        teacher = _format_teacher_name(raw_teacher)
-
-        subgroup = get_txt("PG")
-        semester_id = get_txt("ID_SEMESTR") or header_semester_id
-        class_type = get_txt("RZ")
-
         room = None
         sale_node = it.find("SALE")
         if sale_node:
@@ -141,54 +219,220 @@ def _parse_plan_events(xml_content: str, source_url: Optional[str] = None) -> li
             if room_tag:
                 room = room_tag.get_text(strip=True)
 
-        if not room:
-            remarks = get_txt("R_UWAGI")
-            if remarks and "s." in remarks:
-                room = remarks.split("s.")[-1].strip().replace("\n", " ")
-
-        g_od_val = get_txt("G_OD")
-        g_do_val = get_txt("G_DO")
-        dates_raw = get_txt("TERMIN_DT")
-
-        if dates_raw:
-            for d_str in [c.strip() for c in dates_raw.split(";") if c.strip()]:
-                try:
-                    current_date = datetime.strptime(d_str, "%Y-%m-%d").date()
-                    starts_at = _compose_datetime_iso(current_date, g_od_val)
-                    ends_at = _compose_datetime_iso(current_date, g_do_val)
-                    safe_subgroup = (subgroup or "ALL").replace(" ", "_")
-
-                    out.append(XmlScheduleEvent(
-                        external_uid=f"{uid_tag.get_text(strip=True)}_{d_str}_{safe_subgroup}",
-                        subject=subject_tag.get_text(strip=True),
-                        starts_at=starts_at,
-                        ends_at=ends_at,
-                        room=room,
-                        class_type=class_type,
-                        teacher_name=teacher,
-                        groups_label=get_txt("SORT"),
-                        subgroup=subgroup or "ALL",
-                        id_semestru=semester_id,
-                        raw_dates=[current_date]
-                    ))
-                except Exception as e:
-                    print(f"Ignoruje wadliwa date w zajeciach {uid_tag.get_text(strip=True)}: {e}")
-                    continue
-
-        else:
-            out.append(XmlScheduleEvent(
-                external_uid=uid_tag.get_text(strip=True),
-                subject=subject_tag.get_text(strip=True),
-                starts_at=None,
-                ends_at=None,
-                room=room,
-                class_type=class_type,
-                teacher_name=teacher,
-                groups_label=get_txt("SORT"),
-                subgroup=subgroup or "ALL",
-                id_semestru=semester_id,
-                raw_dates=[]
-            ))
+        fields = _PlanItemFields(
+            uid=uid_tag.get_text(strip=True),
+            subject=subject_tag.get_text(strip=True),
+            sort=get_txt("SORT"),
+            subgroup=get_txt("PG"),
+            semester_id=get_txt("ID_SEMESTR"),
+            class_type=get_txt("RZ"),
+            room=room,
+            remarks=get_txt("R_UWAGI"),
+            g_od=get_txt("G_OD"),
+            g_do=get_txt("G_DO"),
+            dates_raw=get_txt("TERMIN_DT"),
+        )
+        out.extend(_events_from_item(fields, header_semester_id))
+
+    return out, meta
+
+
+def _parse_plan_stream(
+    xml_content: str | bytes,
+    source_url: Optional[str] = None,
+    meta_tags: tuple[str, ...] = (),
+) -> tuple[list[XmlScheduleEvent], dict[str, Optional[str]]]:
+    """Jednoprzebiegowy parser (XMLPullParser) - ten sam wynik co wersja BeautifulSoup.
+
+    Kazdy ITEM najwyzszego poziomu jest przetwarzany po zamknieciu i usuwany z drzewa,
+    wiec pamiec nie rosnie z rozmiarem pliku.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    out: list[XmlScheduleEvent] = []
+    # Indeksy zdarzen, ktore wziely semestr z naglowka, zanim SEMESTER_ID sie pojawil.
+    pending_header: list[int] = []
+    header_semester_id: Optional[str] = None
+    header_seen = False
+    root_el: Optional[ET.Element] = None
+    root_closed = False
+    stack: list[ET.Element] = []
+    item_depth = 0
+    meta: dict[str, Optional[str]] = {}
+    wanted_meta = set(meta_tags)
+
+    def handle_events():
+        nonlocal header_semester_id, header_seen, item_depth, root_el, root_closed
+        for event, elem in parser.read_events():
+            if event == "start":
+                if elem.tag == "ROOT" and root_el is None:
+                    root_el = elem
+                if elem.tag == "ITEM":
+                    item_depth += 1
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            if elem.tag in wanted_meta:
+                wanted_meta.discard(elem.tag)
+                meta[elem.tag] = _stripped_text(elem) if "".join(elem.itertext()) else None
+
+            in_root = root_el is not None and not root_closed
+            if elem is root_el:
+                root_closed = True
+            elif elem.tag == "SEMESTER_ID" and in_root and not header_seen:
+                header_seen = True
+                header_semester_id = _stripped_text(elem)
+            elif elem.tag == "ITEM":
+                item_depth -= 1
+                if item_depth == 0:
+                    # Zagniezdzone ITEM-y przetwarzamy razem z zewnetrznym, w kolejnosci dokumentu.
+                    for node in elem.iter("ITEM"):
+                        fields = _item_fields_from_element(node)
+                        if fields is None:
+                            continue
+                        first = len(out)
+                        out.extend(_events_from_item(fields, header_semester_id))
+                        if fields.semester_id is None and not header_seen:
+                            pending_header.extend(range(first, len(out)))
+                    elem.clear()
+                    if stack:
+                        stack[-1].remove(elem)
+
+    for i in range(0, len(xml_content), STREAM_FEED_CHUNK_SIZE):
+        parser.feed(xml_content[i:i + STREAM_FEED_CHUNK_SIZE])
+        handle_events()
+    parser.close()
+    handle_events()
+
+    if header_seen and pending_header:
+        for idx in pending_header:
+            out[idx] = replace(out[idx], id_semestru=header_semester_id)
+
+    for tag_name in wanted_meta:
+        meta[tag_name] = None
+    return out, meta
+
+
+@dataclass(frozen=True)
+class _PlanItemFields:
+    uid: str
+    subject: str
+    sort: Optional[str]
+    subgroup: Optional[str]
+    semester_id: Optional[str]
+    class_type: Optional[str]
+    room: Optional[str]
+    remarks: Optional[str]
+    g_od: Optional[str]
+    g_do: Optional[str]
+    dates_raw: Optional[str]
+
+
+_ITEM_FIELD_TAGS = frozenset({
+    "ID_POZYCJA", "UID", "NAME", "PRZEDMIOT", "SORT", "PG", "ID_SEMESTR", "RZ",
+    "SALE", "R_UWAGI", "G_OD", "G_DO", "TERMIN_DT",
+})
+
+
+def _item_fields_from_element(item: ET.Element) -> Optional[_PlanItemFields]:
+    first: dict[str, ET.Element] = {}
+    for node in item.iter():
+        if node is not item and node.tag in _ITEM_FIELD_TAGS and node.tag not in first:
+            first[node.tag] = node
+
+    uid_el = first.get("ID_POZYCJA")
+    if uid_el is None:
+        uid_el = first.get("UID")
+    subject_el = first.get("NAME")
+    if subject_el is None:
+        subject_el = first.get("PRZEDMIOT")
+    if uid_el is None or subject_el is None:
+        return None
+
+    room = None
+    sale_el = first.get("SALE")
+    if sale_el is not None:
+        room_el = next(sale_el.iter("NAME"), None)
+        if room_el is not None:
+            room = _stripped_text(room_el)
+
+    def get_txt(tag_name):
+        el = first.get(tag_name)
+        if el is None or not "".join(el.itertext()):
+            return None
+        return _stripped_text(el)
+
+    return _PlanItemFields(
+        uid=_stripped_text(uid_el),
+        subject=_stripped_text(subject_el),
+        sort=get_txt("SORT"),
+        subgroup=get_txt("PG"),
+        semester_id=get_txt("ID_SEMESTR"),
+        class_type=get_txt("RZ"),
+        room=room,
+        remarks=get_txt("R_UWAGI"),
+        g_od=get_txt("G_OD"),
+        g_do=get_txt("G_DO"),
+        dates_raw=get_txt("TERMIN_DT"),
+    )
+
+
+def _stripped_text(el: ET.Element) -> str:
+    """Odpowiednik BeautifulSoup get_text(strip=True)."""
+    return "".join(part.strip() for part in el.itertext())
+
+
+def _events_from_item(fields: _PlanItemFields, header_semester_id: Optional[str]) -> list[XmlScheduleEvent]:
+    out = []
+    teacher = _format_teacher_name(fields.sort)
+    subgroup = fields.subgroup
+    semester_id = fields.semester_id or header_semester_id
+
+    room = fields.room
+    if not room:
+        remarks = fields.remarks
+        if remarks and "s." in remarks:
+            room = remarks.split("s.")[-1].strip().replace("\n", " ")
+
+    if fields.dates_raw:
+        for d_str in [c.strip() for c in fields.dates_raw.split(";") if c.strip()]:
+            try:
+                current_date = datetime.strptime(d_str, "%Y-%m-%d").date()
+                starts_at = _compose_datetime_iso(current_date, fields.g_od)
+                ends_at = _compose_datetime_iso(current_date, fields.g_do)
+                safe_subgroup = (subgroup or "ALL").replace(" ", "_")
+
+                out.append(XmlScheduleEvent(
+                    external_uid=f"{fields.uid}_{d_str}_{safe_subgroup}",
+                    subject=fields.subject,
+                    starts_at=starts_at,
+                    ends_at=ends_at,
+                    room=room,
+                    class_type=fields.class_type,
+                    teacher_name=teacher,
+                    groups_label=fields.sort,
+                    subgroup=subgroup or "ALL",
+                    id_semestru=semester_id,
+                    raw_dates=[current_date]
+                ))
+            except Exception as e:
+                print(f"Ignoruje wadliwa date w zajeciach {fields.uid}: {e}")
+                continue
+
+    else:
+        out.append(XmlScheduleEvent(
+            external_uid=fields.uid,
+            subject=fields.subject,
+            starts_at=None,
+            ends_at=None,
+            room=room,
+            class_type=fields.class_type,
+            teacher_name=teacher,
+            groups_label=fields.sort,
+            subgroup=subgroup or "ALL",
+            id_semestru=semester_id,
+            raw_dates=[]
+        ))
 
     return out
 
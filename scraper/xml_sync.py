@@ -1,51 +1,74 @@
-import requests
 import xml.etree.ElementTree as ET
-from scraper.db import save_kierunki, save_grupy, save_nauczyciele, get_uuid_map
+from scraper.async_xml_client import create_xml_client
+from scraper.db import (
+    save_kierunki, save_grupy, save_nauczyciele, get_uuid_map, iter_table_rows, remap_groups_for_semester,
+)
+from scraper.fetch_engine import run_bounded
 from scraper.xml_client import XmlClient
+from scraper.run_events import DIGEST_KIND as GROUP_DIGEST_KIND
+from scraper.semester_manager import plan_group_rollover
 from scraper.xml_parsers import parse_directions_from_xml, parse_groups_from_xml
 
 DIRECTIONS_XML = "grupy_lista_kierunkow.xml"
 GROUPS_XML_TEMPLATE = "grupy_lista_grup_kierunku.ID={direction_id}.xml"
-TEACHER_FACULTIES_XML = "https://plan.uz.zgora.pl/static_files/nauczyciel_lista_wydzialow.xml"
-TEACHER_FACULTY_XML_TEMPLATE = "https://plan.uz.zgora.pl/static_files/nauczyciel_lista_wydzialu.ID={faculty_id}.xml"
+TEACHER_FACULTIES_XML = "nauczyciel_lista_wydzialow.xml"
+TEACHER_FACULTY_XML_TEMPLATE = "nauczyciel_lista_wydzialu.ID={faculty_id}.xml"
 GROUP_PAGE_URL_TEMPLATE = "https://plan.uz.zgora.pl/grupy_plan.php?ID={group_id}"
+METRICS_STAGE = "katalogi"
 
 
-def sync_directions_and_groups_from_xml(client=None, verbose=True):
-    """Synchronizuje kierunki, grupy i nauczycieli na podstawie plikow XML UZ."""
-    client = client or XmlClient()
+def sync_directions_and_groups_from_xml(client=None, verbose=True, workers=None, rollover=False, digests=None):
+    """Synchronizuje kierunki, grupy i nauczycieli na podstawie plikow XML UZ.
+
+    rollover=True (zmiana semestru): grupy z bazy, ktorych nie ma w nowym katalogu,
+    przejmuja identyfikatory i kody dopasowanych nowych grup, zachowujac swoje UUID.
+    """
+    owns_client = client is None
+    client = client or create_xml_client(stage=METRICS_STAGE)
 
     if verbose:
         print("Synchronizuje kierunki, grupy i nauczycieli z XML...")
 
-    directions = _sync_directions(client)
-    _sync_groups(client, directions)
-    _sync_teachers()
+    try:
+        directions = _sync_directions(client)
+        _sync_groups(client, directions, workers=workers, rollover=rollover, digests=digests)
+        teachers_count = _sync_teachers(client, workers=workers)
+    finally:
+        if owns_client:
+            client.close()
 
-    return {"status": "ok"}
+    return {"status": "ok", "teachers": teachers_count}
 
 
 def _sync_directions(client: XmlClient):
     directions_xml = client.fetch_xml(DIRECTIONS_XML)
-    directions = parse_directions_from_xml(directions_xml.content)
+    directions = parse_directions_from_xml(directions_xml.payload)
     save_kierunki(directions)
     return directions
 
 
-def _sync_groups(client: XmlClient, directions):
-    kierunek_map = get_uuid_map("kierunki", "external_id", "id")
+def _sync_groups(client: XmlClient, directions, workers=None, rollover=False, digests=None):
+    """Pobiera i parsuje listy grup kierunkow rownolegle, po czym zapisuje je jednym save_grupy."""
+    kierunek_map = get_uuid_map("kierunki", "external_id", "id", stage=METRICS_STAGE)
     all_groups = []
 
-    for direction in directions:
+    def fetch_direction_groups(direction):
         groups_xml = client.fetch_xml(GROUPS_XML_TEMPLATE.format(direction_id=direction.external_id))
-        if not groups_xml.content:
-            continue
+        if not groups_xml.payload:
+            return []
+        return parse_groups_from_xml(groups_xml.payload, direction_external_id=direction.external_id)
 
-        kierunek_uuid = kierunek_map.get(str(direction.external_id).strip())
-        if not kierunek_uuid:
+    # Kierunki bez wpisu w bazie pomijamy jeszcze przed pobieraniem.
+    known_directions = [d for d in directions if kierunek_map.get(str(d.external_id).strip())]
+
+    for outcome in run_bounded(fetch_direction_groups, known_directions, workers):
+        direction = outcome.item
+        if outcome.error is not None:
+            print(f"Blad pobierania grup kierunku {direction.external_id}: {outcome.error}")
             continue
 
-        for group in parse_groups_from_xml(groups_xml.content, direction_external_id=direction.external_id):
+        kierunek_uuid = kierunek_map.get(str(direction.external_id).strip())
+        for group in outcome.result:
             all_groups.append({
                 "grupa_id": group.external_id,
                 "kod_grupy": group.code,
@@ -54,30 +77,82 @@ def _sync_groups(client: XmlClient, directions):
                 "tryb_studiow": group.study_mode or "nieznany",
             })
 
-    save_grupy(all_groups)
-
-
-def _sync_teachers():
-    wydzialy_resp = requests.get(TEACHER_FACULTIES_XML)
-    wydzialy_resp.encoding = "utf-8"
-    root_wydzialy = ET.fromstring(wydzialy_resp.text)
-
-    for item in [node for node in root_wydzialy.findall(".//ITEM") if node.find("ID") is not None]:
-        wydzial_id = item.find("ID").text
-        if not wydzial_id:
-            continue
-
-        nauczyciele_resp = requests.get(TEACHER_FACULTY_XML_TEMPLATE.format(faculty_id=wydzial_id))
-        nauczyciele_resp.encoding = "utf-8"
-        teachers_xml = ET.fromstring(nauczyciele_resp.text)
-
-        payload = []
-        for teacher in teachers_xml.findall(".//ITEM"):
-            payload.append({
+    if rollover:
+        _remap_groups_for_new_semester(all_groups, digests)
+    save_grupy(all_groups, stage=METRICS_STAGE)
+
+
+def _remap_groups_for_new_semester(all_groups, digests=None) -> int:
+    """Przepina istniejace wiersze grup na kody nowego semestru; save_grupy zaktualizuje je potem po grupa_id.
+
+    Zajecia grup zapisane pod starym grupa_id sa przepinane razem z grupa w jednej transakcji -
+    inaczej zostalyby bez wlasciciela, a StaleEventReconciler (filtrujacy po grupa_id) nigdy by ich
+    nie obejrzal. Blad przepiecia przerywa synchronizacje katalogow: baza zostaje bez zmian,
+    a stan semestru nie jest zapisywany, wiec kolejny przebieg ponawia rollover.
+    """
+    existing = list(iter_table_rows("grupy", "id, grupa_id, nazwa, kierunek_id", key_col="id", stage=METRICS_STAGE))
+    remaps = plan_group_rollover(existing, all_groups)
+
+    updated, moved_events = 0, 0
+    if remaps:
+        updated, moved_events = remap_groups_for_semester([
+            {"id": str(remap.group_uuid), "old_grupa_id": remap.old_grupa_id,
+             "new_grupa_id": remap.new_grupa_id, "nazwa": remap.new_code}
+            for remap in remaps
+        ], stage=METRICS_STAGE)
+
+    if digests and remaps:
+        # Skroty starych identyfikatorow i tak by nie pasowaly - nie trzymamy ich w pliku.
+        for remap in remaps:
+            digests.forget(GROUP_DIGEST_KIND, remap.old_grupa_id)
+        digests.save()
+
+    strategies = {}
+    for remap in remaps:
+        strategies[remap.strategy] = strategies.get(remap.strategy, 0) + 1
+    print(f"Zmiana semestru: przepieto {updated} z {len(remaps)} dopasowanych grup {strategies}, "
+          f"zajec: {moved_events}")
+    return updated
+
+
+def _sync_teachers(client: XmlClient, workers=None) -> int:
+    """Pobiera listy nauczycieli wszystkich wydzialow rownolegle i zapisuje je jednym zbiorczym zapisem."""
+    faculties_xml = client.fetch_xml(TEACHER_FACULTIES_XML)
+    if not faculties_xml.payload:
+        print(f"Brak listy wydzialow nauczycieli ({faculties_xml.url}, status {faculties_xml.status_code})")
+        return 0
+
+    root_wydzialy = ET.fromstring(faculties_xml.payload)
+    faculty_ids = []
+    for item in root_wydzialy.findall(".//ITEM"):
+        wydzial_id = item.findtext("ID")
+        if wydzial_id:
+            faculty_ids.append(wydzial_id)
+
+    def fetch_faculty(faculty_id):
+        teachers_xml = client.fetch_xml(TEACHER_FACULTY_XML_TEMPLATE.format(faculty_id=faculty_id))
+        if not teachers_xml.payload:
+            return []
+        return [
+            {
                 "name": teacher.findtext("NAME"),
                 "unit_name": teacher.findtext("JEDN"),
                 "external_id": teacher.findtext("ID"),
                 "email": teacher.findtext("E_MAIL"),
-            })
+            }
+            for teacher in ET.fromstring(teachers_xml.payload).findall(".//ITEM")
+        ]
+
+    # Nauczyciel z kilku wydzialow jest zapisywany raz - wygrywa ostatni wydzial, jak przy zapisie per wydzial.
+    unique_teachers = {}
+    for outcome in run_bounded(fetch_faculty, faculty_ids, workers):
+        if outcome.error is not None:
+            print(f"Blad pobierania nauczycieli wydzialu {outcome.item}: {outcome.error}")
+            continue
+        for teacher in outcome.result:
+            ext_id = (teacher["external_id"] or "").strip()
+            if ext_id:
+                unique_teachers[ext_id] = teacher
 
-        save_nauczyciele(payload)
+    save_nauczyciele(list(unique_teachers.values()), stage=METRICS_STAGE)
+    return len(unique_teachers)
@@ -0,0 +1,191 @@
+-- Partycjonowanie tabel zajec po id_semestru (LIST).
+--
+-- Kazdy semestr trafia do osobnej partycji (np. zajecia_grupy_s_231), wiersze bez
+-- id_semestru do partycji domyslnej. Wycofanie starego semestru to odlaczenie partycji
+-- (i przeniesienie do schematu archiwum albo DROP) zamiast DELETE po calej tabeli.
+--
+-- Klucz upsertu zmienia sie z (uid) na (uid, id_semestru) - unikalnosc w tabeli
+-- partycjonowanej musi obejmowac klucz partycji. Scraper rozpoznaje schemat przez
+-- zajecia_events_partitioned() i wysyla wtedy on_conflict "uid,id_semestru". NULLS NOT DISTINCT (PostgreSQL 15+)
+-- sprawia, ze wiersze bez semestru nadal sa nadpisywane zamiast dublowane.
+--
+-- Migracja przepisuje dane do nowej tabeli; klucze obce, RLS i polityki sa kopiowane
+-- z tabeli zrodlowej. Klucz glowny na samym id nie jest odtwarzany (nie moze pominac
+-- klucza partycji) - wiersz identyfikuje (uid, id_semestru), kolumna id zostaje z domyslna wartoscia.
+
+begin;
+
+create schema if not exists archiwum;
+
+create or replace function public.zajecia_partition_name(p_table text, p_id_semestru text)
+returns text
+language sql
+immutable
+as $$
+    select p_table || '_s_' || lower(regexp_replace(p_id_semestru, '[^A-Za-z0-9]+', '_', 'g'));
+$$;
+
+create or replace function pg_temp.partition_events_table(p_table text, p_owner_col text)
+returns void
+language plpgsql
+as $$
+declare
+    v_old text := p_table || '_unpartitioned';
+    v_sem text;
+    v_con record;
+    v_pol record;
+    v_rls boolean;
+begin
+    execute format('alter table public.%I rename to %I', p_table, v_old);
+
+    execute format(
+        'create table public.%I (like public.%I including defaults including identity '
+        'including generated including storage including comments) partition by list (id_semestru)',
+        p_table, v_old
+    );
+    execute format('create table public.%I partition of public.%I default', p_table || '_default', p_table);
+
+    for v_sem in execute format('select distinct id_semestru from public.%I where id_semestru is not null', v_old)
+    loop
+        execute format(
+            'create table public.%I partition of public.%I for values in (%L)',
+            public.zajecia_partition_name(p_table, v_sem), p_table, v_sem
+        );
+    end loop;
+
+    execute format('insert into public.%I select * from public.%I', p_table, v_old);
+
+    execute format(
+        'alter table public.%I add constraint %I unique nulls not distinct (uid, id_semestru)',
+        p_table, p_table || '_uid_semestr_key'
+    );
+    execute format('create index %I on public.%I (%I, poczatek)', p_table || '_owner_poczatek_idx', p_table, p_owner_col);
+    execute format('create index %I on public.%I (poczatek)', p_table || '_poczatek_idx', p_table);
+
+    for v_con in
+        select conname, pg_get_constraintdef(oid) as def
+        from pg_constraint
+        where conrelid = format('public.%I', v_old)::regclass and contype = 'f'
+    loop
+        execute format('alter table public.%I add constraint %I %s', p_table, v_con.conname, v_con.def);
+    end loop;
+
+    select relrowsecurity into v_rls from pg_class where oid = format('public.%I', v_old)::regclass;
+    if v_rls then
+        execute format('alter table public.%I enable row level security', p_table);
+    end if;
+
+    for v_pol in
+        select policyname, permissive, cmd, roles, qual, with_check
+        from pg_policies
+        where schemaname = 'public' and tablename = v_old
+    loop
+        execute format(
+            'create policy %I on public.%I as %s for %s to %s%s%s',
+            v_pol.policyname, p_table, v_pol.permissive, v_pol.cmd,
+            array_to_string(array(select quote_ident(r) from unnest(v_pol.roles) r), ', '),
+            coalesce(' using (' || v_pol.qual || ')', ''),
+            coalesce(' with check (' || v_pol.with_check || ')', '')
+        );
+    end loop;
+
+    execute format('grant all on table public.%I to anon, authenticated, service_role', p_table);
+    execute format('drop table public.%I', v_old);
+end;
+$$;
+
+select pg_temp.partition_events_table('zajecia_grupy', 'grupa_id');
+select pg_temp.partition_events_table('zajecia_nauczyciela', 'nauczyciel_id');
+
+
+-- Zaklada partycje semestru w obu tabelach i przenosi do niej wiersze z partycji domyslnej.
+create or replace function public.ensure_zajecia_semester_partitions(p_id_semestru text)
+returns integer
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_table text;
+    v_part text;
+    v_created integer := 0;
+begin
+    foreach v_table in array array['zajecia_grupy', 'zajecia_nauczyciela']
+    loop
+        v_part := public.zajecia_partition_name(v_table, p_id_semestru);
+        if to_regclass(format('public.%I', v_part)) is not null then
+            continue;
+        end if;
+
+        -- ATTACH nie przejdzie, gdy partycja domyslna ma juz wiersze tego semestru.
+        execute format('create table public.%I (like public.%I including defaults including generated)', v_part, v_table);
+        execute format(
+            'with moved as (delete from public.%I where id_semestru = %L returning *) '
+            'insert into public.%I select * from moved',
+            v_table || '_default', p_id_semestru, v_part
+        );
+        execute format(
+            'alter table public.%I attach partition public.%I for values in (%L)',
+            v_table, v_part, p_id_semestru
+        );
+        v_created := v_created + 1;
+    end loop;
+    return v_created;
+end;
+$$;
+
+
+-- Odlacza partycje semestru; p_archive = true przenosi je do schematu archiwum, false usuwa.
+create or replace function public.retire_zajecia_semester(p_id_semestru text, p_archive boolean default true)
+returns integer
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_table text;
+    v_part text;
+    v_retired integer := 0;
+begin
+    foreach v_table in array array['zajecia_grupy', 'zajecia_nauczyciela']
+    loop
+        v_part := public.zajecia_partition_name(v_table, p_id_semestru);
+        if to_regclass(format('public.%I', v_part)) is null then
+            continue;
+        end if;
+
+        execute format('alter table public.%I detach partition public.%I', v_table, v_part);
+        if p_archive then
+            execute format('alter table public.%I set schema archiwum', v_part);
+        else
+            execute format('drop table public.%I', v_part);
+        end if;
+        v_retired := v_retired + 1;
+    end loop;
+    return v_retired;
+end;
+$$;
+
+-- Scraper sprawdza przy starcie, czy tabele zajec sa partycjonowane (wybor klucza upsertu).
+create or replace function public.zajecia_events_partitioned()
+returns boolean
+language sql
+stable
+security definer
+set search_path = public
+as $$
+    select exists (
+        select 1 from pg_partitioned_table where partrelid = to_regclass('public.zajecia_grupy')
+    ) and exists (
+        select 1 from pg_partitioned_table where partrelid = to_regclass('public.zajecia_nauczyciela')
+    );
+$$;
+
+revoke all on function public.zajecia_events_partitioned() from public, anon, authenticated;
+grant execute on function public.zajecia_events_partitioned() to service_role;
+revoke all on function public.ensure_zajecia_semester_partitions(text) from public, anon, authenticated;
+revoke all on function public.retire_zajecia_semester(text, boolean) from public, anon, authenticated;
+grant execute on function public.ensure_zajecia_semester_partitions(text) to service_role;
+grant execute on function public.retire_zajecia_semester(text, boolean) to service_role;
+
+commit;
@@ -0,0 +1,44 @@
+-- Kasowanie nieaktualnych przyszlych zajec jednym wywolaniem RPC.
+--
+-- StaleEventReconciler wysyla trojki (uid, wlasciciel, id_semestru) jako tablice w tresci
+-- POST zamiast filtrow in.(...) w URL-u DELETE, wiec rozmiar paczki nie jest ograniczony
+-- dlugoscia adresu. Wiersz jest usuwany tylko, gdy nadal nalezy do tego samego wlasciciela
+-- (mogl go w miedzyczasie przejac inny shard) i wciaz jest w przyszlosci. Dziala przed
+-- i po partycjonowaniu tabel zajec (20261017000000_partition_zajecia_by_semester.sql).
+
+create or replace function public.delete_stale_zajecia(
+    p_table text,
+    p_uids text[],
+    p_owners text[],
+    p_semesters text[]
+)
+returns integer
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_owner_col text;
+    v_deleted integer;
+begin
+    v_owner_col := case p_table
+        when 'zajecia_grupy' then 'grupa_id'
+        when 'zajecia_nauczyciela' then 'nauczyciel_id'
+    end;
+    if v_owner_col is null then
+        raise exception 'delete_stale_zajecia: nieobslugiwana tabela %', p_table;
+    end if;
+
+    execute format(
+        'delete from public.%I t using unnest($1, $2, $3) as s(uid, owner, id_semestru) '
+        'where t.uid = s.uid and t.%I::text = s.owner '
+        'and t.id_semestru is not distinct from s.id_semestru and t.poczatek > now()',
+        p_table, v_owner_col
+    ) using p_uids, p_owners, p_semesters;
+    get diagnostics v_deleted = row_count;
+    return v_deleted;
+end;
+$$;
+
+revoke all on function public.delete_stale_zajecia(text, text[], text[], text[]) from public, anon, authenticated;
+grant execute on function public.delete_stale_zajecia(text, text[], text[], text[]) to service_role;
@@ -0,0 +1,47 @@
+-- Przepiecie grup na identyfikatory nowego semestru razem z ich zajeciami, w jednej transakcji.
+--
+-- Rollover (scraper/xml_sync.py) przekazuje liste {id, old_grupa_id, new_grupa_id, nazwa}.
+-- Grupa i jej zajecia zmieniaja grupa_id w jednym poleceniu (zapisujace CTE), wiec:
+-- - przy kluczu obcym zajecia_grupy.grupa_id bez ON UPDATE CASCADE (NO ACTION) sprawdzenie
+--   klucza odbywa sie po calym poleceniu, gdy obie tabele wskazuja juz nowy identyfikator,
+-- - przy ON UPDATE CASCADE kaskada nie ma juz czego przepinac,
+-- - blad (np. zajety nowy grupa_id) wycofuje cale przepiecie - grupy i zajecia nie zostaja w polowie.
+-- Zajecia sa przepinane tylko dla grup, ktore nadal mialy stary grupa_id.
+
+create or replace function public.remap_grupy_semester(p_remaps jsonb)
+returns jsonb
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+    v_groups integer;
+    v_events integer;
+begin
+    with remap as (
+        select r.id, r.old_grupa_id, r.new_grupa_id, r.nazwa
+        from jsonb_to_recordset(p_remaps) as r(id text, old_grupa_id text, new_grupa_id text, nazwa text)
+    ),
+    moved_groups as (
+        update public.grupy g
+        set grupa_id = remap.new_grupa_id, nazwa = coalesce(remap.nazwa, g.nazwa)
+        from remap
+        where g.id::text = remap.id and g.grupa_id = remap.old_grupa_id
+        returning remap.old_grupa_id, remap.new_grupa_id
+    ),
+    moved_events as (
+        update public.zajecia_grupy z
+        set grupa_id = moved_groups.new_grupa_id
+        from moved_groups
+        where z.grupa_id = moved_groups.old_grupa_id
+        returning 1
+    )
+    select (select count(*) from moved_groups), (select count(*) from moved_events)
+    into v_groups, v_events;
+
+    return jsonb_build_object('grupy', v_groups, 'zajecia', v_events);
+end;
+$$;
+
+revoke all on function public.remap_grupy_semester(jsonb) from public, anon, authenticated;
+grant execute on function public.remap_grupy_semester(jsonb) to service_role;
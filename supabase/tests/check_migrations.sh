@@ -0,0 +1,16 @@
+#!/usr/bin/env bash
+# Uruchamia kazdy supabase/tests/*_check.sql w osobnej tymczasowej bazie lokalnego Postgresa (15+).
+#
+# Polaczenie przez standardowe zmienne libpq, np. dla `supabase start`:
+#   PGHOST=localhost PGPORT=54322 PGUSER=postgres PGPASSWORD=postgres supabase/tests/check_migrations.sh
+set -euo pipefail
+
+here="$(cd "$(dirname "$0")" && pwd)"
+db="scraper_migration_check_$$"
+trap 'dropdb --if-exists "$db" 2>/dev/null' EXIT
+
+for check in "$here"/*_check.sql; do
+    createdb "$db"
+    psql -X -q -v ON_ERROR_STOP=1 -d "$db" -f "$check"
+    dropdb "$db"
+done
@@ -0,0 +1,180 @@
+-- Sprawdzenie migracji 20261017000000_partition_zajecia_by_semester.sql i 20261018000000_delete_stale_zajecia.sql
+-- na pustej bazie.
+-- Uruchamiane przez check_migrations.sh (tymczasowa baza, psql z ON_ERROR_STOP);
+-- kazda nieudana asercja konczy skrypt bledem.
+
+\set ON_ERROR_STOP 1
+set client_min_messages = warning;
+
+-- Schemat sprzed migracji: klucz upsertu na samym uid, klucze obce do grup i nauczycieli.
+do $$
+begin
+    if not exists (select 1 from pg_roles where rolname = 'anon') then create role anon nologin; end if;
+    if not exists (select 1 from pg_roles where rolname = 'authenticated') then create role authenticated nologin; end if;
+    if not exists (select 1 from pg_roles where rolname = 'service_role') then create role service_role nologin; end if;
+end;
+$$;
+
+create table public.grupy (id uuid primary key default gen_random_uuid(), grupa_id text unique not null);
+create table public.nauczyciele (id uuid primary key default gen_random_uuid(), external_id text unique);
+
+create table public.zajecia_grupy (
+    id uuid primary key default gen_random_uuid(),
+    uid text unique not null,
+    id_semestru text,
+    poczatek timestamptz,
+    koniec timestamptz,
+    przedmiot text,
+    rodzaj_zajec text,
+    sala text,
+    nauczyciel text,
+    podgrupa varchar(20),
+    grupa_id text references public.grupy (grupa_id) on update cascade on delete cascade
+);
+create table public.zajecia_nauczyciela (
+    id uuid primary key default gen_random_uuid(),
+    uid text unique not null,
+    id_semestru text,
+    poczatek timestamptz,
+    koniec timestamptz,
+    przedmiot text,
+    rodzaj_zajec text,
+    sala text,
+    grupy text,
+    nauczyciel_id uuid references public.nauczyciele (id) on delete cascade
+);
+alter table public.zajecia_grupy enable row level security;
+create policy "odczyt zajec grup" on public.zajecia_grupy for select to anon, authenticated using (true);
+
+insert into public.grupy (grupa_id) values ('27001'), ('28001');
+insert into public.nauczyciele (id, external_id) values ('00000000-0000-0000-0000-000000000501', '501');
+insert into public.zajecia_grupy (uid, id_semestru, poczatek, przedmiot, grupa_id) values
+    ('27001_1_2026-03-02_ALL', '230', '2026-03-02 08:00+01', 'Fizyka', '27001'),
+    ('27001_2_2026-10-05_ALL', '231', '2026-10-05 08:00+02', 'Bazy danych', '27001'),
+    ('28001_3',                null,  null,                  'Bez terminu', '28001');
+insert into public.zajecia_nauczyciela (uid, id_semestru, poczatek, przedmiot, nauczyciel_id) values
+    ('501_1_2026-10-05_ALL', '231', '2026-10-05 08:00+02', 'Bazy danych', '00000000-0000-0000-0000-000000000501');
+
+-- delete_stale_zajecia na tabelach sprzed partycjonowania: tylko trojki zgodne co do wlasciciela
+-- i semestru, tylko przyszle wiersze.
+\ir ../migrations/20261018000000_delete_stale_zajecia.sql
+
+insert into public.zajecia_grupy (uid, id_semestru, poczatek, przedmiot, grupa_id) values
+    ('27001_9_2099-10-05_ALL', '231', '2099-10-05 08:00+02', 'Do usuniecia', '27001');
+
+do $$
+begin
+    assert public.delete_stale_zajecia('zajecia_grupy',
+        array['27001_9_2099-10-05_ALL', '27001_9_2099-10-05_ALL', '27001_1_2026-03-02_ALL'],
+        array['28001', '27001', '27001'],
+        array['231', '231', '230']) = 1, 'usuniety tylko przyszly wiersz wlasciciela';
+    assert (select count(*) from public.zajecia_grupy) = 3, 'pozostale wiersze bez zmian';
+    begin
+        perform public.delete_stale_zajecia('grupy', array['x'], array['x'], array['x']);
+        raise exception 'inna tabela niz zajecia nie powinna przejsc';
+    exception
+        when raise_exception then
+            if sqlerrm not like 'delete_stale_zajecia:%' then raise; end if;
+    end;
+end;
+$$;
+
+\ir ../migrations/20261017000000_partition_zajecia_by_semester.sql
+
+-- Struktura: tabele partycjonowane, partycje istniejacych semestrow, dane przepisane, RLS i polityki zachowane.
+do $$
+begin
+    assert public.zajecia_events_partitioned(), 'zajecia_events_partitioned() po migracji';
+    assert to_regclass('public.zajecia_grupy_s_230') is not null, 'partycja 230';
+    assert to_regclass('public.zajecia_grupy_s_231') is not null, 'partycja 231';
+    assert to_regclass('public.zajecia_nauczyciela_s_231') is not null, 'partycja nauczycieli 231';
+    assert to_regclass('public.zajecia_grupy_unpartitioned') is null, 'stara tabela usunieta';
+    assert (select count(*) from public.zajecia_grupy) = 3, 'wiersze grup przepisane';
+    assert (select count(*) from public.zajecia_grupy_default) = 1, 'wiersz bez semestru w partycji domyslnej';
+    assert (select count(*) from public.zajecia_nauczyciela) = 1, 'wiersze nauczycieli przepisane';
+    assert (select relrowsecurity from pg_class where oid = 'public.zajecia_grupy'::regclass), 'RLS';
+    assert exists (select 1 from pg_policies where tablename = 'zajecia_grupy' and policyname = 'odczyt zajec grup'),
+        'polityka skopiowana';
+    assert exists (select 1 from pg_constraint where conrelid = 'public.zajecia_grupy'::regclass and contype = 'f'),
+        'klucz obcy skopiowany';
+end;
+$$;
+
+-- Upsert jak z PostgREST (on_conflict=uid,id_semestru): nadpisanie zamiast duplikatu, takze bez semestru.
+insert into public.zajecia_grupy (uid, id_semestru, przedmiot, grupa_id) values
+    ('27001_2_2026-10-05_ALL', '231', 'Bazy danych (zmiana)', '27001'),
+    ('28001_3', null, 'Bez terminu (zmiana)', '28001')
+on conflict (uid, id_semestru) do update set przedmiot = excluded.przedmiot;
+
+do $$
+begin
+    assert (select count(*) from public.zajecia_grupy) = 3, 'upsert nie dubluje wierszy';
+    assert (select przedmiot from public.zajecia_grupy where uid = '27001_2_2026-10-05_ALL') = 'Bazy danych (zmiana)',
+        'upsert nadpisuje wiersz semestru';
+    assert (select przedmiot from public.zajecia_grupy where uid = '28001_3') = 'Bez terminu (zmiana)',
+        'upsert nadpisuje wiersz bez semestru (nulls not distinct)';
+end;
+$$;
+
+-- Stary klucz upsertu (on_conflict=uid) nie pasuje juz do zadnego ograniczenia.
+do $$
+begin
+    insert into public.zajecia_grupy (uid, id_semestru, grupa_id) values ('27001_x', '231', '27001')
+    on conflict (uid) do nothing;
+    raise exception 'on_conflict=uid nie powinien dzialac po migracji';
+exception
+    when invalid_column_reference then null;
+end;
+$$;
+
+-- Nowy semestr: wiersze z partycji domyslnej przechodza do nowej partycji, drugie wywolanie nic nie robi.
+insert into public.zajecia_grupy (uid, id_semestru, przedmiot, grupa_id)
+values ('27001_4_2027-03-01_ALL', '232', 'Statystyka', '27001');
+
+do $$
+begin
+    assert public.ensure_zajecia_semester_partitions('232') = 2, 'partycje 232 w obu tabelach';
+    assert public.ensure_zajecia_semester_partitions('232') = 0, 'ponowne wywolanie bez zmian';
+    assert (select count(*) from public.zajecia_grupy_s_232) = 1, 'wiersz przeniesiony z partycji domyslnej';
+    assert (select count(*) from public.zajecia_grupy_default) = 1, 'w domyslnej zostal tylko wiersz bez semestru';
+end;
+$$;
+
+insert into public.zajecia_grupy (uid, id_semestru, przedmiot, grupa_id)
+values ('27001_4_2027-03-01_ALL', '232', 'Statystyka (zmiana)', '27001')
+on conflict (uid, id_semestru) do update set przedmiot = excluded.przedmiot;
+
+-- Wycofanie semestru: archiwum przenosi partycje do schematu archiwum, false je usuwa.
+do $$
+begin
+    assert (select przedmiot from public.zajecia_grupy_s_232) = 'Statystyka (zmiana)', 'upsert w nowej partycji';
+    assert public.retire_zajecia_semester('230') = 1, 'tylko grupy maja partycje 230';
+    assert to_regclass('archiwum.zajecia_grupy_s_230') is not null, 'partycja 230 w archiwum';
+    assert (select count(*) from archiwum.zajecia_grupy_s_230) = 1, 'dane 230 zachowane w archiwum';
+    assert not exists (select 1 from public.zajecia_grupy where id_semestru = '230'), '230 poza tabela';
+    assert public.retire_zajecia_semester('232', false) = 2, 'partycje 232 usuniete';
+    assert to_regclass('public.zajecia_grupy_s_232') is null and to_regclass('archiwum.zajecia_grupy_s_232') is null,
+        'partycja 232 usunieta';
+    assert public.retire_zajecia_semester('232') = 0, 'brak partycji do wycofania';
+    assert (select count(*) from public.zajecia_grupy) = 2, 'pozostale semestry nietkniete';
+end;
+$$;
+
+-- delete_stale_zajecia po partycjonowaniu: ten sam uid w innym semestrze zostaje.
+insert into public.zajecia_grupy (uid, id_semestru, poczatek, przedmiot, grupa_id) values
+    ('27001_9_2099-10-05_ALL', '231', '2099-10-05 08:00+02', 'Aktualne', '27001'),
+    ('27001_9_2099-10-05_ALL', null,  '2099-10-05 08:00+02', 'Do usuniecia', '27001');
+
+do $$
+begin
+    assert public.delete_stale_zajecia('zajecia_grupy',
+        array['27001_9_2099-10-05_ALL'], array['27001'], array[null]::text[]) = 1, 'usuniety wiersz bez semestru';
+    assert (select przedmiot from public.zajecia_grupy where uid = '27001_9_2099-10-05_ALL') = 'Aktualne',
+        'wiersz semestru 231 zostal';
+    assert public.delete_stale_zajecia('zajecia_nauczyciela',
+        array['501_1_2026-10-05_ALL'], array['00000000-0000-0000-0000-000000000501'], array['231']) = 0,
+        'przeszle zajecia nauczyciela nie sa usuwane';
+end;
+$$;
+
+\echo 'OK: migracje partycjonowania i kasowania zajec'
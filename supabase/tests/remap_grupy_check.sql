@@ -0,0 +1,103 @@
+-- Sprawdzenie migracji 20261018010000_remap_grupy_semester.sql: przepiecie grup i zajec
+-- przy kluczu obcym bez kaskady i z ON UPDATE CASCADE oraz wycofanie calosci przy bledzie.
+
+\set ON_ERROR_STOP 1
+set client_min_messages = warning;
+
+do $$
+begin
+    if not exists (select 1 from pg_roles where rolname = 'anon') then create role anon nologin; end if;
+    if not exists (select 1 from pg_roles where rolname = 'authenticated') then create role authenticated nologin; end if;
+    if not exists (select 1 from pg_roles where rolname = 'service_role') then create role service_role nologin; end if;
+end;
+$$;
+
+create table public.grupy (
+    id uuid primary key default gen_random_uuid(),
+    grupa_id text unique not null,
+    nazwa text
+);
+-- Klucz obcy bez ON UPDATE CASCADE (NO ACTION).
+create table public.zajecia_grupy (
+    id uuid primary key default gen_random_uuid(),
+    uid text unique not null,
+    id_semestru text,
+    poczatek timestamptz,
+    grupa_id text constraint zajecia_grupy_grupa_fk references public.grupy (grupa_id) on delete cascade
+);
+
+\ir ../migrations/20261018010000_remap_grupy_semester.sql
+
+insert into public.grupy (id, grupa_id, nazwa) values
+    ('00000000-0000-0000-0000-000000000001', '27001', '21INF-SP'),
+    ('00000000-0000-0000-0000-000000000002', '27002', '22INF-SP'),
+    ('00000000-0000-0000-0000-000000000003', '28001', '21AiR-SP');
+insert into public.zajecia_grupy (uid, id_semestru, poczatek, grupa_id) values
+    ('27001_1', '230', '2026-03-02 08:00+01', '27001'),
+    ('27001_2', '230', '2099-03-02 08:00+01', '27001'),
+    ('27002_1', '230', '2026-03-02 08:00+01', '27002'),
+    ('28001_1', '230', '2026-03-02 08:00+01', '28001');
+
+do $$
+declare
+    v_result jsonb;
+begin
+    v_result := public.remap_grupy_semester(
+        '[{"id": "00000000-0000-0000-0000-000000000001", "old_grupa_id": "27001", "new_grupa_id": "37001", "nazwa": "21INF-SP"},
+          {"id": "00000000-0000-0000-0000-000000000002", "old_grupa_id": "stary", "new_grupa_id": "37002", "nazwa": "x"}]'
+    );
+    assert v_result = '{"grupy": 1, "zajecia": 2}'::jsonb, format('bez kaskady: %s', v_result);
+    assert (select grupa_id from public.grupy where id = '00000000-0000-0000-0000-000000000001') = '37001',
+        'grupa przepieta';
+    assert (select count(*) from public.zajecia_grupy where grupa_id = '37001') = 2, 'zajecia przepiete';
+    assert (select grupa_id from public.grupy where id = '00000000-0000-0000-0000-000000000002') = '27002',
+        'grupa z nieaktualnym starym grupa_id bez zmian';
+    assert (select count(*) from public.zajecia_grupy where grupa_id = '27002') = 1, 'jej zajecia bez zmian';
+end;
+$$;
+
+-- Blad w polowie (nowy grupa_id zajety przez inna grupe) wycofuje cale przepiecie.
+do $$
+begin
+    perform public.remap_grupy_semester(
+        '[{"id": "00000000-0000-0000-0000-000000000002", "old_grupa_id": "27002", "new_grupa_id": "37002", "nazwa": "22INF-SP"},
+          {"id": "00000000-0000-0000-0000-000000000003", "old_grupa_id": "28001", "new_grupa_id": "37001", "nazwa": "21AiR-SP"}]'
+    );
+    raise exception 'zajety grupa_id powinien przerwac przepiecie';
+exception
+    when unique_violation then null;
+end;
+$$;
+
+do $$
+begin
+    assert (select grupa_id from public.grupy where id = '00000000-0000-0000-0000-000000000002') = '27002',
+        'grupa 27002 nieprzepieta po bledzie';
+    assert (select count(*) from public.zajecia_grupy where grupa_id = '27002') = 1, 'zajecia 27002 nieprzepiete';
+    assert (select count(*) from public.zajecia_grupy where grupa_id = '28001') = 1, 'zajecia 28001 nieprzepiete';
+end;
+$$;
+
+-- Klucz obcy z ON UPDATE CASCADE.
+alter table public.zajecia_grupy drop constraint zajecia_grupy_grupa_fk;
+alter table public.zajecia_grupy add constraint zajecia_grupy_grupa_fk
+    foreign key (grupa_id) references public.grupy (grupa_id) on update cascade on delete cascade;
+
+do $$
+declare
+    v_result jsonb;
+begin
+    v_result := public.remap_grupy_semester(
+        '[{"id": "00000000-0000-0000-0000-000000000002", "old_grupa_id": "27002", "new_grupa_id": "37002", "nazwa": "22INF-SP"},
+          {"id": "00000000-0000-0000-0000-000000000003", "old_grupa_id": "28001", "new_grupa_id": "38001", "nazwa": null}]'
+    );
+    assert v_result = '{"grupy": 2, "zajecia": 2}'::jsonb, format('z kaskada: %s', v_result);
+    assert (select count(*) from public.zajecia_grupy where grupa_id = '37002') = 1, 'zajecia 37002';
+    assert (select count(*) from public.zajecia_grupy where grupa_id = '38001') = 1, 'zajecia 38001';
+    assert (select nazwa from public.grupy where grupa_id = '38001') = '21AiR-SP', 'nazwa zachowana przy null';
+    assert not exists (select 1 from public.zajecia_grupy z left join public.grupy g using (grupa_id) where g.id is null),
+        'brak zajec bez grupy';
+end;
+$$;
+
+\echo 'OK: przepiecie grup na nowy semestr'
@@ -0,0 +1,5 @@
+import os
+
+# scraper.db tworzy klienta Supabase przy imporcie - testy podmieniaja go na FakeSupabase.
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test")
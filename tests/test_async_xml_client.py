@@ -0,0 +1,83 @@
+import asyncio
+import threading
+
+import httpx
+
+from scraper.async_xml_client import AsyncXmlClient
+from scraper.flow_control import AdaptiveConcurrencyController
+from scraper.http_cache import HttpCache
+
+URL = "https://plan.example/static_files/grupy_lista.xml"
+
+
+class ThreadRecordingCache(HttpCache):
+    def __init__(self, directory) -> None:
+        super().__init__(directory)
+        self.io_threads = []
+
+    def lookup(self, url):
+        self.io_threads.append(threading.get_ident())
+        return super().lookup(url)
+
+    def store(self, url, etag, last_modified, body):
+        self.io_threads.append(threading.get_ident())
+        super().store(url, etag, last_modified, body)
+
+    def touch(self, url):
+        self.io_threads.append(threading.get_ident())
+        super().touch(url)
+
+
+def _fetch(handler, cache=None, max_retries=3):
+    async def run():
+        client = AsyncXmlClient(
+            max_retries=max_retries,
+            backoff_start_seconds=0,
+            cache=cache,
+            flow=AdaptiveConcurrencyController(),
+        )
+        await client._http.aclose()
+        client._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await client.fetch_raw_url(URL), threading.get_ident()
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+def test_retries_throttling_and_server_errors():
+    statuses = iter([429, 503, 200])
+    result, _ = _fetch(lambda request: httpx.Response(next(statuses), content=b"<ROOT/>"))
+    assert result.status_code == 200
+    assert result.content == "<ROOT/>"
+
+
+def test_gives_up_after_max_retries_on_429():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(429)
+
+    result, _ = _fetch(handler, max_retries=2)
+    assert result.status_code == 429
+    assert len(calls) == 2
+
+
+def test_cache_io_runs_outside_event_loop(tmp_path):
+    cache = ThreadRecordingCache(tmp_path)
+
+    def handler(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=b"<ROOT/>", headers={"ETag": '"v1"'})
+
+    first, loop_thread = _fetch(handler, cache=cache)
+    second, _ = _fetch(handler, cache=cache)
+
+    assert not first.from_cache
+    assert second.from_cache and second.content == "<ROOT/>"
+    # lookup + store, potem lookup + touch.
+    assert len(cache.io_threads) == 4
+    assert loop_thread not in cache.io_threads
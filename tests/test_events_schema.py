@@ -0,0 +1,44 @@
+from unittest import mock
+
+import pytest
+from postgrest.exceptions import APIError
+
+from scraper import db
+
+
+class _RpcResult:
+    def __init__(self, data=None, error=None):
+        self.data = data
+        self.error = error
+
+    def execute(self):
+        if self.error:
+            raise self.error
+        return self
+
+
+@pytest.fixture
+def rpc():
+    client = mock.Mock()
+    with mock.patch.object(db, "supabase", client), mock.patch.object(db, "_events_partitioned", None):
+        yield client.rpc
+
+
+def test_partitioned_schema_uses_semester_conflict_target(rpc):
+    rpc.return_value = _RpcResult(data=True)
+    assert db.event_conflict_target() == db.PARTITIONED_EVENT_CONFLICT_TARGET
+    assert db.event_conflict_target() == db.PARTITIONED_EVENT_CONFLICT_TARGET
+    rpc.assert_called_once_with(db.EVENTS_PARTITIONED_RPC, {})
+
+
+def test_missing_detection_function_means_unpartitioned_schema(rpc):
+    rpc.return_value = _RpcResult(error=APIError({"code": "PGRST202", "message": "Could not find the function"}))
+    assert db.event_conflict_target() == db.EVENT_CONFLICT_TARGET
+    assert db.ensure_semester_partitions(["231", "230"]) == 0
+    rpc.assert_called_once()
+
+
+def test_detection_error_stops_the_run(rpc):
+    rpc.return_value = _RpcResult(error=APIError({"code": "42501", "message": "permission denied"}))
+    with pytest.raises(RuntimeError):
+        db.events_partitioned()
@@ -0,0 +1,23 @@
+from unittest import mock
+
+from scraper import metrics
+from scraper.bench.fakes import FixtureStore
+from scraper.bench.offline_e2e import OfflineHarness
+
+
+def test_db_metrics_are_labelled_with_stage():
+    registry = metrics.MetricsRegistry()
+    with mock.patch.object(metrics, "_registry", registry):
+        OfflineHarness(FixtureStore()).run()
+
+    report = registry.as_dict()
+    rows_by_stage = {}
+    for entry in report["counters"]:
+        if entry["name"] == "db_rows_total":
+            stage = entry["labels"]["stage"]
+            rows_by_stage[stage] = rows_by_stage.get(stage, 0) + entry["value"]
+    assert set(rows_by_stage) == {"katalogi", "grupy", "nauczyciele"}
+    assert all(rows_by_stage.values())
+
+    request_stages = {e["labels"].get("stage") for e in report["histograms"] if e["name"] == "db_request_seconds"}
+    assert request_stages == {"katalogi", "grupy", "nauczyciele"}
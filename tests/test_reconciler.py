@@ -0,0 +1,68 @@
+from unittest import mock
+
+import pytest
+
+from scraper import db
+from scraper.bench.fakes import FakeSupabase
+
+FUTURE = "2099-10-05T08:00:00"
+
+
+@pytest.fixture(params=["rpc", "filters"])
+def partitioned_db(request):
+    # "filters": baza bez funkcji delete_stale_zajecia - kasowanie filtrami DELETE.
+    fake = FakeSupabase(functions={} if request.param == "filters" else None)
+    with mock.patch.object(db, "supabase", fake), mock.patch.object(db, "_events_partitioned", True), \
+            mock.patch.object(db, "_stale_delete_rpc_available", None):
+        yield fake
+
+
+def _event(uid, semester, owner="27001", poczatek=FUTURE):
+    return {"uid": uid, "id_semestru": semester, "grupa_id": owner, "poczatek": poczatek}
+
+
+def test_partitioned_reconcile_removes_future_rows_of_other_semesters(partitioned_db):
+    partitioned_db.table("zajecia_grupy").upsert([
+        _event("A", "230"),
+        _event("B", "230"),
+        _event("B", "231"),
+        _event("C", "231"),
+        _event("D", None),
+        _event("E", "230", poczatek="2020-03-02T08:00:00"),
+        _event("F", "230", owner="28001"),
+    ], on_conflict="uid,id_semestru").execute()
+
+    reconciler = db.StaleEventReconciler("zajecia_grupy", "grupa_id")
+    reconciler.track("27001", [_event("B", "231")])
+    assert reconciler.run() == 4
+
+    remaining = sorted((row["uid"], row["id_semestru"]) for row in partitioned_db.tables["zajecia_grupy"])
+    assert remaining == [("B", "231"), ("E", "230"), ("F", "230")]
+
+
+def test_keyset_with_tie_column_does_not_skip_shared_uids(partitioned_db):
+    rows = [_event(uid, semester) for uid in ("A", "B", "C") for semester in ("229", "230", "231", None)]
+    partitioned_db.table("zajecia_grupy").upsert(rows, on_conflict="uid,id_semestru").execute()
+
+    for page_size in (2, 3, 5):
+        read = [(row["uid"], row["id_semestru"]) for row in db.iter_table_rows(
+            "zajecia_grupy", "uid", key_col="uid", page_size=page_size, tie_col="id_semestru")]
+        assert sorted(read, key=str) == sorted(((r["uid"], r["id_semestru"]) for r in rows), key=str)
+        assert len(read) == len(set(read))
+
+
+def test_stale_events_are_deleted_with_one_rpc_per_large_batch():
+    fake = FakeSupabase()
+    with mock.patch.object(db, "supabase", fake), mock.patch.object(db, "_events_partitioned", False), \
+            mock.patch.object(db, "_stale_delete_rpc_available", None):
+        fake.table("zajecia_nauczyciela").upsert([
+            {"uid": f"501_{n}", "id_semestru": "231", "nauczyciel_id": "t-1", "poczatek": FUTURE} for n in range(3000)
+        ], on_conflict="uid").execute()
+
+        reconciler = db.StaleEventReconciler("zajecia_nauczyciela", "nauczyciel_id")
+        reconciler.track("t-1", [{"uid": "501_0", "id_semestru": "231"}])
+        assert reconciler.run() == 2999
+
+    assert [row["uid"] for row in fake.tables["zajecia_nauczyciela"]] == ["501_0"]
+    assert fake.requests[("delete_stale_zajecia", "rpc")] == 1
+    assert fake.requests[("zajecia_nauczyciela", "delete")] == 0
@@ -0,0 +1,96 @@
+from unittest import mock
+
+import pytest
+
+from postgrest.exceptions import APIError
+
+from scraper import db, main, xml_sync
+from scraper.bench.fakes import FAKE_FUNCTIONS, FakeSupabase, FixtureStore, FixtureXmlClient
+from scraper.digest_store import DigestStore
+from scraper.run_events import DIGEST_KIND
+
+
+@pytest.fixture
+def fake_db():
+    fake = FakeSupabase()
+    with mock.patch.object(db, "supabase", fake):
+        yield fake
+
+
+def test_remap_moves_events_of_old_group_id(fake_db):
+    fake_db.table("grupy").upsert(
+        [{"id": "g-1", "grupa_id": "27001", "nazwa": "21INF-SP", "kierunek_id": "k-1"}], on_conflict="id",
+    ).execute()
+    fake_db.table("zajecia_grupy").upsert([
+        {"uid": "27001_880001_2026-03-02_ALL", "grupa_id": "27001", "poczatek": "2026-03-02T08:00:00"},
+        {"uid": "27001_880002_2027-03-01_ALL", "grupa_id": "27001", "poczatek": "2027-03-01T08:00:00"},
+        {"uid": "28001_880003_2026-03-02_ALL", "grupa_id": "28001", "poczatek": "2026-03-02T08:00:00"},
+    ], on_conflict="uid").execute()
+
+    catalog = [{"grupa_id": "37001", "kod_grupy": "21INF-SP", "kierunek_id": "k-1"}]
+    assert xml_sync._remap_groups_for_new_semester(catalog) == 1
+
+    owners = {row["uid"]: row["grupa_id"] for row in fake_db.tables["zajecia_grupy"]}
+    assert owners == {
+        "27001_880001_2026-03-02_ALL": "37001",
+        "27001_880002_2027-03-01_ALL": "37001",
+        "28001_880003_2026-03-02_ALL": "28001",
+    }
+    assert fake_db.tables["grupy"][0]["grupa_id"] == "37001"
+
+
+def _failing_remap(db_, params):
+    raise APIError({"code": "57014", "message": "canceling statement due to statement timeout"})
+
+
+def test_failed_remap_leaves_groups_events_and_digests_untouched(tmp_path):
+    fake = FakeSupabase(functions={**FAKE_FUNCTIONS, "remap_grupy_semester": _failing_remap})
+    fake.table("grupy").upsert(
+        [{"id": "g-1", "grupa_id": "27001", "nazwa": "21INF-SP", "kierunek_id": "k-1"}], on_conflict="id",
+    ).execute()
+    fake.table("zajecia_grupy").upsert(
+        [{"uid": "27001_880001_2027-03-01_ALL", "grupa_id": "27001", "poczatek": "2027-03-01T08:00:00"}],
+        on_conflict="uid",
+    ).execute()
+    digests = DigestStore(tmp_path / "digests.json")
+    digests.record(DIGEST_KIND, "27001", "abc")
+
+    catalog = [{"grupa_id": "37001", "kod_grupy": "21INF-SP", "kierunek_id": "k-1"}]
+    with mock.patch.object(db, "supabase", fake), pytest.raises(APIError):
+        xml_sync._remap_groups_for_new_semester(catalog, digests)
+
+    assert fake.tables["grupy"][0]["grupa_id"] == "27001"
+    assert fake.tables["zajecia_grupy"][0]["grupa_id"] == "27001"
+    assert digests.is_unchanged(DIGEST_KIND, "27001", "abc")
+
+
+def test_remap_without_migration_fails_loudly(fake_db):
+    fake_db.functions.pop("remap_grupy_semester")
+    fake_db.table("grupy").upsert(
+        [{"id": "g-1", "grupa_id": "27001", "nazwa": "21INF-SP", "kierunek_id": "k-1"}], on_conflict="id",
+    ).execute()
+
+    catalog = [{"grupa_id": "37001", "kod_grupy": "21INF-SP", "kierunek_id": "k-1"}]
+    with pytest.raises(RuntimeError, match="remap_grupy_semester"):
+        xml_sync._remap_groups_for_new_semester(catalog)
+    assert fake_db.tables["grupy"][0]["grupa_id"] == "27001"
+
+
+def test_semester_state_is_saved_only_after_successful_rollover(fake_db):
+    # Baza zna semestr 230, a naglowek fixture podaje 231.
+    db.save_semester_state({
+        "current_semester_id": "230", "current_semester_name": "2025/2026 letni",
+        "previous_semester_id": "229", "previous_semester_name": "2025/2026 zimowy",
+    })
+    store = FixtureStore()
+
+    with mock.patch.object(main, "XmlClient", lambda **kwargs: FixtureXmlClient(store, **kwargs)):
+        with mock.patch.object(main, "_run_xml_sync", side_effect=RuntimeError("przerwany katalog")):
+            with pytest.raises(RuntimeError):
+                main._run_catalog_only()
+        assert db.get_semester_state()["id_semestru_aktualny"] == "230"
+
+        with mock.patch.object(main, "_run_xml_sync") as run_sync:
+            main._run_catalog_only()
+        assert run_sync.call_args.kwargs["rollover"] is True
+        assert db.get_semester_state()["id_semestru_aktualny"] == "231"
@@ -0,0 +1,39 @@
+from scraper.bench.fakes import FixtureStore
+from scraper.bench.offline_e2e import OfflineHarness
+from scraper.digest_store import DigestStore
+
+PLAN_501 = "nauczyciel_plan.ID=501.xml"
+
+
+def _teacher(harness, external_id):
+    return next(row for row in harness.db.tables["nauczyciele"] if row["external_id"] == external_id)
+
+
+def test_plan_metadata_survives_digest_skip(tmp_path):
+    store = FixtureStore()
+    # Plan podaje dodatkowa jednostke, ktorej nie ma na liscie wydzialu.
+    store.files[PLAN_501] = store.files[PLAN_501].replace(
+        b"</JEDN>", b"</JEDN><JEDN2>Centrum Testowe</JEDN2>", 1)
+    harness = OfflineHarness(store, digests=DigestStore(tmp_path / "digests.json"))
+
+    harness.run()
+    expected = "Centrum Testowe | Instytut Informatyki i Automatyki"
+    assert _teacher(harness, "501")["jednostka"] == expected
+
+    stages = {stage["stage"]: stage for stage in harness.run()}
+    assert stages["nauczyciele"]["xml_requests"] > 0
+    assert _teacher(harness, "501")["jednostka"] == expected
+    assert _teacher(harness, "501")["email"] == "j.kowalski@uz.zgora.pl"
+
+
+def test_digest_without_metadata_is_parsed_again(tmp_path):
+    harness = OfflineHarness(FixtureStore(), digests=DigestStore(tmp_path / "digests.json"))
+    harness.run()
+    # Wpis z wersji bez metadanych: sam skrot nie wystarcza do pominiecia planu.
+    for ext_id in ("501", "502", "503"):
+        digest = harness.digests._digests["nauczyciele"][ext_id]
+        harness.digests.record("nauczyciele", ext_id, digest)
+
+    stages = {stage["stage"]: stage for stage in harness.run()}
+    assert stages["nauczyciele"]["rows_written"] > 0
+    assert all(harness.digests.meta("nauczyciele", ext_id) is not None for ext_id in ("501", "502", "503"))
@@ -0,0 +1,103 @@
+from unittest import mock
+
+import pytest
+
+from scraper import xml_parsers
+from scraper.bench.fakes import FIXTURES_DIR
+from scraper.bench.parse_scaling import load_plan_files, measure_in_process
+from scraper.bench.synthetic_xml import generate_plan_xml
+from scraper.xml_parsers import PLAN_PARSER_BS4, PLAN_PARSER_STREAM, TEACHER_META_TAGS, GROUP_META_TAGS, _parse_plan
+
+META_TAGS = (*TEACHER_META_TAGS, *GROUP_META_TAGS)
+PLAN_FIXTURES = sorted(p for p in FIXTURES_DIR.glob("*.xml") if "plan." in p.name)
+
+
+def _both(xml, meta_tags=META_TAGS):
+    stream = _parse_plan(xml, engine=PLAN_PARSER_STREAM, meta_tags=meta_tags)
+    bs4 = _parse_plan(xml, engine=PLAN_PARSER_BS4, meta_tags=meta_tags)
+    return stream, bs4
+
+
+def _plan(items: str, header: str = "<SEMESTER_ID>231</SEMESTER_ID>", encoding: str = "UTF-8") -> str:
+    return f'<?xml version="1.0" encoding="{encoding}"?>\n<ROOT>{header}<ITEMS>{items}</ITEMS></ROOT>\n'
+
+
+def _item(uid: str, name: str = "Bazy danych", extra: str = "") -> str:
+    return (
+        f"<ITEM><ID_POZYCJA>{uid}</ID_POZYCJA><NAME>{name}</NAME><RZ>W</RZ><SORT>Kowalski Jan, dr</SORT>"
+        f"<G_OD>08:00</G_OD><G_DO>09:30</G_DO><TERMIN_DT>2026-10-06;2026-10-13</TERMIN_DT>{extra}</ITEM>"
+    )
+
+
+@pytest.mark.parametrize("path", PLAN_FIXTURES, ids=lambda p: p.name)
+def test_stream_matches_bs4_on_fixtures(path):
+    stream, bs4 = _both(path.read_bytes())
+    assert stream[0]
+    assert stream == bs4
+
+
+def test_stream_matches_bs4_on_synthetic_plan():
+    stream, bs4 = _both(generate_plan_xml(300, seed=7))
+    assert len(stream[0]) > 300
+    assert stream == bs4
+
+
+def test_header_after_items_applies_to_events_without_semester():
+    xml = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n<ROOT><ITEMS>'
+        + _item("1") + _item("2", extra="<ID_SEMESTR>230</ID_SEMESTR>")
+        + "</ITEMS><SEMESTER_ID>231</SEMESTER_ID><E_MAIL>a@uz.zgora.pl</E_MAIL></ROOT>"
+    )
+    stream, bs4 = _both(xml)
+    assert stream == bs4
+    assert [e.id_semestru for e in stream[0]] == ["231", "231", "230", "230"]
+    assert stream[1]["E_MAIL"] == "a@uz.zgora.pl"
+
+
+def test_nested_items_are_parsed_in_document_order():
+    inner = _item("2", name="Sieci komputerowe")
+    xml = _plan(
+        "<ITEM><ID_POZYCJA>1</ID_POZYCJA><NAME>Fizyka</NAME><G_OD>10:00</G_OD><G_DO>11:30</G_DO>"
+        f"<TERMIN_DT>2026-10-07</TERMIN_DT><ITEMS>{inner}</ITEMS></ITEM>" + _item("3")
+    )
+    stream, bs4 = _both(xml)
+    assert stream == bs4
+    assert [e.external_uid.split("_")[0] for e in stream[0]] == ["1", "2", "2", "3", "3"]
+
+
+def test_cp1250_document():
+    xml = _plan(_item("1", name="Język angielski", extra="<R_UWAGI>zajęcia w s. 105 A-2</R_UWAGI>"),
+                header="<SEMESTER_ID>231</SEMESTER_ID><JEDN>Wydział Ekonomii i Zarządzania</JEDN>",
+                encoding="windows-1250").encode("cp1250")
+    stream, bs4 = _both(xml)
+    assert stream == bs4
+    assert stream[0][0].subject == "Język angielski"
+    assert stream[0][0].room == "105 A-2"
+    assert stream[1]["JEDN"] == "Wydział Ekonomii i Zarządzania"
+
+
+def test_entities_and_cdata():
+    xml = _plan(_item("1", name="Prawo &amp; ekonomia &#x141;&#243;d&#378;",
+                      extra="<SALE><NAME><![CDATA[A-2 <sala> 11]]></NAME></SALE>"))
+    stream, bs4 = _both(xml)
+    assert stream == bs4
+    assert stream[0][0].subject == "Prawo & ekonomia Łódź"
+    assert stream[0][0].room == "A-2 <sala> 11"
+
+
+def test_malformed_xml_falls_back_to_bs4():
+    xml = _plan(_item("1") + "<ITEM><ID_POZYCJA>2</ID_POZYCJA><NAME>Fizyka</NAME>")
+    expected = _parse_plan(xml, engine=PLAN_PARSER_BS4)
+    with mock.patch.object(xml_parsers, "_parse_plan_bs4", wraps=xml_parsers._parse_plan_bs4) as bs4:
+        result = _parse_plan(xml, engine=PLAN_PARSER_STREAM)
+    bs4.assert_called_once()
+    assert result == expected
+    assert result[0]
+
+
+def test_parse_scaling_loads_cp1250_plans_as_bytes(tmp_path):
+    xml = _plan(_item("1", name="Język angielski"), encoding="windows-1250").encode("cp1250")
+    (tmp_path / "plan.xml").write_bytes(xml)
+    files = load_plan_files(str(tmp_path))
+    assert files == [xml]
+    assert measure_in_process(files, repeat=1)[1] == len(_parse_plan(xml)[0])